@@ -1,6 +1,7 @@
 const axios = require('axios');
 const FormData = require('form-data');
 const fs = require('fs');
+const http = require('http');
 
 // Configuration for Originality Engine URLs (Assuming running locally on specific ports)
 // Video: 5003, Text: 5002, Image: 8081, Audio: 8080
@@ -11,9 +12,21 @@ const ENGINES = {
     audio: 'http://localhost:8080'
 };
 
+// Optional unified gateway (originality-engine/gateway/server.py, default port 5010).
+// When set, every content type goes to one service that routes by type internally.
+const GATEWAY_URL = process.env.ORIGINALITY_GATEWAY_URL;
+
+// Keep-alive pool so repeated checks reuse connections instead of opening new ones
+const keepAliveAgent = new http.Agent({ keepAlive: true, maxSockets: 32 });
+
+const engineUrlFor = (contentType) => {
+    if (!ENGINES[contentType]) return undefined;
+    return GATEWAY_URL || ENGINES[contentType];
+};
+
 exports.checkOriginality = async (filePath, contentType) => {
     try {
-        const engineUrl = ENGINES[contentType];
+        const engineUrl = engineUrlFor(contentType);
         if (!engineUrl) {
             throw new Error(`No originality engine found for type: ${contentType}`);
         }
@@ -23,12 +36,14 @@ exports.checkOriginality = async (filePath, contentType) => {
         const fileKey = 'file';
 
         form.append(fileKey, fs.createReadStream(filePath));
+        form.append('type', contentType); // used by the gateway for routing
 
         // For now, simple interaction
         const response = await axios.post(`${engineUrl}${endpoint}`, form, {
             headers: {
                 ...form.getHeaders()
-            }
+            },
+            httpAgent: keepAliveAgent
         });
 
         const data = response.data;
@@ -55,7 +70,8 @@ exports.checkOriginality = async (filePath, contentType) => {
             // Image: { status: "ORIGINAL" | "DUPLICATE...", distance: int }
             // Distance 0 = Exact Match. Higher distance = More Original.
             // Threshold for duplicate is usually low (e.g. < 10).
-            const distance = data.distance !== undefined ? data.distance : 100;
+            // distance is null when no stored image was close enough to compare (no match)
+            const distance = data.distance != null ? data.distance : 100;
 
             // Heuristic for score: If distance > 50, it's very original (100%). If distance 0, 0%.
             result.is_original = (data.status === "ORIGINAL");
@@ -63,7 +79,6 @@ exports.checkOriginality = async (filePath, contentType) => {
             // Updated: Scale distance 0-32 to 0-100 score. 
             // Distance 10 (Threshold) -> 31%. Distance 32+ -> 100%.
             result.score = Math.min(100, Math.round((distance / 32) * 100));
-            if (distance === -1) result.score = 100; // No match found
         }
         else if (contentType === 'video') {
             // Video: { status: "Original" | "Duplicate...", audio_score, visual_score }
@@ -102,7 +117,7 @@ exports.checkOriginality = async (filePath, contentType) => {
 
 exports.registerAsset = async (filePath, contentType, assetId) => {
     try {
-        const engineUrl = ENGINES[contentType];
+        const engineUrl = engineUrlFor(contentType);
         if (!engineUrl) {
             console.warn(`No originality engine found for type: ${contentType}. Skipping registration.`);
             return;
@@ -116,13 +131,15 @@ exports.registerAsset = async (filePath, contentType, assetId) => {
         form.append('content_id', assetId);
         form.append('label', assetId);
         form.append('id', assetId);
+        form.append('type', contentType);
 
         console.log(`[OriginalityService] Registering ${contentType} asset ${assetId} to ${engineUrl}${endpoint}`);
 
         const response = await axios.post(`${engineUrl}${endpoint}`, form, {
             headers: {
                 ...form.getHeaders()
-            }
+            },
+            httpAgent: keepAliveAgent
         });
 
         console.log(`[OriginalityService] Registration successful:`, response.data);
@@ -13,6 +13,15 @@ func InsertFingerprint(hash uint32, songID uint32, anchor uint32) error {
 	return err
 }
 
+// DeleteSong removes every fingerprint of a song and returns how many were deleted.
+func DeleteSong(songID uint32) (int64, error) {
+	res, err := DB.Exec("DELETE FROM fingerprints WHERE song_id = ?", songID)
+	if err != nil {
+		return 0, err
+	}
+	return res.RowsAffected()
+}
+
 func GetCouples(hashes []uint32) (map[uint32][]Couple, error) {
 	out := make(map[uint32][]Couple)
 
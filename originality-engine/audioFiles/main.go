@@ -2,6 +2,9 @@ package main
 
 import (
 	"audio-originality/db"
+	"audio-originality/shazam"
+	"audio-originality/wav"
+	"crypto/subtle"
 	"encoding/json"
 	"fmt"
 	"io"
@@ -17,6 +20,9 @@ const (
 	PARTIAL_SCORE_THRESH = 35
 )
 
+// Largest streamed PCM body accepted: about 6 hours of mono 16-bit audio at the analysis rate
+const maxPCMBytes = 512 << 20
+
 func main() {
 
 	if err := db.InitDB(); err != nil {
@@ -32,6 +38,10 @@ func main() {
 	// SERVER MODE: Start HTTP server
 	http.HandleFunc("/check", enableCORS(handleCheck))
 	http.HandleFunc("/register", enableCORS(handleRegister))
+	http.HandleFunc("/delete", enableCORS(handleDelete))
+	// Raw mono 16-bit little-endian PCM streamed as the request body (?rate=...), no temp file
+	http.HandleFunc("/check/pcm", enableCORS(handleCheckPCM))
+	http.HandleFunc("/register/pcm", enableCORS(handleRegisterPCM))
 
 	fmt.Println("Server starting on :8080...")
 	if err := http.ListenAndServe(":8080", nil); err != nil {
@@ -137,6 +147,10 @@ func handleCheck(w http.ResponseWriter, r *http.Request) {
 	}
 
 	// 3. Process matches
+	writeCheckResponse(w, matches)
+}
+
+func writeCheckResponse(w http.ResponseWriter, matches []shazam.Match) {
 	response := CheckResponse{
 		Status:  "ORIGINAL",
 		Matches: []MatchResult{},
@@ -165,6 +179,58 @@ func handleCheck(w http.ResponseWriter, r *http.Request) {
 	json.NewEncoder(w).Encode(response)
 }
 
+// readPCM decodes a streamed PCM request body, at shazam.AnalysisRate (already
+// downsampled by the client) or shazam.FullRate.
+func readPCM(w http.ResponseWriter, r *http.Request) ([]float64, int, bool) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		return nil, 0, false
+	}
+	rate, err := strconv.Atoi(r.URL.Query().Get("rate"))
+	if err != nil || (rate != shazam.AnalysisRate && rate != shazam.FullRate) {
+		http.Error(w, fmt.Sprintf("'rate' must be %d or %d", shazam.AnalysisRate, shazam.FullRate), http.StatusBadRequest)
+		return nil, 0, false
+	}
+	samples, err := wav.ReadPCM(http.MaxBytesReader(w, r.Body, maxPCMBytes))
+	if err != nil {
+		http.Error(w, "Failed to read PCM body: "+err.Error(), http.StatusBadRequest)
+		return nil, 0, false
+	}
+	return samples, rate, true
+}
+
+func handleCheckPCM(w http.ResponseWriter, r *http.Request) {
+	samples, rate, ok := readPCM(w, r)
+	if !ok {
+		return
+	}
+	matches, err := shazam.FindMatches(samples, float64(len(samples))/float64(rate), rate)
+	if err != nil {
+		http.Error(w, "Check failed: "+err.Error(), http.StatusInternalServerError)
+		return
+	}
+	writeCheckResponse(w, matches)
+}
+
+func handleRegisterPCM(w http.ResponseWriter, r *http.Request) {
+	songID, err := strconv.Atoi(r.URL.Query().Get("id"))
+	if err != nil {
+		http.Error(w, "Missing or invalid 'id' parameter", http.StatusBadRequest)
+		return
+	}
+	samples, rate, ok := readPCM(w, r)
+	if !ok {
+		return
+	}
+	if err := RegisterSamples(samples, rate, uint32(songID)); err != nil {
+		http.Error(w, "Register failed: "+err.Error(), http.StatusInternalServerError)
+		return
+	}
+
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(map[string]string{"status": "success", "message": fmt.Sprintf("Registered song %d", songID)})
+}
+
 func handleRegister(w http.ResponseWriter, r *http.Request) {
 	if r.Method != http.MethodPost {
 		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
@@ -223,3 +289,55 @@ func handleRegister(w http.ResponseWriter, r *http.Request) {
 	w.Header().Set("Content-Type", "application/json")
 	json.NewEncoder(w).Encode(map[string]string{"status": "success", "message": fmt.Sprintf("Registered song %d", songID)})
 }
+
+// checkAdmin enforces the admin token the Python services use (ORIGINALITY_ADMIN_TOKEN,
+// sent as X-Admin-Token): 401 without a token, 403 with a wrong one or when it is unset.
+func checkAdmin(w http.ResponseWriter, r *http.Request) bool {
+	token := os.Getenv("ORIGINALITY_ADMIN_TOKEN")
+	given := r.Header.Get("X-Admin-Token")
+	switch {
+	case token == "":
+		http.Error(w, "Disabled: ORIGINALITY_ADMIN_TOKEN is not set", http.StatusForbidden)
+	case given == "":
+		http.Error(w, "Missing X-Admin-Token", http.StatusUnauthorized)
+	case subtle.ConstantTimeCompare([]byte(given), []byte(token)) != 1:
+		http.Error(w, "Invalid X-Admin-Token", http.StatusForbidden)
+	default:
+		return true
+	}
+	return false
+}
+
+func handleDelete(w http.ResponseWriter, r *http.Request) {
+	if r.Method != http.MethodPost {
+		http.Error(w, "Method not allowed", http.StatusMethodNotAllowed)
+		return
+	}
+	if !checkAdmin(w, r) {
+		return
+	}
+
+	idStr := r.FormValue("id")
+	if idStr == "" {
+		http.Error(w, "Missing 'id' parameter", http.StatusBadRequest)
+		return
+	}
+	songID, err := strconv.Atoi(idStr)
+	if err != nil {
+		http.Error(w, "Invalid 'id' parameter", http.StatusBadRequest)
+		return
+	}
+
+	deleted, err := db.DeleteSong(uint32(songID))
+	if err != nil {
+		http.Error(w, "Failed to delete song: "+err.Error(), http.StatusInternalServerError)
+		return
+	}
+	if deleted == 0 {
+		http.Error(w, fmt.Sprintf("Song %d not found", songID), http.StatusNotFound)
+		return
+	}
+
+	w.Header().Set("Content-Type", "application/json")
+	json.NewEncoder(w).Encode(map[string]string{"status": "success", "message": fmt.Sprintf("Deleted song %d (%d fingerprints)", songID, deleted)})
+}
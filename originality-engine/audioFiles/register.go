@@ -18,8 +18,18 @@ func RegisterSong(path string, songID uint32) error {
 		return err
 	}
 
-	spec, _ := shazam.Spectrogram(info.LeftChannelSamples, info.SampleRate)
-	peaks := shazam.ExtractPeaks(spec, info.Duration, info.SampleRate)
+	return RegisterSamples(info.LeftChannelSamples, info.SampleRate, songID)
+}
+
+// RegisterSamples fingerprints mono samples at `rate` (shazam.FullRate, or
+// shazam.AnalysisRate for audio the client already resampled).
+func RegisterSamples(samples []float64, rate int, songID uint32) error {
+	spec, peakRate, err := shazam.PCMSpectrogram(samples, rate)
+	if err != nil {
+		return err
+	}
+	duration := float64(len(samples)) / float64(rate)
+	peaks := shazam.ExtractPeaks(spec, duration, peakRate)
 	fp := shazam.Fingerprint(peaks, songID)
 
 	for h, c := range fp {
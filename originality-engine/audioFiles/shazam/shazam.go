@@ -14,13 +14,13 @@ type Match struct {
 func FindMatches(samples []float64, duration float64, rate int) ([]Match, error) {
 
 	// 1. Spectrogram
-	spec, err := Spectrogram(samples, rate)
+	spec, peakRate, err := PCMSpectrogram(samples, rate)
 	if err != nil {
 		return nil, err
 	}
 
 	// 2. Peak extraction
-	peaks := ExtractPeaks(spec, duration, rate)
+	peaks := ExtractPeaks(spec, duration, peakRate)
 	if len(peaks) == 0 {
 		return nil, nil
 	}
@@ -15,6 +15,12 @@ const (
 	windowType = "hanning"      // choices: "hanning" or "hamming"
 )
 
+// FullRate is the rate WAV input is converted to; Spectrogram analyses it at AnalysisRate.
+const (
+	FullRate     = 44100
+	AnalysisRate = FullRate / dspRatio
+)
+
 func Spectrogram(sample []float64, sampleRate int) ([][]float64, error) {
 	filteredSample := LowPassFilter(maxFreq, float64(sampleRate), sample)
 
@@ -23,6 +29,23 @@ func Spectrogram(sample []float64, sampleRate int) ([][]float64, error) {
 		return nil, fmt.Errorf("couldn't downsample audio sample: %v", err)
 	}
 
+	return stft(downsampledSample), nil
+}
+
+// PCMSpectrogram returns the spectrogram of mono samples at `rate` together with the
+// rate ExtractPeaks expects for it. Audio already resampled to AnalysisRate (e.g. by
+// ffmpeg before it was streamed here) skips the filter and decimation Spectrogram
+// applies to full-rate audio, and yields the same frames and frequency bins.
+func PCMSpectrogram(sample []float64, sampleRate int) ([][]float64, int, error) {
+	if sampleRate == AnalysisRate {
+		return stft(sample), sampleRate * dspRatio, nil
+	}
+	spectrogram, err := Spectrogram(sample, sampleRate)
+	return spectrogram, sampleRate, err
+}
+
+// stft is the windowed short-time Fourier transform magnitude of analysis-rate samples.
+func stft(downsampledSample []float64) [][]float64 {
 	window := make([]float64, windowSize)
 	for i := range window {
 		theta := 2 * math.Pi * float64(i) / float64(windowSize-1)
@@ -61,7 +84,7 @@ func Spectrogram(sample []float64, sampleRate int) ([][]float64, error) {
 		spectrogram = append(spectrogram, magnitude)
 	}
 
-	return spectrogram, nil
+	return spectrogram
 }
 
 // LowPassFilter is a first-order low-pass filter that attenuates high
@@ -0,0 +1,39 @@
+package wav
+
+import (
+	"encoding/binary"
+	"errors"
+	"io"
+)
+
+// ReadPCM decodes raw 16-bit little-endian mono PCM from r (e.g. a streamed request
+// body) into normalised samples as it arrives, without a temp file or a WAV header.
+func ReadPCM(r io.Reader) ([]float64, error) {
+	const scale = 1.0 / 32768.0 // 16‑bit normalisation factor
+
+	buf := make([]byte, 64*1024)
+	var samples []float64
+	carry := 0 // odd byte left over from the previous read
+	for {
+		n, err := r.Read(buf[carry:])
+		n += carry
+		even := n &^ 1
+		for i := 0; i < even; i += 2 {
+			samples = append(samples, float64(int16(binary.LittleEndian.Uint16(buf[i:])))*scale)
+		}
+		carry = n - even
+		if carry == 1 {
+			buf[0] = buf[even]
+		}
+		if err == io.EOF {
+			break
+		}
+		if err != nil {
+			return nil, err
+		}
+	}
+	if len(samples) == 0 {
+		return nil, errors.New("no PCM samples in request body")
+	}
+	return samples, nil
+}
@@ -0,0 +1,247 @@
+"""
+Cluster mode: query latency and per-node capacity as the partition count grows.
+
+For each --partitions count N, starts N text nodes (textFiles/server.py, MinHash only)
+and N image nodes (imageFiles/main.py) as local processes, each with its own scratch
+DB, and routes to them with common.cluster.Cluster, the router the gateway uses:
+  - --text-filler / --image-filler synthetic rows are written straight into the
+    partition DBs that own their ids (random signatures and hashes that match nothing)
+  - --texts / --images corpus originals (bench/corpus.py) are registered through the
+    router, which sends each to the node owning its id
+  - their near-duplicate / edited variants and unseen originals are checked through the
+    router, which fans out to every partition and merges the answers
+
+Reports per-node rows and RSS (the capacity a node needs for its share of the corpus),
+check latency, check throughput at --concurrency and whether each check found the
+right asset. All nodes share this machine's cores, so on a small host the concurrent
+fan-out latency mostly shows partitions competing for CPU. The "alone" column calls the
+partitions one at a time instead and takes the slowest: roughly the fan-out latency
+with one host per partition.
+
+Usage (from originality-engine/):
+    python bench/cluster.py --partitions 1,2,4
+    python bench/cluster.py --partitions 1,2,4,8 --text-filler 200000 --image-filler 1000000
+"""
+import argparse
+import os
+import pickle
+import random
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+import requests
+
+import corpus as corpus_gen
+from common.cluster import Cluster, partition
+
+NODE_SCRIPTS = {"text": (os.path.join(ENGINE_ROOT, 'textFiles', 'server.py'),),
+                "image": (os.path.join(ENGINE_ROOT, 'imageFiles', 'main.py'), 'server')}
+PORT_VARS = {"text": 'TEXT_PORT', "image": 'IMAGE_PORT'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def fill(db_paths, text_rows, image_rows, seed):
+    """Writes the filler rows of every partition; each id goes to the DB owning it."""
+    from datasketch import MinHash
+    from imageFiles.originality import ImageOriginalityRequest
+    from textFiles.originality import TextOriginalityRequest
+
+    rng = np.random.default_rng(seed)
+    template = MinHash(num_perm=128)
+    text_ids = [f"filler-text-{i}" for i in range(text_rows)]
+    image_ids = [f"filler-image-{i}" for i in range(image_rows)]
+    hashvalues = rng.integers(0, 2 ** 32, size=(text_rows, 128), dtype=np.uint64)
+    hashes = rng.integers(0, 2 ** 63, size=(image_rows, 4), dtype=np.uint64) << np.uint64(1)
+    for index, db_path in enumerate(db_paths):
+        TextOriginalityRequest(db_path=db_path, semantic=False, write_behind=False)
+        ImageOriginalityRequest(db_path=db_path, write_behind=False)
+        owned_text = [i for i, asset_id in enumerate(text_ids) if partition(asset_id, len(db_paths)) == index]
+        owned_image = [i for i, asset_id in enumerate(image_ids) if partition(asset_id, len(db_paths)) == index]
+        conn = sqlite3.connect(db_path)
+        with conn:
+            rows = []
+            for i in owned_text:
+                minhash = template.copy()
+                minhash.hashvalues = hashvalues[i]
+                rows.append((text_ids[i], pickle.dumps(minhash)))
+            conn.executemany('INSERT INTO text_assets (text_id, signature) VALUES (?, ?)', rows)
+            conn.executemany('INSERT INTO image_hashes (image_id, segment, phash, dhash, whash, colorhash) '
+                             'VALUES (?, ?, ?, ?, ?, ?)',
+                             [(image_ids[i], 'full', *(f"{int(v):016x}" for v in hashes[i])) for i in owned_image])
+        conn.close()
+
+
+def start_nodes(modality, db_paths, tmp):
+    nodes = []
+    for index, db_path in enumerate(db_paths):
+        port = free_port()
+        workdir = os.path.join(tmp, f"{modality}-node-{index}")
+        os.makedirs(workdir, exist_ok=True)
+        env = dict(os.environ, ORIGINALITY_DB_PATH=db_path, TEXT_SEMANTIC='0', **{PORT_VARS[modality]: str(port)})
+        log = open(os.path.join(workdir, 'node.log'), 'w')
+        process = subprocess.Popen([sys.executable, *NODE_SCRIPTS[modality]], cwd=workdir, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+        nodes.append((f"http://127.0.0.1:{port}", process, log))
+    for index, (url, process, _) in enumerate(nodes):
+        deadline = time.time() + 120
+        while True:
+            try:
+                if requests.get(f"{url}/health", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if process.poll() is not None or time.time() > deadline:
+                with open(os.path.join(tmp, f"{modality}-node-{index}", 'node.log')) as f:
+                    tail = f.read()[-2000:]
+                stop_nodes(nodes)
+                raise RuntimeError(f"{modality} node {url} did not start:\n{tail}")
+            time.sleep(0.2)
+    return nodes
+
+
+def stop_nodes(nodes):
+    for _, process, log in nodes:
+        process.terminate()
+        process.wait(10)
+        log.close()
+
+
+def rss_mb(pid):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return float('nan')
+
+
+def expected_id(item):
+    return item.get("source") if item["role"] != "original" else None
+
+
+def found_id(modality, body):
+    if modality == "text":
+        return body.get("closest_match_id") if body.get("status") != "Original" else None
+    return body.get("match_id") if body.get("status") != "ORIGINAL" else None
+
+
+def run(args, partitions, manifest):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_paths = [os.path.join(tmp, f"partition-{i}.db") for i in range(partitions)]
+        fill(db_paths, args.text_filler, args.image_filler, args.seed)
+        nodes = {m: start_nodes(m, db_paths, tmp) for m in ("text", "image")}
+        try:
+            routers = {m: Cluster(m, [url for url, _, _ in nodes[m]], timeout_ms=args.timeout_ms)
+                       for m in ("text", "image")}
+            started = time.perf_counter()
+            registered = 0
+            for item in manifest:
+                if item["role"] == "original" and not item.get("unseen"):
+                    body, code = routers[item["modality"]].register(item["path"], os.path.basename(item["path"]),
+                                                                    item["id"])
+                    registered += code == 200
+            register_s = time.perf_counter() - started
+
+            checks = [item for item in manifest
+                      if item["role"] not in ("original", "paraphrase") or item.get("unseen")]
+
+            def check(item):
+                t0 = time.perf_counter()
+                body, code = routers[item["modality"]].check(item["path"], os.path.basename(item["path"]))
+                return item, body, code, (time.perf_counter() - t0) * 1000
+
+            for modality in ("text", "image"):  # warm-up: every node loads its index on its first check
+                check(next(item for item in checks if item["modality"] == modality))
+            serial = [check(item) for item in checks]
+
+            def slowest_alone(item):
+                router = routers[item["modality"]]
+                with open(item["path"], 'rb') as f:
+                    data = f.read()
+                times = []
+                for index, node in enumerate(router.nodes):
+                    t0 = time.perf_counter()
+                    router._call(index, node, '/check', os.path.basename(item["path"]), data)
+                    times.append((time.perf_counter() - t0) * 1000)
+                return item["modality"], max(times)
+
+            alone = [slowest_alone(item) for item in checks]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(args.concurrency) as pool:
+                list(pool.map(check, checks))
+            throughput = len(checks) / (time.perf_counter() - started)
+
+            stats = {"partitions": partitions, "register_per_s": registered / register_s, "throughput": throughput}
+            for modality in ("text", "image"):
+                results = [r for r in serial if r[0]["modality"] == modality]
+                latencies = [r[3] for r in results]
+                correct = sum(r[2] in (200,) and found_id(modality, r[1]) == expected_id(r[0]) for r in results)
+                health = routers[modality].health()
+                stats[modality] = {
+                    "rows_per_node": max(h["corpus_size"] or 0 for h in health),
+                    "rss_per_node": max(rss_mb(process.pid) for _, process, _ in nodes[modality]),
+                    "p50": float(np.percentile(latencies, 50)), "p95": float(np.percentile(latencies, 95)),
+                    "alone_p50": float(np.percentile([ms for m, ms in alone if m == modality], 50)),
+                    "correct": correct, "checks": len(results),
+                }
+            return stats
+        finally:
+            for modality_nodes in nodes.values():
+                stop_nodes(modality_nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Partitioned cluster benchmark")
+    parser.add_argument('--partitions', default='1,2,4', help='Partition counts to run')
+    parser.add_argument('--texts', type=int, default=80, help='Corpus texts registered through the router')
+    parser.add_argument('--images', type=int, default=40, help='Corpus images registered through the router')
+    parser.add_argument('--unseen', type=int, default=20, help='Unregistered texts and images checked')
+    parser.add_argument('--text-filler', type=int, default=40000, help='Synthetic text rows spread over partitions')
+    parser.add_argument('--image-filler', type=int, default=400000, help='Synthetic image rows spread over partitions')
+    parser.add_argument('--concurrency', type=int, default=4, help='Concurrent checks for the throughput run')
+    parser.add_argument('--timeout-ms', type=float, default=5000, help='Per-partition check timeout')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        rng = random.Random(args.seed)
+        manifest, unseen = [], []
+        corpus_gen.generate_texts(rng, os.path.join(corpus_dir, 'texts'), args.texts, manifest)
+        corpus_gen.generate_images(rng, os.path.join(corpus_dir, 'images'), args.images, manifest)
+        corpus_gen.generate_texts(rng, os.path.join(corpus_dir, 'unseen_texts'), args.unseen, unseen)
+        corpus_gen.generate_images(rng, os.path.join(corpus_dir, 'unseen_images'), args.unseen, unseen)
+        manifest += [dict(item, unseen=True) for item in unseen if item["role"] == "original"]
+
+        print(f"{args.texts} texts + {args.text_filler} filler rows, {args.images} images + {args.image_filler} "
+              f"filler rows; {os.cpu_count()} CPU(s)")
+        print(f"{'N':>3} {'modality':<8} {'rows/node':>10} {'RSS/node MB':>12} {'p50 ms':>8} {'p95 ms':>8} "
+              f"{'alone p50':>10} {'correct':>9} {'checks/s':>9} {'reg/s':>7}")
+        for partitions in [int(n) for n in args.partitions.split(',')]:
+            stats = run(args, partitions, manifest)
+            for modality in ("text", "image"):
+                s = stats[modality]
+                print(f"{partitions:>3} {modality:<8} {s['rows_per_node']:>10} {s['rss_per_node']:>12.0f} "
+                      f"{s['p50']:>8.1f} {s['p95']:>8.1f} {s['alone_p50']:>10.1f} {s['correct']:>5}/{s['checks']:<3} "
+                      f"{stats['throughput']:>9.1f} {stats['register_per_s']:>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Diffs two bench/run.py result files (e.g. before/after a commit).
+
+Rows are matched on (mode, modality, corpus_size). Prints the relative change of
+check p50/p95/p99, register/check throughput and accuracy. Exits non-zero when any
+latency regresses by more than --threshold.
+
+Usage (from originality-engine/):
+    python bench/compare.py bench/results/base.json bench/results/new.json --threshold 0.10
+"""
+import argparse
+import json
+import sys
+
+LATENCY_KEYS = ("p50_ms", "p95_ms", "p99_ms")
+
+
+def load(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["meta"], {(r["mode"], r["modality"], r["corpus_size"]): r for r in report["results"]}
+
+
+def rel_change(old, new):
+    if old in (None, 0) or new is None:
+        return None
+    return (new - old) / old
+
+
+def fmt(change):
+    return "   n/a" if change is None else f"{change * 100:+6.1f}%"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=0.10, help='Allowed latency regression (fraction)')
+    args = parser.parse_args()
+
+    base_meta, base = load(args.base)
+    new_meta, new = load(args.new)
+    print(f"base: {base_meta.get('git_commit')}  new: {new_meta.get('git_commit')}")
+
+    regressions = []
+    for key in sorted(set(base) & set(new)):
+        b, n = base[key], new[key]
+        mode, modality, size = key
+        parts = []
+        for k in LATENCY_KEYS:
+            change = rel_change(b["check"][k], n["check"][k])
+            parts.append(f"{k} {fmt(change)}")
+            if change is not None and change > args.threshold:
+                regressions.append(f"{modality}/{size} check {k} {fmt(change)}")
+        parts.append(f"check/s {fmt(rel_change(b['check']['ops_per_sec'], n['check']['ops_per_sec']))}")
+        parts.append(f"register/s {fmt(rel_change(b['register']['ops_per_sec'], n['register']['ops_per_sec']))}")
+        for role, stats in n.get("accuracy", {}).items():
+            old_acc = b.get("accuracy", {}).get(role, {}).get("accuracy")
+            parts.append(f"acc[{role}] {old_acc}->{stats['accuracy']}")
+        print(f"[{mode}] {modality:<5} n={size:<7} " + "  ".join(parts))
+
+    missing = sorted(set(base) ^ set(new))
+    if missing:
+        print(f"Rows present in only one file: {missing}")
+    if regressions:
+        print("[REGRESSION] " + "; ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
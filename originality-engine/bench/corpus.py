@@ -0,0 +1,209 @@
+"""
+Deterministic synthetic corpus generator for the originality benchmarks (fully offline).
+
+Produces, under --out:
+  text/   N originals + near-duplicates (word edits) + paraphrases (synonym swaps, reordering)
+  images/ N originals + crops, rotations, flips and JPEG recompressions
+  videos/ short synthetic clips + re-encoded copies (optional, needs moviepy)
+  manifest.json  every file with its asset id, role and, for variants, the original it derives from
+
+Usage (from originality-engine/):
+    python bench/corpus.py --out bench/data --texts 200 --images 100 --videos 4
+"""
+import argparse
+import json
+import os
+import random
+
+VOCAB = ("the a an of to in for on with by from at as is was are were be been has have had "
+         "asset license owner token chain ledger content media stream audio video image text "
+         "rights royalty creator market contract hash block network digital copy original work "
+         "author publish distribute register verify protect secure payment transfer buyer seller "
+         "music film photo story article chapter book song album artist studio label release "
+         "quickly carefully openly fairly legally rarely often always never usually").split()
+
+# Small offline thesaurus used to build paraphrases
+SYNONYMS = {
+    "asset": "holding", "license": "permit", "owner": "holder", "content": "material",
+    "creator": "maker", "market": "marketplace", "contract": "agreement", "copy": "duplicate",
+    "original": "initial", "work": "piece", "author": "writer", "publish": "release",
+    "distribute": "share", "register": "record", "verify": "confirm", "protect": "guard",
+    "secure": "safe", "payment": "fee", "transfer": "handover", "buyer": "purchaser",
+    "seller": "vendor", "film": "movie", "photo": "picture", "story": "tale", "article": "essay",
+    "book": "volume", "song": "track", "artist": "performer", "quickly": "rapidly",
+    "carefully": "cautiously", "often": "frequently", "always": "constantly", "never": "not once",
+    "usually": "typically", "rights": "entitlements", "royalty": "commission",
+}
+
+
+def make_sentence(rng):
+    words = [rng.choice(VOCAB) for _ in range(rng.randint(8, 20))]
+    return " ".join(words).capitalize() + "."
+
+
+def make_document(rng, n_sentences):
+    return [make_sentence(rng) for _ in range(n_sentences)]
+
+
+def near_duplicate(rng, sentences, edit_rate=0.05):
+    """Copy with a few words dropped / replaced (typos, light edits)."""
+    out = []
+    for sentence in sentences:
+        words = sentence.split()
+        edited = []
+        for w in words:
+            r = rng.random()
+            if r < edit_rate / 2:
+                continue
+            edited.append(rng.choice(VOCAB) if r < edit_rate else w)
+        out.append(" ".join(edited))
+    return out
+
+
+def paraphrase(rng, sentences):
+    """Synonym substitution plus sentence reordering: same meaning, different wording."""
+    out = []
+    for sentence in sentences:
+        words = [SYNONYMS.get(w.lower().strip('.'), w) for w in sentence.split()]
+        out.append(" ".join(words))
+    rng.shuffle(out)
+    return out
+
+
+def generate_texts(rng, out_dir, n, manifest):
+    os.makedirs(out_dir, exist_ok=True)
+    for i in range(n):
+        asset_id = f"text-{i:06d}"
+        sentences = make_document(rng, rng.randint(10, 60))
+        path = os.path.join(out_dir, f"{asset_id}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(" ".join(sentences))
+        manifest.append({"modality": "text", "id": asset_id, "path": path, "role": "original"})
+
+        # Every 4th original gets a near-duplicate and a paraphrase to check against
+        if i % 4 == 0:
+            for role, variant in (("near_duplicate", near_duplicate(rng, sentences)),
+                                  ("paraphrase", paraphrase(rng, sentences))):
+                vpath = os.path.join(out_dir, f"{asset_id}.{role}.txt")
+                with open(vpath, 'w', encoding='utf-8') as f:
+                    f.write(" ".join(variant))
+                manifest.append({"modality": "text", "id": f"{asset_id}.{role}", "path": vpath,
+                                 "role": role, "source": asset_id})
+
+
+def make_image(rng, size=256):
+    from PIL import Image, ImageDraw
+
+    bg = tuple(rng.randint(0, 255) for _ in range(3))
+    img = Image.new('RGB', (size, size), bg)
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randint(0, size - 20), rng.randint(0, size - 20)
+        x1, y1 = rng.randint(x0 + 10, size), rng.randint(y0 + 10, size)
+        color = tuple(rng.randint(0, 255) for _ in range(3))
+        if rng.random() < 0.5:
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+        else:
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+    return img
+
+
+def image_variants(img):
+    from PIL import Image
+
+    w, h = img.size
+    return {
+        "crop_top_half": img.crop((0, 0, w, h // 2)),
+        "crop_quadrant": img.crop((w // 2, h // 2, w, h)),
+        "rotate_90": img.rotate(90, expand=True),
+        "flip": img.transpose(Image.FLIP_LEFT_RIGHT),
+        "jpeg": img,  # saved below with heavy JPEG compression
+    }
+
+
+def generate_images(rng, out_dir, n, manifest):
+    os.makedirs(out_dir, exist_ok=True)
+    for i in range(n):
+        asset_id = f"image-{i:06d}"
+        img = make_image(rng)
+        path = os.path.join(out_dir, f"{asset_id}.png")
+        img.save(path)
+        manifest.append({"modality": "image", "id": asset_id, "path": path, "role": "original"})
+
+        if i % 4 == 0:
+            for role, variant in image_variants(img).items():
+                if role == "jpeg":
+                    vpath = os.path.join(out_dir, f"{asset_id}.{role}.jpg")
+                    variant.save(vpath, quality=30)
+                else:
+                    vpath = os.path.join(out_dir, f"{asset_id}.{role}.png")
+                    variant.save(vpath)
+                manifest.append({"modality": "image", "id": f"{asset_id}.{role}", "path": vpath,
+                                 "role": role, "source": asset_id})
+
+
+def generate_videos(rng, out_dir, n, manifest, duration=12, fps=5):
+    try:
+        import numpy as np
+        from moviepy import VideoClip
+    except ImportError:
+        print("moviepy not installed; skipping synthetic videos.")
+        return
+
+    os.makedirs(out_dir, exist_ok=True)
+    for i in range(n):
+        asset_id = f"video-{i:06d}"
+        # A slow pan across a random still, so sampled frames differ but stay deterministic
+        base = np.asarray(make_image(rng, size=320))
+
+        def frame(t, base=base):
+            shift = int(t * 8) % base.shape[1]
+            return np.roll(base, shift, axis=1)[40:280, :]
+
+        clip = VideoClip(frame, duration=duration)
+        path = os.path.join(out_dir, f"{asset_id}.mp4")
+        clip.write_videofile(path, fps=fps, logger=None)
+        manifest.append({"modality": "video", "id": asset_id, "path": path, "role": "original"})
+
+        # Re-encoded copy at a lower bitrate (a typical re-upload)
+        vpath = os.path.join(out_dir, f"{asset_id}.reencode.mp4")
+        clip.write_videofile(vpath, fps=fps, bitrate="200k", logger=None)
+        manifest.append({"modality": "video", "id": f"{asset_id}.reencode", "path": vpath,
+                         "role": "reencode", "source": asset_id})
+        clip.close()
+
+
+def generate(out_dir, texts=200, images=100, videos=0, seed=1234):
+    rng = random.Random(seed)
+    manifest = []
+    generate_texts(rng, os.path.join(out_dir, 'text'), texts, manifest)
+    generate_images(rng, os.path.join(out_dir, 'images'), images, manifest)
+    if videos:
+        generate_videos(rng, os.path.join(out_dir, 'videos'), videos, manifest)
+
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    with open(manifest_path, 'w') as f:
+        json.dump({"seed": seed, "assets": manifest}, f, indent=1)
+    return manifest_path
+
+
+def load_manifest(path):
+    with open(path) as f:
+        return json.load(f)["assets"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic corpus generator")
+    parser.add_argument('--out', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+    parser.add_argument('--texts', type=int, default=200)
+    parser.add_argument('--images', type=int, default=100)
+    parser.add_argument('--videos', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    path = generate(args.out, args.texts, args.images, args.videos, args.seed)
+    print(f"Corpus written. Manifest: {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Semantic-stage memory and recall: the exact float32 scan vs product-quantised codes.
+
+Writes one base index segment per mode (as bench/parallel_scoring.py does, no SQLite
+rows) holding --rows embeddings. For each PQ mode it also trains the codebooks and
+encodes the rows through TextIndex._derive_base, as a merge does. Then, in a fresh
+process per mode, it maps the index, runs the queries through TextIndex.semantic and
+reports:
+  - embedding bytes per asset the scan reads (float32: dim * 4, PQ: one byte per subspace)
+  - resident memory the mapped index and queries added to the worker, split into
+    anonymous memory (heap: what the index must keep in RAM) and pages of the mapped
+    segment files (page cache the kernel can drop and re-read; PQ touches only the
+    codes plus the re-ranked rows of the exact vectors)
+  - query latency, and recall@1 / recall@10 against exact cosine, for two query sets:
+    "near" (a stored embedding plus noise, e.g. a paraphrase of a registered text)
+    and "fresh" (new embeddings from the same distribution)
+
+Embeddings are synthetic (clustered, with a decaying spectrum like sentence embeddings)
+unless --db points at a database with SBERT embeddings in text_assets; its rows are
+then indexed and its last --queries embeddings are held out as the fresh queries.
+
+Usage (from originality-engine/):
+    python bench/embedding_pq.py --rows 200000 --subspaces 48,96
+    python bench/embedding_pq.py --db audioFiles/fingerprints.db --subspaces 48,96
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+for var in ('OPENBLAS_NUM_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(var, '1')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+
+import numpy as np
+
+K = 10
+
+
+def synthetic(rows, dim, rng, topics=300):
+    """Unit vectors around `topics` centres in a random basis, with a 1/sqrt(i) spectrum."""
+    basis = np.linalg.qr(rng.standard_normal((dim, dim)))[0].astype(np.float32)
+    spectrum = (1.0 / np.sqrt(np.arange(1, dim + 1))).astype(np.float32)
+    centres = rng.standard_normal((topics, min(64, dim))).astype(np.float32)
+    out = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, 65536):
+        n = min(65536, rows - start)
+        z = rng.standard_normal((n, dim)).astype(np.float32) * spectrum * 0.6
+        z[:, :centres.shape[1]] += centres[rng.integers(0, topics, n)] * 0.35
+        block = z @ basis.T
+        out[start:start + n] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return out
+
+
+def from_db(db_path):
+    conn = sqlite3.connect(db_path)
+    blobs = conn.execute('SELECT embedding FROM text_assets WHERE embedding IS NOT NULL AND deleted = 0').fetchall()
+    conn.close()
+    vectors = np.stack([np.asarray(pickle.loads(blob), dtype=np.float32).ravel() for (blob,) in blobs])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def normalise(x):
+    return (x / np.linalg.norm(x, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_top(stored, queries):
+    return np.argsort(-(queries @ stored.T), axis=1)[:, :K]
+
+
+def write_base(db_path, stored, subspaces):
+    """Base segment of `stored` for a TextIndex with `subspaces` (0: exact); returns train+encode seconds."""
+    from common.mmap_index import SegmentStore, generation_dir
+    from textFiles.index import TextIndex
+    from textFiles.originality import TextOriginalityRequest
+
+    TextOriginalityRequest(db_path=db_path, semantic=False, write_behind=False)
+    index = TextIndex(db_path, 128, pq_subspaces=subspaces, merge_rows=0)
+    rows = len(stored)
+    arrays = {"rows": np.arange(1, rows + 1, dtype=np.int64), "ids": np.arange(rows).astype(str),
+              "emb": stored, "has_emb": np.ones(rows, dtype=bool)}
+    started = time.perf_counter()
+    arrays.update(index._derive_base(arrays, None, None))
+    seconds = time.perf_counter() - started
+    if subspaces and 'pq_codes' not in arrays:
+        raise SystemExit(f"{subspaces} subspaces do not divide dim {stored.shape[1]} into an even count")
+    SegmentStore(generation_dir(db_path, 'text', 0)).write(
+        arrays, dict(index._params(), generation=0, last_row=rows, last_tombstone=0))
+    return seconds
+
+
+def rss_mb():
+    """(anonymous, file-backed) resident MB of this process."""
+    fields = {}
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Rss', 'Anonymous'):
+                    fields[name] = int(value.split()[0]) / 1024
+    except OSError:
+        return float('nan'), float('nan')
+    return fields['Anonymous'], fields['Rss'] - fields['Anonymous']
+
+
+def evict(db_path):
+    """Drops the index segment files from the page cache (where the OS supports it)."""
+    from common.mmap_index import index_root
+
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for path in glob.glob(os.path.join(index_root(db_path), '*', '*.npy')):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+
+
+def worker(db_path, subspaces, rerank, query_sets, results):
+    from textFiles.index import TextIndex
+
+    evict(db_path)
+    before = rss_mb()
+    index = TextIndex(db_path, 128, pq_subspaces=subspaces, rerank=rerank, merge_rows=0)
+    conn = sqlite3.connect(db_path)
+    index.refresh(conn)
+    conn.close()
+    out = {}
+    for name, (queries, truth) in query_sets.items():
+        latencies, hit1, hit10 = [], 0, 0
+        for query, expected in zip(queries, truth):
+            t0 = time.perf_counter()
+            top, _ = index.semantic(query, K)
+            latencies.append(time.perf_counter() - t0)
+            found = [int(text_id) for text_id, _ in top]
+            hit1 += bool(found) and found[0] == expected[0]
+            hit10 += len(set(found) & set(expected.tolist()))
+        out[name] = {"p50_ms": float(np.median(latencies)) * 1000, "recall1": hit1 / len(queries),
+                     "recall10": hit10 / (K * len(queries))}
+    after = rss_mb()
+    out["anon_mb"], out["file_mb"] = after[0] - before[0], after[1] - before[1]
+    results.put(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PQ embedding compression benchmark")
+    parser.add_argument('--rows', type=int, default=200000, help='Synthetic embeddings indexed')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--subspaces', default='48,96', help='PQ subspace counts to compare with exact')
+    parser.add_argument('--rerank', type=int, default=200, help='Candidates re-ranked on exact vectors')
+    parser.add_argument('--queries', type=int, default=200, help='Queries per query set')
+    parser.add_argument('--noise', type=float, default=0.03, help='Noise added to stored embeddings for near queries')
+    parser.add_argument('--db', default=None, help='Index the SBERT embeddings of this DB instead')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    if args.db:
+        vectors = from_db(args.db)
+        stored, fresh = vectors[:-args.queries], vectors[-args.queries:]
+    else:
+        vectors = synthetic(args.rows + args.queries, args.dim, rng)
+        stored, fresh = vectors[:args.rows], vectors[args.rows:]
+    near = normalise(stored[rng.integers(0, len(stored), args.queries)]
+                     + rng.standard_normal((args.queries, stored.shape[1])).astype(np.float32) * args.noise)
+    query_sets = {"near": (near, exact_top(stored, near)), "fresh": (fresh, exact_top(stored, fresh))}
+    dim = stored.shape[1]
+    print(f"{len(stored)} embeddings of {dim} dims ({'from ' + args.db if args.db else 'synthetic'}), "
+          f"{args.queries} queries per set, re-rank {args.rerank}")
+    print(f"{'mode':<8} {'B/asset':>8} {'anon MB':>8} {'file MB':>8} {'build s':>8} "
+          f"{'near p50':>9} {'R@1':>6} {'R@10':>6} {'fresh p50':>10} {'R@1':>6} {'R@10':>6}")
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory() as tmp:
+        for subspaces in [0] + [int(m) for m in args.subspaces.split(',')]:
+            db_path = os.path.join(tmp, f"pq{subspaces}.db")
+            build_s = write_base(db_path, stored, subspaces)
+            results = context.Queue()
+            process = context.Process(target=worker, args=(db_path, subspaces, args.rerank, query_sets, results))
+            process.start()
+            r = results.get()
+            process.join()
+            mode = f"pq{subspaces}" if subspaces else "exact"
+            per_asset = subspaces if subspaces else dim * 4
+            print(f"{mode:<8} {per_asset:>8} {r['anon_mb']:>8.0f} {r['file_mb']:>8.0f} {build_s:>8.1f} "
+                  f"{r['near']['p50_ms']:>9.1f} {r['near']['recall1']:>6.3f} {r['near']['recall10']:>6.3f} "
+                  f"{r['fresh']['p50_ms']:>10.1f} {r['fresh']['recall1']:>6.3f} {r['fresh']['recall10']:>6.3f}")
+
+
+if __name__ == '__main__':
+    main()
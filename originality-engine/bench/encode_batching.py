@@ -0,0 +1,131 @@
+"""
+Throughput benchmark for SBERT micro-batching.
+
+Runs N concurrent clients that each encode a stream of documents, once with
+the batcher disabled (one model.encode per request) and once enabled.
+
+Usage (from originality-engine/):
+    python bench/encode_batching.py --clients 50 --requests 20
+    python bench/encode_batching.py --url http://localhost:5002   # against a running text server
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ENGINE_ROOT, 'textFiles'))
+
+WORDS = ("asset license owner token chain ledger content media stream audio video image "
+         "text rights royalty creator market contract hash block network digital copy").split()
+
+
+def make_doc(rng, n_words=120):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words))
+
+
+def run_clients(n_clients, n_requests, work):
+    """Runs `work(client_idx, req_idx)` from n_clients threads. Returns elapsed seconds."""
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client(idx):
+        barrier.wait()
+        for r in range(n_requests):
+            work(idx, r)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(n_clients)]
+    for t in threads: t.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for t in threads: t.join()
+    return time.perf_counter() - started
+
+
+def bench_inprocess(args):
+    from originality import TextOriginalityRequest
+
+    rng = random.Random(42)
+    docs = [make_doc(rng) for _ in range(256)]
+    results = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        for batching in (False, True):
+            engine = TextOriginalityRequest(db_path=db_path, batching=batching,
+                                            max_batch_size=args.max_batch_size,
+                                            max_wait_ms=args.max_wait_ms)
+            if not engine.model:
+                print("SBERT model unavailable; nothing to benchmark.")
+                return None
+
+            engine.compute_embedding(docs[0])  # warm-up
+            elapsed = run_clients(args.clients, args.requests,
+                                  lambda c, r: engine.compute_embedding(docs[(c * args.requests + r) % len(docs)]))
+            total = args.clients * args.requests
+            key = "batched" if batching else "unbatched"
+            results[key] = {
+                "requests": total,
+                "seconds": round(elapsed, 3),
+                "encodes_per_sec": round(total / elapsed, 2)
+            }
+            if engine.batcher:
+                results[key]["batcher"] = engine.batcher.stats()
+                engine.batcher.close()
+
+    if "batched" in results and "unbatched" in results:
+        results["speedup"] = round(results["batched"]["encodes_per_sec"] / results["unbatched"]["encodes_per_sec"], 2)
+    return results
+
+
+def bench_http(args):
+    import requests
+
+    rng = random.Random(42)
+    docs = [make_doc(rng).encode('utf-8') for _ in range(256)]
+    session_local = threading.local()
+    errors = []
+
+    def work(c, r):
+        session = getattr(session_local, 'session', None)
+        if session is None:
+            session = session_local.session = requests.Session()
+        payload = docs[(c * args.requests + r) % len(docs)]
+        resp = session.post(f"{args.url}/check", files={'file': ('bench.txt', payload)})
+        if resp.status_code != 200:
+            errors.append(resp.status_code)
+
+    elapsed = run_clients(args.clients, args.requests, work)
+    total = args.clients * args.requests
+    result = {
+        "requests": total,
+        "errors": len(errors),
+        "seconds": round(elapsed, 3),
+        "checks_per_sec": round(total / elapsed, 2)
+    }
+    try:
+        result["server_stats"] = requests.get(f"{args.url}/stats").json()
+    except Exception:
+        pass
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SBERT encode micro-batching benchmark")
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--requests', type=int, default=20, help='Requests per client')
+    parser.add_argument('--max-batch-size', type=int, default=16)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--url', help='Benchmark a running text server instead of in-process')
+    args = parser.parse_args()
+
+    results = bench_http(args) if args.url else bench_inprocess(args)
+    if results is not None:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
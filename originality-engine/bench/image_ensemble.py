@@ -0,0 +1,255 @@
+"""
+Accuracy and latency of the cascaded hash ensemble against the pHash-only path.
+
+Registers the tests/images originals (original.png, avengers.jpg and test1flipped.png,
+the mirror of the image test1half.png / test1part.png are cut from) plus --distractors
+synthetic images, then checks tests/images' own derived copies, edited copies of every
+original (heavy JPEG, colour / brightness / contrast changes, crops, rotation) and
+--negatives unseen images, once through the engine and once through the previous
+path (full-resolution pHash per segment, one Hamming scan, distance < 10), kept here
+as the baseline. --filler adds random hash rows to both DBs to show how the candidate
+lookup scales against the full scan.
+
+Usage (from originality-engine/):
+    python bench/image_ensemble.py
+    python bench/image_ensemble.py --distractors 500 --filler 1000000
+"""
+import argparse
+import io
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+from PIL import Image, ImageEnhance, ImageOps
+
+import corpus as corpus_gen
+
+IMAGES_DIR = os.path.join(ENGINE_ROOT, 'tests', 'images')
+ORIGINALS = {"original": "original.png", "avengers": "avengers.jpg", "test1": "test1flipped.png"}
+DERIVED = {"test1half.png": "test1", "test1part.png": "test1"}
+NO_MATCH = 255  # distance given to dead rows by the baseline scan (real ones are 0-64)
+
+
+def jpeg(img, quality):
+    buf = io.BytesIO()
+    img.convert('RGB').save(buf, 'JPEG', quality=quality)
+    buf.seek(0)
+    return Image.open(buf)
+
+
+def hue_shift(img, amount=40):
+    h, s, v = img.convert('HSV').split()
+    return Image.merge('HSV', (h.point(lambda x: (x + amount) % 256), s, v)).convert('RGB')
+
+
+EDITS = {
+    "jpeg_q5": lambda img: jpeg(img, 5),
+    "jpeg_q15": lambda img: jpeg(img, 15),
+    "small_jpeg": lambda img: jpeg(img.resize((max(1, img.width // 4), max(1, img.height // 4))), 20),
+    "brightness": lambda img: ImageEnhance.Brightness(img).enhance(1.5),
+    "contrast": lambda img: ImageEnhance.Contrast(img).enhance(0.5),
+    "desaturate": lambda img: ImageEnhance.Color(img).enhance(0.2),
+    "grayscale": lambda img: ImageOps.grayscale(img).convert('RGB'),
+    "hue_shift": hue_shift,
+    "crop_top_half": lambda img: img.crop((0, 0, img.width, img.height // 2)),
+    "rotate_90": lambda img: img.rotate(90, expand=True),
+}
+
+
+class PhashOnly:
+    """The previous check path: digest lookup, full-resolution pHash per segment, one pHash scan."""
+
+    def __init__(self, db_path, engine):
+        import imagehash
+        from imageFiles.index import ImageIndex
+        self.imagehash = imagehash
+        self.db_path = db_path
+        self.engine = engine  # for the segment layout only
+        self.index = ImageIndex(db_path)
+
+    def register(self, path, asset_id):
+        img = Image.open(path)
+        rows = [(asset_id, str(self.imagehash.phash(segment)), name)
+                for name, segment in self.engine._generate_segments(img).items()]
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.executemany('INSERT INTO image_hashes (image_id, phash, segment) VALUES (?, ?, ?)', rows)
+        conn.close()
+
+    def check(self, path):
+        from common.digests import sha256_file
+        conn = sqlite3.connect(self.db_path)
+        existing = self.engine._find_digest(conn, sha256_file(path))
+        conn.close()
+        if existing:
+            return existing, 0
+        img = Image.open(path)
+        hashes = [self.imagehash.phash(o) for o in (img, img.rotate(90, expand=True), img.rotate(180, expand=True),
+                                                    img.rotate(270, expand=True), img.transpose(Image.FLIP_LEFT_RIGHT))]
+        conn = sqlite3.connect(self.db_path)
+        self.index.refresh(conn)
+        conn.close()
+        distance, match_id = self.nearest([int(str(h), 16) for h in hashes])
+        return match_id if distance < 10 else None, len(self.index)
+
+    def nearest(self, hashes):
+        """
+        Closest stored pHash to any of `hashes` (ints), by a full Hamming scan split over
+        the scoring threads. Ties go to the earlier query hash, then the earlier row.
+        Returns (distance, image_id) or (inf, None).
+        """
+        from common.mmap_index import map_chunks
+        from imageFiles.index import popcount64
+        targets = np.asarray(hashes, dtype=np.uint64)[:, None]
+        index = self.index
+        with index._lock:
+            base, dead, delta = index.base, index.dead, index.delta()
+        mins, rows, found = [], [], []
+        for segment, dead_rows in ((base, dead), (delta, None)):
+            if segment is None or not len(segment['rows']):
+                continue
+
+            def score(start, stop, segment=segment, dead_rows=dead_rows):
+                # Per query hash: the smallest distance in the chunk and its first row
+                dist = popcount64(segment['phash'][start:stop] ^ targets)
+                if dead_rows is not None:
+                    dist[:, dead_rows[start:stop]] = NO_MATCH
+                first = dist.argmin(axis=1)
+                return dist[np.arange(len(targets)), first], first + start
+
+            for chunk_min, chunk_row in map_chunks(score, len(segment['rows']), index.threads):
+                mins.append(chunk_min)
+                rows.append(chunk_row)
+                found.append(segment)
+        if not mins:
+            return float('inf'), None
+        # For each query hash the first chunk (earliest rows) holding its minimum, then the first query hash
+        mins = np.stack(mins)
+        chunk_of = mins.argmin(axis=0)
+        per_target = mins[chunk_of, np.arange(len(targets))]
+        t = int(per_target.argmin())
+        if per_target[t] >= NO_MATCH:
+            return float('inf'), None
+        chunk = int(chunk_of[t])
+        return int(per_target[t]), str(found[chunk]['ids'][int(rows[chunk][t])])
+
+
+class Ensemble:
+    def __init__(self, db_path):
+        from imageFiles.originality import CHECK_ROWS, ImageOriginalityRequest
+        self.engine = ImageOriginalityRequest(db_path=db_path)
+        self.index = self.engine.index
+        self.scored = CHECK_ROWS.labels(kind='scored')
+
+    def register(self, path, asset_id):
+        self.engine.register_image(path, asset_id)
+
+    def check(self, path):
+        before = self.scored.value
+        classification, match_id, _ = self.engine.check_originality(path)
+        return (match_id if classification != "ORIGINAL" else None), self.scored.value - before
+
+
+def fill(db_path, rows, ensemble, rng):
+    """Random 64-bit hash rows (dhash etc. only for the ensemble DB)."""
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for start in range(0, rows, 100000):
+            n = min(100000, rows - start)
+            values = rng.integers(0, 2 ** 63, size=(n, 4), dtype=np.uint64) << np.uint64(1)
+            if ensemble:
+                conn.executemany('INSERT INTO image_hashes (image_id, segment, phash, dhash, whash, colorhash) '
+                                 'VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(f"filler-{start + i}", 'full', *(f"{int(v):016x}" for v in values[i]))
+                                  for i in range(n)])
+            else:
+                conn.executemany('INSERT INTO image_hashes (image_id, segment, phash) VALUES (?, ?, ?)',
+                                 [(f"filler-{start + i}", 'full', f"{int(values[i, 0]):016x}") for i in range(n)])
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Hash ensemble vs pHash-only benchmark")
+    parser.add_argument('--distractors', type=int, default=200, help='Extra registered synthetic images')
+    parser.add_argument('--negatives', type=int, default=100, help='Unseen images checked (expected ORIGINAL)')
+    parser.add_argument('--filler', type=int, default=0, help='Random hash rows added to both DBs')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Registered set and the checks: (path, expected asset id or None, role)
+        registered = [(os.path.join(IMAGES_DIR, name), asset_id) for asset_id, name in ORIGINALS.items()]
+        checks = [(os.path.join(IMAGES_DIR, name), source, "tests_images") for name, source in DERIVED.items()]
+        sources = [(Image.open(path).convert('RGB'), asset_id) for path, asset_id in registered]
+        for i in range(args.distractors):
+            path = os.path.join(tmp, f"distractor-{i}.png")
+            img = corpus_gen.make_image(rng)
+            img.save(path)
+            registered.append((path, f"distractor-{i}"))
+            if i < 20:
+                sources.append((img, f"distractor-{i}"))
+        for img, asset_id in sources:
+            for role, edit in EDITS.items():
+                path = os.path.join(tmp, f"{asset_id}.{role}.png")
+                edit(img).save(path)
+                checks.append((path, asset_id, role))
+        for i in range(args.negatives):
+            path = os.path.join(tmp, f"negative-{i}.png")
+            corpus_gen.make_image(rng).save(path)
+            checks.append((path, None, "unseen"))
+
+        results = {}
+        for name in ("phash_only", "ensemble"):
+            db_path = os.path.join(tmp, f"{name}.db")
+            ensemble = Ensemble(db_path)
+            runner = ensemble if name == "ensemble" else PhashOnly(db_path, ensemble.engine)
+            started = time.perf_counter()
+            for path, asset_id in registered:
+                runner.register(path, asset_id)
+            register_s = time.perf_counter() - started
+            if args.filler:
+                fill(db_path, args.filler, name == "ensemble", np.random.default_rng(args.seed))
+            # Load the index (and let its background merge finish) outside the timings
+            runner.check(checks[0][0])
+            while runner.index._merging:
+                time.sleep(0.1)
+            runner.check(checks[0][0])
+            latencies, scored, roles = [], [], {}
+            for path, expected, role in checks:
+                t0 = time.perf_counter()
+                found, rows = runner.check(path)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                scored.append(rows)
+                ok, total = roles.get(role, (0, 0))
+                roles[role] = (ok + (found == expected), total + 1)
+            results[name] = {"register_ms": register_s * 1000 / len(registered), "roles": roles,
+                             "p50": np.percentile(latencies, 50), "p95": np.percentile(latencies, 95),
+                             "scored": float(np.mean(scored))}
+            ensemble = runner = None
+
+    corpus_rows = (len(registered) * 9) + args.filler
+    print(f"\n{len(registered)} images registered ({corpus_rows} segment rows), {len(checks)} checks")
+    print(f"{'role':<15} {'phash_only':>11} {'ensemble':>11}")
+    for role in results["ensemble"]["roles"]:
+        cells = [f"{ok}/{total}".rjust(11) for ok, total in (results[n]["roles"][role] for n in results)]
+        print(f"{role:<15} " + " ".join(cells))
+    totals = {n: [sum(v) for v in zip(*r["roles"].values())] for n, r in results.items()}
+    print(f"{'accuracy':<15} " + " ".join(f"{ok / total:11.3f}" for ok, total in totals.values()))
+    print(f"\n{'':<15} {'phash_only':>11} {'ensemble':>11}")
+    for key, label in (("register_ms", "register ms"), ("p50", "check p50 ms"), ("p95", "check p95 ms"),
+                       ("scored", "rows scored")):
+        print(f"{label:<15} " + " ".join(f"{results[n][key]:11.2f}" for n in results))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Multi-process load time, query latency and memory of the memory-mapped indexes.
+
+Fills a scratch DB with --size synthetic text rows (random MinHash signatures and,
+with --dim, embeddings) and --size / 9 images' segment hashes, writes the on-disk base
+segments once, then starts --workers processes that each open the indexes and run
+queries. With --no-mmap every worker loads the rows from SQLite into private memory
+instead (the behaviour before the shared index files). Memory is read from
+/proc/self/smaps_rollup (Linux): PSS splits shared pages between the processes mapping
+them, so its total is what the workers really cost together.
+
+Usage (from originality-engine/):
+    python bench/mmap_index.py --size 100000 --workers 4
+    python bench/mmap_index.py --size 100000 --workers 4 --no-mmap
+"""
+import argparse
+import multiprocessing
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+
+import numpy as np
+
+NUM_PERM = 128
+
+
+def signature(template, hashvalues):
+    minhash = template.copy()
+    minhash.hashvalues = hashvalues
+    return minhash
+
+
+def fill(db_path, size, dim, seed):
+    from datasketch import MinHash
+    from imageFiles.originality import ImageOriginalityRequest
+    from textFiles.originality import TextOriginalityRequest
+
+    TextOriginalityRequest(db_path=db_path, semantic=False)
+    ImageOriginalityRequest(db_path=db_path)
+    rng = np.random.default_rng(seed)
+    template = MinHash(num_perm=NUM_PERM)
+    conn = sqlite3.connect(db_path)
+    with conn:
+        for start in range(0, size, 5000):
+            n = min(5000, size - start)
+            hashvalues = rng.integers(0, 2 ** 32, size=(n, NUM_PERM), dtype=np.uint64)
+            embeddings = rng.normal(size=(n, dim)).astype(np.float32) if dim else [None] * n
+            conn.executemany('INSERT INTO text_assets (text_id, signature, embedding) VALUES (?, ?, ?)',
+                             [(f"t{start + i}", pickle.dumps(signature(template, hashvalues[i])),
+                               pickle.dumps(embeddings[i]) if dim else None) for i in range(n)])
+        phashes = rng.integers(0, 2 ** 63, size=size, dtype=np.uint64)
+        conn.executemany('INSERT INTO image_hashes (image_id, phash, segment) VALUES (?, ?, ?)',
+                         [(f"i{i // 9}", f"{int(h):016x}", 'full') for i, h in enumerate(phashes)])
+    conn.close()
+
+
+def memory():
+    """(rss, pss) in MiB from /proc/self/smaps_rollup, or (None, None) elsewhere."""
+    try:
+        fields = {}
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(':')] = int(parts[1])
+        return fields['Rss'] / 1024, fields['Pss'] / 1024
+    except (OSError, KeyError):
+        return None, None
+
+
+def worker(db_path, queries, dim, barrier, results):
+    from imageFiles.index import HASHES, ImageIndex
+    from textFiles.index import TextIndex
+
+    rng = np.random.default_rng(os.getpid())
+    conn = sqlite3.connect(db_path)
+    merge_rows = 0  # never merge from the workers; the parent wrote the base
+    started = time.perf_counter()
+    text = TextIndex(db_path, NUM_PERM, 0.5, merge_rows=merge_rows)
+    image = ImageIndex(db_path, merge_rows=merge_rows)
+    text.refresh(conn)
+    image.refresh(conn)
+    load_s = time.perf_counter() - started
+
+    from datasketch import MinHash
+    template = MinHash(num_perm=NUM_PERM)
+    timings = {"near": [], "semantic": [], "image": []}
+    for _ in range(queries):
+        minhash = signature(template, rng.integers(0, 2 ** 32, NUM_PERM, dtype=np.uint64))
+        t0 = time.perf_counter()
+        text.near_duplicates(minhash, 5)
+        timings["near"].append(time.perf_counter() - t0)
+        if dim:
+            t0 = time.perf_counter()
+            text.semantic(rng.normal(size=dim).astype(np.float32), 5)
+            timings["semantic"].append(time.perf_counter() - t0)
+        t0 = time.perf_counter()
+        image.search([{name: int(h) for name, h in zip(HASHES, rng.integers(0, 2 ** 63, len(HASHES), dtype=np.uint64))}
+                      for _ in range(5)])
+        timings["image"].append(time.perf_counter() - t0)
+
+    barrier.wait()  # every worker holds its index: shared pages are split between all of them
+    rss, pss = memory()
+    results.put({"load_s": load_s, "rss_mb": rss, "pss_mb": pss,
+                 **{f"{k}_ms": float(np.median(v)) * 1000 for k, v in timings.items() if v}})
+    barrier.wait()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory-mapped index benchmark")
+    parser.add_argument('--size', type=int, default=100000, help='Text rows (and image segment rows)')
+    parser.add_argument('--dim', type=int, default=384, help='Embedding width (0: MinHash only)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--no-mmap', action='store_true', help='Load every row into each worker instead')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'mmap.db')
+        if args.no_mmap:
+            # An empty index directory: every row is delta, loaded from SQLite per process
+            os.environ['ORIGINALITY_INDEX_DIR'] = os.path.join(tmp, 'empty')
+        started = time.perf_counter()
+        fill(db_path, args.size, args.dim, args.seed)
+        print(f"Filled {args.size} text rows and {args.size} image segment rows in {time.perf_counter() - started:.1f}s")
+
+        if not args.no_mmap:
+            from imageFiles.index import ImageIndex
+            from textFiles.index import TextIndex
+            conn = sqlite3.connect(db_path)
+            started = time.perf_counter()
+            for index in (TextIndex(db_path, NUM_PERM, 0.5, merge_rows=0), ImageIndex(db_path, merge_rows=0)):
+                index.refresh(conn)
+                index.merge()
+            conn.close()
+            print(f"Wrote base segments in {time.perf_counter() - started:.1f}s")
+
+        ctx = multiprocessing.get_context('spawn')
+        barrier, results = ctx.Barrier(args.workers), ctx.Queue()
+        procs = [ctx.Process(target=worker, args=(db_path, args.queries, args.dim, barrier, results))
+                 for _ in range(args.workers)]
+        for p in procs:
+            p.start()
+        rows = [results.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    mode = "delta (private)" if args.no_mmap else "mmap (shared)"
+    print(f"\n{mode}, {args.workers} workers, {args.size} rows, dim {args.dim}")
+    print(f"{'load s':>8} {'near ms':>8} {'sem ms':>8} {'image ms':>9} {'RSS MiB':>8} {'PSS MiB':>8}")
+    for row in rows:
+        print(f"{row['load_s']:8.2f} {row['near_ms']:8.3f} {row.get('semantic_ms', 0):8.3f} {row['image_ms']:9.3f} "
+              f"{row['rss_mb'] or 0:8.1f} {row['pss_mb'] or 0:8.1f}")
+    if rows[0]['pss_mb'] is not None:
+        print(f"Total PSS: {sum(r['pss_mb'] for r in rows):.1f} MiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""
+Query latency of the full-scan scoring stages against the scoring thread count.
+
+Writes synthetic base segments straight into the index file layout (no SQLite rows):
+--text rows of --dim embeddings for the semantic cosine scan and --images segment
+hashes, then times --queries queries at each --threads count.
+The text segment holds only the arrays the semantic scan reads; MinHash/LSH search
+scores a handful of candidates and is not part of this benchmark. Image checks use
+the dHash candidate lookup (ImageIndex.search) rather than a scan, so the image row
+is timed once, as the reference the scan is measured against.
+
+BLAS threads are pinned to 1 (unless already set) so matmul threads do not compete
+with the scoring pool; run on an otherwise idle host.
+
+Usage (from originality-engine/):
+    python bench/parallel_scoring.py --text 1000000 --images 10000000 --threads 1,2,4,8,16,32
+    python bench/parallel_scoring.py --text 100000 --images 1000000 --threads 1,2
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+for var in ('OPENBLAS_NUM_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+    os.environ.setdefault(var, '1')
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+
+import numpy as np
+
+BLOCK = 1 << 20
+
+
+def write_text(index, rows, dim, rng):
+    from common.mmap_index import SegmentStore, generation_dir
+    emb = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, BLOCK):
+        block = rng.standard_normal((min(BLOCK, rows - start), dim), dtype=np.float32)
+        emb[start:start + len(block)] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    arrays = {"rows": np.arange(1, rows + 1, dtype=np.int64), "ids": np.char.add('t', np.arange(rows).astype(str)),
+              "emb": emb, "has_emb": np.ones(rows, dtype=bool)}
+    SegmentStore(generation_dir(index.db_path, 'text', 0)).write(
+        arrays, dict(index._params(), generation=0, last_row=rows, last_tombstone=0))
+
+
+def write_images(index, rows, rng):
+    from common.mmap_index import SegmentStore, generation_dir
+    from imageFiles.index import HASHES
+    arrays = {"rows": np.arange(1, rows + 1, dtype=np.int64),
+              "ids": np.char.add('i', (np.arange(rows) // 9).astype(str)),
+              "segment": (np.arange(rows) % 9).astype(np.uint8),
+              "has_ensemble": np.ones(rows, dtype=bool)}
+    for name in HASHES:
+        arrays[name] = rng.integers(0, 2 ** 63, rows, dtype=np.uint64) << np.uint64(1)
+    arrays.update(index._derive(arrays))
+    SegmentStore(generation_dir(index.db_path, 'image', 0)).write(
+        arrays, dict(index._params(), generation=0, last_row=rows, last_tombstone=0))
+
+
+def latency(fn, queries):
+    fn()  # warm the page cache
+    samples = []
+    for _ in range(queries):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return float(np.percentile(samples, 50)), float(np.percentile(samples, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parallel scoring scaling benchmark")
+    parser.add_argument('--text', type=int, default=1000000, help='Text assets (0 skips)')
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--images', type=int, default=10000000, help='Image segment hashes (0 skips)')
+    parser.add_argument('--threads', default='1,2,4,8,16,32')
+    parser.add_argument('--queries', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    from imageFiles.index import ImageIndex
+    from imageFiles.originality import ImageOriginalityRequest
+    from textFiles.index import TextIndex
+    from textFiles.originality import NUM_PERM, TextOriginalityRequest
+
+    rng = np.random.default_rng(args.seed)
+    threads = [int(t) for t in args.threads.split(',')]
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'scoring.db')
+        TextOriginalityRequest(db_path=db_path, semantic=False)
+        ImageOriginalityRequest(db_path=db_path)
+        conn = sqlite3.connect(db_path)
+        cases = []
+        if args.text:
+            text = TextIndex(db_path, NUM_PERM, merge_rows=0)
+            started = time.perf_counter()
+            write_text(text, args.text, args.dim, rng)
+            text.refresh(conn)
+            print(f"text: {args.text} x {args.dim} embeddings written in {time.perf_counter() - started:.1f}s")
+            query = rng.standard_normal(args.dim, dtype=np.float32)
+            cases.append(("semantic", text, lambda: text.semantic(query, 5)))
+        if args.images:
+            image = ImageIndex(db_path, merge_rows=0)
+            started = time.perf_counter()
+            write_images(image, args.images, rng)
+            image.refresh(conn)
+            print(f"image: {args.images} segment hashes written in {time.perf_counter() - started:.1f}s")
+            from imageFiles.index import HASHES
+            queries = [{name: int(h) for name, h in zip(HASHES, rng.integers(0, 2 ** 63, len(HASHES), dtype=np.uint64))}
+                       for _ in range(5)]
+            cases.append(("image", image, lambda: image.search(queries)))
+
+        print(f"\n{'stage':<10} {'threads':>7} {'p50 ms':>9} {'p95 ms':>9} {'speedup':>8}")
+        for name, index, fn in cases:
+            baseline = None
+            for count in threads if name != "image" else threads[:1]:  # search runs on the caller's thread
+                index.threads = count
+                p50, p95 = latency(fn, args.queries)
+                baseline = baseline or p50
+                print(f"{name:<10} {count:>7} {p50:9.2f} {p95:9.2f} {baseline / p50:7.2f}x")
+        conn.close()
+        text = image = cases = None  # release the maps before the directory is removed
+
+
+if __name__ == '__main__':
+    main()
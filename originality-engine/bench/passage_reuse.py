@@ -0,0 +1,106 @@
+"""
+Partial text reuse: whole-document MinHash vs the winnowed passage fingerprints.
+
+For each --sizes corpus size, registers that many long synthetic documents, then checks
+--checks new documents that each embed one passage (--passage-words words) copied from
+a registered document, plus --checks unseen documents. Reports how many copied passages
+the exact / MinHash stages catch on their own, how many the passage stage adds, false
+positives on the unseen documents, and the passage lookup latency. The lookup does one
+indexed query per query fingerprint, so its cost follows the query length, not the
+corpus size.
+
+Usage (from originality-engine/):
+    python bench/passage_reuse.py --sizes 100,1000,5000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+
+import corpus as corpus_gen
+
+
+def document(rng, words):
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(corpus_gen.make_sentence(rng))
+    return " ".join(sentences)
+
+
+def with_passage(rng, source, passage_words, words):
+    """A new document of about `words` words with `passage_words` consecutive words of `source` inside."""
+    source_words = source.split()
+    start = rng.randrange(0, max(1, len(source_words) - passage_words))
+    passage = " ".join(source_words[start:start + passage_words])
+    before = rng.randint(0, words - passage_words)
+    return " ".join((document(rng, before), passage, document(rng, words - passage_words - before)))
+
+
+def write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Passage reuse benchmark")
+    parser.add_argument('--sizes', default='100,1000', help='Registered documents per run')
+    parser.add_argument('--words', type=int, default=3000, help='Words per document')
+    parser.add_argument('--passage-words', type=int, default=300, help='Copied passage length')
+    parser.add_argument('--checks', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    from textFiles.originality import TextOriginalityRequest
+
+    print(f"{'docs':>6} {'fingerprints':>12} {'minhash':>8} {'+passage':>9} {'false pos':>9} "
+          f"{'lookups':>8} {'p50 ms':>7} {'p95 ms':>7} {'register ms':>11}")
+    for size in map(int, args.sizes.split(',')):
+        rng = random.Random(args.seed)
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = TextOriginalityRequest(db_path=os.path.join(tmp, 'passages.db'), semantic=False)
+            texts = []
+            started = time.perf_counter()
+            for i in range(size):
+                texts.append(document(rng, args.words))
+                engine.register_text(write(os.path.join(tmp, 'doc.txt'), texts[-1]), f"doc-{i}")
+            register_ms = (time.perf_counter() - started) * 1000 / size
+
+            minhash = passage = false_positives = 0
+            latencies, lookups = [], []
+            for i in range(args.checks):
+                source = rng.randrange(size)
+                copied = with_passage(rng, texts[source], args.passage_words, args.words)
+                result = engine.check(write(os.path.join(tmp, 'check.txt'), copied))
+                found = result["match_id"] == f"doc-{source}"
+                minhash += found and result["stage"] in ("exact", "minhash")
+                passage += found and result["stage"] == "passage"
+                t0 = time.perf_counter()
+                _, _, count = engine.passage_matches(copied)
+                latencies.append((time.perf_counter() - t0) * 1000)
+                lookups.append(count)
+
+                result = engine.check(write(os.path.join(tmp, 'check.txt'), document(rng, args.words)))
+                false_positives += result["classification"] != "ORIGINAL"
+
+            conn = sqlite3.connect(engine.db_path)
+            stored = conn.execute('SELECT COUNT(*) FROM text_fingerprints').fetchone()[0]
+            conn.close()
+            engine = None
+        print(f"{size:>6} {stored:>12} {minhash:>5}/{args.checks:<2} {minhash + passage:>6}/{args.checks:<2} "
+              f"{false_positives:>6}/{args.checks:<2} {np.mean(lookups):>8.0f} {np.percentile(latencies, 50):>7.2f} "
+              f"{np.percentile(latencies, 95):>7.2f} {register_ms:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
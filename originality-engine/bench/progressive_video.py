@@ -0,0 +1,93 @@
+"""
+Progressive (early-terminating) video checks against the full decode.
+
+Generates --videos synthetic videos of --duration seconds (bench/corpus.py: a slow pan
+across a random still, plus a low-bitrate re-encode of each) and --unseen videos that
+are never registered. Registers the originals with the in-process image engine, then
+checks the originals, the re-encodes and the unseen videos once with the full check and
+once progressively, reporting latency, key frames decoded and whether the verdict
+found the right asset. The synthetic videos have no soundtrack; with one, an early stop
+also skips the audio check.
+
+Usage (from originality-engine/):
+    python bench/progressive_video.py --videos 4 --duration 120
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+
+import corpus as corpus_gen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Progressive video check benchmark")
+    parser.add_argument('--videos', type=int, default=4, help='Registered videos')
+    parser.add_argument('--unseen', type=int, default=4, help='Unregistered videos checked')
+    parser.add_argument('--duration', type=int, default=120, help='Seconds per video')
+    parser.add_argument('--min-matches', type=int, default=3, help='Consistent frame matches to stop at')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['ORIGINALITY_DB_PATH'] = os.path.join(tmp, 'videos.db')
+        from imageFiles.originality import ImageOriginalityRequest
+        from videoFiles.originality import VideoOriginalityRequest, frame_times
+
+        manifest, unseen = [], []
+        corpus_gen.generate_videos(random.Random(args.seed), os.path.join(tmp, 'videos'), args.videos,
+                                   manifest, duration=args.duration)
+        corpus_gen.generate_videos(random.Random(args.seed + 1), os.path.join(tmp, 'unseen'), args.unseen,
+                                   unseen, duration=args.duration)
+        engine = VideoOriginalityRequest(image_engine=ImageOriginalityRequest(db_path=os.environ['ORIGINALITY_DB_PATH']))
+        engine.temp_dir = os.path.join(tmp, 'work')
+        os.makedirs(engine.temp_dir)
+        for item in manifest:
+            if item["role"] == "original":
+                engine.register_video(item["path"], item["id"])
+
+        checks = [(item["path"], item.get("source", item["id"]), item["role"]) for item in manifest]
+        checks += [(item["path"], None, "unseen") for item in unseen if item["role"] == "original"]
+        print(f"{args.videos} videos of {args.duration} s registered, {len(checks)} checks, "
+              f"stop at {args.min_matches} frame matches")
+        print(f"{'mode':<12} {'role':<9} {'correct':>8} {'frames':>7} {'p50 ms':>8} {'p95 ms':>8}")
+        for mode in ("full", "progressive"):
+            by_role = {}
+            for path, expected, role in checks:
+                t0 = time.perf_counter()
+                if mode == "full":
+                    result = engine.check_originality(path)
+                    frames = len(frame_times(args.duration))
+                else:
+                    for _, result in engine.check_progressive(path, min_matches=args.min_matches):
+                        pass
+                    frames = result["progressive"]["frames_checked"]
+                elapsed = (time.perf_counter() - t0) * 1000
+                if expected is None:
+                    correct = result["status"] == "Original"
+                elif mode == "progressive" and result["progressive"]["matched_asset"]:
+                    correct = result["progressive"]["matched_asset"] == expected
+                else:
+                    correct = result["status"] != "Original"
+                rows = by_role.setdefault(role, [])
+                rows.append((correct, frames, elapsed))
+            for role, rows in by_role.items():
+                latencies = [r[2] for r in rows]
+                frames = [r[1] for r in rows]
+                print(f"{mode:<12} {role:<9} {sum(r[0] for r in rows):>4}/{len(rows):<3} "
+                      f"{np.mean(frames):>7.1f} "
+                      f"{np.percentile(latencies, 50):>8.0f} {np.percentile(latencies, 95):>8.0f}")
+        engine = None
+
+
+if __name__ == '__main__':
+    main()
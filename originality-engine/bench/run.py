@@ -0,0 +1,236 @@
+"""
+Reproducible register / check benchmark for the originality engines.
+
+For every corpus size it registers that many originals into a fresh scratch DB, then
+checks derived variants (near-duplicates, paraphrases, crops, flips, re-encodes) plus
+unregistered originals. It reports throughput, p50/p95/p99 latency and match accuracy.
+Runs in-process by default or over HTTP against running services. Results are written
+as JSON (with the git commit) so runs can be diffed with bench/compare.py.
+
+Usage (from originality-engine/):
+    python bench/run.py --sizes 100,1000 --modalities text,image --no-semantic
+    python bench/run.py --sizes 200 --modalities video --videos 4
+    python bench/run.py --sizes 200 --http text=http://localhost:5002,image=http://localhost:8081
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import corpus as corpus_gen
+
+RESULTS_DIR = os.path.join(BENCH_DIR, 'results')
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values))))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, elapsed):
+    values = sorted(latencies)
+    return {
+        "ops": len(values),
+        "seconds": round(elapsed, 4),
+        "ops_per_sec": round(len(values) / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if values else None,
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+    }
+
+
+def timed_ops(items, op):
+    """Runs op(item) for each item; returns (results, latencies, elapsed)."""
+    results, latencies = [], []
+    started = time.perf_counter()
+    for item in items:
+        t0 = time.perf_counter()
+        results.append(op(item))
+        latencies.append(time.perf_counter() - t0)
+    return results, latencies, time.perf_counter() - started
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ENGINE_ROOT,
+                              capture_output=True, text=True).stdout.strip() or None
+    except Exception:
+        return None
+
+
+# --- adapters: uniform register(path, id) / check(path) -> matched id (or flag) per modality ---
+
+class InProcessAdapters:
+    def __init__(self, db_path, semantic):
+        from imageFiles.originality import ImageOriginalityRequest
+        from textFiles.originality import TextOriginalityRequest
+        from videoFiles.originality import VideoOriginalityRequest
+
+        self.text = TextOriginalityRequest(db_path=db_path, semantic=semantic)
+        self.image = ImageOriginalityRequest(db_path=db_path)
+        self.video = VideoOriginalityRequest(image_engine=self.image)
+
+    def register(self, modality, path, asset_id):
+        if modality == 'text':
+            return self.text.register_text(path, asset_id)[0]
+        if modality == 'image':
+            return self.image.register_image(path, asset_id)[0]
+        return self.video.register_video(path, asset_id)[0]
+
+    def check(self, modality, path):
+        if modality == 'text':
+            classification, match_id, _ = self.text.check_originality(path)
+            return match_id if classification != "ORIGINAL" else None
+        if modality == 'image':
+            classification, match_id, _ = self.image.check_originality(path)
+            return match_id if classification != "ORIGINAL" else None
+        result = self.video.check_originality(path)
+        return result.get("status") if result.get("status", "Original") != "Original" else None
+
+
+class HttpAdapters:
+    def __init__(self, urls, run_id):
+        import requests
+        self.session = requests.Session()
+        self.urls = urls
+        self.run_id = run_id  # prefixes ids so runs against a live DB never collide
+
+    def register(self, modality, path, asset_id):
+        with open(path, 'rb') as f:
+            resp = self.session.post(f"{self.urls[modality]}/register", files={'file': f},
+                                     data={'id': f"{self.run_id}-{asset_id}", 'type': modality})
+        return resp.status_code == 200
+
+    def check(self, modality, path):
+        with open(path, 'rb') as f:
+            resp = self.session.post(f"{self.urls[modality]}/check", files={'file': f}, data={'type': modality})
+        if resp.status_code != 200:
+            return None
+        data = resp.json()
+        if modality == 'text':
+            match = data.get("closest_match_id") if data.get("status") != "Original" else None
+        elif modality == 'image':
+            match = data.get("match_id") if data.get("status") != "ORIGINAL" else None
+        else:
+            return data.get("status") if data.get("status", "Original") != "Original" else None
+        prefix = f"{self.run_id}-"
+        return match[len(prefix):] if match and match.startswith(prefix) else match
+
+
+def matches_source(modality, found, source):
+    if source is None:
+        return found is None
+    if modality == 'video':
+        return found is not None
+    return found == source
+
+
+def bench_modality(adapters, modality, assets, size, max_queries):
+    originals = [a for a in assets if a["modality"] == modality and a["role"] == "original"]
+    registered = originals[:size]
+    registered_ids = {a["id"] for a in registered}
+    # Queries: variants of registered originals (should match) + unseen originals (should not)
+    variants = [a for a in assets if a["modality"] == modality and a.get("source") in registered_ids]
+    unseen = [dict(a, source=None) for a in originals[size:]]
+    queries = (variants + unseen)[:max_queries] if max_queries else variants + unseen
+
+    ok, reg_lat, reg_elapsed = timed_ops(registered, lambda a: adapters.register(modality, a["path"], a["id"]))
+    found, chk_lat, chk_elapsed = timed_ops(queries, lambda a: adapters.check(modality, a["path"]))
+
+    by_role = {}
+    for query, match in zip(queries, found):
+        role = query["role"] if query.get("source") else "unseen"
+        stats = by_role.setdefault(role, {"queries": 0, "correct": 0})
+        stats["queries"] += 1
+        stats["correct"] += int(matches_source(modality, match, query.get("source")))
+    for stats in by_role.values():
+        stats["accuracy"] = round(stats["correct"] / stats["queries"], 4)
+
+    return {
+        "modality": modality,
+        "corpus_size": len(registered),
+        "register": dict(summarize(reg_lat, reg_elapsed), failures=ok.count(False)),
+        "check": summarize(chk_lat, chk_elapsed),
+        "accuracy": by_role,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Originality engine benchmark")
+    parser.add_argument('--sizes', default='100,1000', help='Comma-separated corpus sizes (originals registered)')
+    parser.add_argument('--modalities', default='text,image')
+    parser.add_argument('--videos', type=int, default=0, help='Synthetic videos to generate (video modality)')
+    parser.add_argument('--queries', type=int, default=200, help='Max check queries per size (0 = all)')
+    parser.add_argument('--no-semantic', action='store_true', help='Text engine without SBERT')
+    parser.add_argument('--http', help='modality=url pairs, e.g. text=http://localhost:5002 (default: in-process)')
+    parser.add_argument('--corpus', help='Reuse an existing corpus manifest instead of generating one')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--out', help='Results JSON path (default: bench/results/<timestamp>.json)')
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(',')]
+    modalities = args.modalities.split(',')
+    urls = dict(pair.split('=', 1) for pair in args.http.split(',')) if args.http else None
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.corpus:
+            manifest = args.corpus
+        else:
+            # Extra originals beyond the largest size serve as unseen (should-be-original) queries
+            extra = max(20, max(sizes) // 10)
+            n = max(sizes) + extra
+            manifest = corpus_gen.generate(os.path.join(tmp, 'corpus'),
+                                           texts=n if 'text' in modalities else 0,
+                                           images=n if 'image' in modalities else 0,
+                                           videos=args.videos if 'video' in modalities else 0,
+                                           seed=args.seed)
+        assets = corpus_gen.load_manifest(manifest)
+
+        results = []
+        for size in sizes:
+            run_id = f"bench{int(time.time())}-{size}"
+            adapters = (HttpAdapters(urls, run_id) if urls
+                        else InProcessAdapters(os.path.join(tmp, f"bench-{size}.db"), not args.no_semantic))
+            for modality in modalities:
+                if urls and modality not in urls:
+                    continue
+                row = bench_modality(adapters, modality, assets, size, args.queries)
+                row["mode"] = "http" if urls else "in-process"
+                results.append(row)
+                print(f"[{row['mode']}] {modality} n={row['corpus_size']}: "
+                      f"register {row['register']['ops_per_sec']}/s, "
+                      f"check p50={row['check']['p50_ms']}ms p95={row['check']['p95_ms']}ms")
+
+    report = {
+        "meta": {
+            "git_commit": git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, datetime.datetime.now().strftime('%Y%m%d-%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Cold-start benchmark for the originality engine CLIs.
+
+Measures, in fresh interpreters:
+  - `python -X importtime` cumulative import cost of each engine module
+  - wall time of CLI invocations (help, MinHash-only text check, image check)
+
+Exits non-zero if any CLI run exceeds its budget, so it can gate CI / batch scripts.
+
+Usage (from originality-engine/):
+    python bench/startup.py
+    python bench/startup.py --budget 1.0 --json startup.json
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ENGINE_ROOT, 'tests')
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\| (\s*\S.*)$')
+
+
+def import_time(module_dir, module='originality'):
+    """Cumulative import time (seconds) of `module` and its top-5 heaviest dependencies."""
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=module_dir, capture_output=True, text=True)
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = IMPORTTIME_RE.match(line)
+        if m:
+            rows.append((int(m.group(2)), m.group(3).rstrip()))
+    total = next((cum for cum, name in rows if name == module), None)
+    # Direct imports of the module only (indented one level), otherwise one heavy
+    # package shows up once per submodule
+    heaviest = sorted((r for r in rows if r[1].startswith('  ') and not r[1].startswith('    ')),
+                      reverse=True)[:5]
+    heaviest = [(cum, name.strip()) for cum, name in heaviest]
+    return {
+        "seconds": round(total / 1e6, 3) if total is not None else None,
+        "error": proc.stderr.strip().splitlines()[-1] if proc.returncode else None,
+        "heaviest": [{"module": name, "seconds": round(cum / 1e6, 3)} for cum, name in heaviest]
+    }
+
+
+def wall_time(cmd, env, runs=3):
+    """Best-of-N wall time of a CLI command (seconds)."""
+    best = None
+    for _ in range(runs):
+        started = time.perf_counter()
+        proc = subprocess.run(cmd, cwd=ENGINE_ROOT, env=env, capture_output=True, text=True)
+        elapsed = time.perf_counter() - started
+        if proc.returncode != 0:
+            return {"seconds": None, "error": (proc.stderr or proc.stdout).strip().splitlines()[-1:]}
+        best = elapsed if best is None else min(best, elapsed)
+    return {"seconds": round(best, 3)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CLI cold-start benchmark")
+    parser.add_argument('--budget', type=float, default=1.0, help='Max seconds per CLI invocation')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--json', help='Also write results to this file')
+    args = parser.parse_args()
+
+    results = {"imports": {}, "cli": {}, "budget_seconds": args.budget}
+    for name in ('textFiles', 'imageFiles', 'videoFiles'):
+        results["imports"][name] = import_time(os.path.join(ENGINE_ROOT, name))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Scratch DB so the benchmark never touches the shared fingerprints.db
+        env = dict(os.environ, ORIGINALITY_DB_PATH=os.path.join(tmp, 'bench.db'))
+        sample_text = os.path.join(tmp, 'sample.txt')
+        shutil.copy(os.path.join(TESTS_DIR, 'text', 'original.txt'), sample_text)
+
+        commands = {
+            "text --help": [sys.executable, 'textFiles/main.py', '--help'],
+            "text check --no-semantic": [sys.executable, 'textFiles/main.py', '--no-semantic', 'check', sample_text],
+            "image --help": [sys.executable, 'imageFiles/main.py', '--help'],
+            "image check": [sys.executable, 'imageFiles/main.py', 'check',
+                            os.path.join(TESTS_DIR, 'images', 'original.png')],
+        }
+        for label, cmd in commands.items():
+            results["cli"][label] = wall_time(cmd, env, args.runs)
+
+    over = [label for label, r in results["cli"].items()
+            if r.get("seconds") is None or r["seconds"] > args.budget]
+    results["passed"] = not over
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if over:
+        print(f"[FAILED] Over budget ({args.budget}s) or failing: {', '.join(over)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+from startup import ENGINE_ROOT, TESTS_DIR
+
+# Modules the CLIs must only import for semantic checks (see bench/startup.py for timings)
+HEAVY = ('torch', 'sentence_transformers', 'transformers', 'onnxruntime')
+
+# Runs a CLI as `python <script> <args>` would, then prints which heavy modules it pulled in
+PROBE = """
+import os, runpy, sys
+sys.argv = [sys.argv[1]] + sys.argv[2:]
+sys.path.insert(0, os.path.dirname(os.path.abspath(sys.argv[0])))  # as `python <script>` does
+try:
+    runpy.run_path(sys.argv[0], run_name='__main__')
+except SystemExit:
+    pass
+print('HEAVY:' + ','.join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def heavy_imports(tmp_path, *cli):
+    env = dict(os.environ, ORIGINALITY_DB_PATH=str(tmp_path / 'startup.db'), HF_HUB_OFFLINE='1')
+    proc = subprocess.run([sys.executable, '-c', PROBE.format(heavy=HEAVY), *cli],
+                          cwd=ENGINE_ROOT, env=env, capture_output=True, text=True, timeout=120)
+    line = next((l for l in proc.stdout.splitlines() if l.startswith('HEAVY:')), None)
+    assert line is not None, proc.stderr
+    return [m for m in line[len('HEAVY:'):].split(',') if m]
+
+
+@pytest.mark.parametrize("cli", [
+    ('textFiles/main.py', '--help'),
+    ('imageFiles/main.py', '--help'),
+    ('imageFiles/main.py', 'check', os.path.join(TESTS_DIR, 'images', 'original.png')),
+])
+def test_cli_skips_heavy_imports(tmp_path, cli):
+    assert heavy_imports(tmp_path, *cli) == []
+
+
+def test_minhash_only_check_skips_heavy_imports(tmp_path):
+    sample = tmp_path / 'sample.txt'
+    shutil.copy(os.path.join(TESTS_DIR, 'text', 'original.txt'), sample)
+    assert heavy_imports(tmp_path, 'textFiles/main.py', '--no-semantic', 'check', str(sample)) == []
@@ -0,0 +1,115 @@
+"""
+Compares the text embedding backends (torch, torch-int8, onnx, onnx-int8).
+
+Each backend runs in its own subprocess so load time and peak RSS are not polluted
+by the others. Reports load time, peak RSS, docs/sec and parity of cosine scores
+against the fp32 torch backend.
+
+Usage (from originality-engine/):
+    python textFiles/export_model.py        # once, creates models/all-MiniLM-L6-v2
+    python bench/text_backends.py --docs 200
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ENGINE_ROOT, 'textFiles'))
+
+WORDS = ("asset license owner token chain ledger content media stream audio video image "
+         "text rights royalty creator market contract hash block network digital copy").split()
+
+
+def peak_rss_mb():
+    try:
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+    except ImportError:
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except Exception:
+            return None
+
+
+def make_docs(n, seed=7):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 200))) for _ in range(n)]
+
+
+def run_backend(backend, model_path, n_docs, out_path):
+    """Child process: load one backend, encode the corpus, dump embeddings + timings."""
+    import numpy as np
+    from encoders import timed_load
+
+    docs = make_docs(n_docs)
+    encoder, load_s = timed_load(backend, model_path)
+    encoder.encode(docs[:4])  # warm-up
+
+    started = time.perf_counter()
+    vectors = np.asarray(encoder.encode(docs, batch_size=32), dtype=np.float32)
+    encode_s = time.perf_counter() - started
+
+    np.save(out_path, vectors)
+    print(json.dumps({
+        "backend": backend,
+        "load_seconds": round(load_s, 3),
+        "docs_per_sec": round(n_docs / encode_s, 2),
+        "peak_rss_mb": round(peak_rss_mb() or 0.0, 1),
+    }))
+
+
+def main():
+    from encoders import BACKENDS, DEFAULT_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Text embedding backend benchmark")
+    parser.add_argument('--backends', default=",".join(BACKENDS))
+    parser.add_argument('--model-path', default=DEFAULT_MODEL_PATH)
+    parser.add_argument('--docs', type=int, default=200)
+    parser.add_argument('--tolerance', type=float, default=0.02)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--out', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_backend(args.child, args.model_path, args.docs, args.out)
+        return
+
+    import numpy as np
+
+    results = []
+    vectors = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in args.backends.split(","):
+            out = os.path.join(tmp, f"{backend}.npy")
+            proc = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', backend,
+                                   '--model-path', args.model_path, '--docs', str(args.docs), '--out', out],
+                                  capture_output=True, text=True)
+            if proc.returncode != 0:
+                results.append({"backend": backend, "error": proc.stderr.strip().splitlines()[-1:]})
+                continue
+            results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+            vectors[backend] = np.load(out)
+
+    # Parity of pairwise cosine scores against fp32 torch
+    ref = vectors.get('torch')
+    for row in results:
+        vec = vectors.get(row["backend"])
+        if ref is None or vec is None or row["backend"] == 'torch':
+            continue
+        delta = np.abs(vec @ vec.T - ref @ ref.T)
+        row["max_score_delta"] = round(float(delta.max()), 5)
+        row["parity_passed"] = bool(delta.max() <= args.tolerance)
+
+    print(json.dumps({"docs": args.docs, "tolerance": args.tolerance, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
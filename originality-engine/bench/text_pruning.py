@@ -0,0 +1,100 @@
+"""
+Measures the work the staged text matcher skips on a realistic check mix.
+
+Registers --size synthetic documents, then checks a workload of exact re-uploads,
+near-duplicates, paraphrases and unseen originals (--mix, in that order). Reports
+which stage decided each check and how many SBERT encodes and row evaluations were
+done vs skipped compared with scoring every row with MinHash and SBERT.
+
+Usage (from originality-engine/):
+    python bench/text_pruning.py --size 1000 --checks 400
+    python bench/text_pruning.py --size 1000 --checks 400 --no-semantic
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import corpus as corpus_gen
+
+
+def counter_values(counter):
+    return {key[0]: child.value for key, child in counter._children.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Staged text matcher work report")
+    parser.add_argument('--size', type=int, default=1000, help='Registered documents')
+    parser.add_argument('--checks', type=int, default=400)
+    parser.add_argument('--mix', default='0.4,0.3,0.1,0.2', help='exact,near,paraphrase,unseen fractions')
+    parser.add_argument('--no-semantic', action='store_true')
+    parser.add_argument('--seed', type=int, default=1234)
+    args = parser.parse_args()
+
+    from textFiles import originality
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        unseen_n = max(20, args.checks)
+        assets = corpus_gen.load_manifest(
+            corpus_gen.generate(os.path.join(tmp, 'corpus'), texts=args.size + unseen_n, images=0, seed=args.seed))
+        originals = [a for a in assets if a["role"] == "original"]
+        registered, unseen = originals[:args.size], originals[args.size:]
+        registered_ids = {a["id"] for a in registered}
+        pools = {
+            "exact": registered,
+            "near_duplicate": [a for a in assets if a["role"] == "near_duplicate" and a["source"] in registered_ids],
+            "paraphrase": [a for a in assets if a["role"] == "paraphrase" and a["source"] in registered_ids],
+            "unseen": unseen,
+        }
+        workload = []
+        for (kind, pool), frac in zip(pools.items(), map(float, args.mix.split(','))):
+            workload += [(kind, rng.choice(pool)) for _ in range(int(round(frac * args.checks))) if pool]
+        rng.shuffle(workload)
+
+        engine = originality.TextOriginalityRequest(db_path=os.path.join(tmp, 'pruning.db'),
+                                                    semantic=not args.no_semantic)
+        for a in registered:
+            engine.register_text(a["path"], a["id"])
+
+        work_before = counter_values(originality.CHECK_WORK)
+        resolved_before = counter_values(originality.CHECK_RESOLVED)
+        by_kind = {}
+        started = time.perf_counter()
+        for kind, asset in workload:
+            t0 = time.perf_counter()
+            result = engine.check(asset["path"])
+            stats = by_kind.setdefault(kind, {"checks": 0, "ms": 0.0, "stages": {}})
+            stats["checks"] += 1
+            stats["ms"] += (time.perf_counter() - t0) * 1000
+            stats["stages"][result["stage"]] = stats["stages"].get(result["stage"], 0) + 1
+        elapsed = time.perf_counter() - started
+
+    work = {k: v - work_before.get(k, 0) for k, v in counter_values(originality.CHECK_WORK).items()}
+    resolved = {k: v - resolved_before.get(k, 0) for k, v in counter_values(originality.CHECK_RESOLVED).items()}
+    semantic = engine.model is not None
+
+    print(f"corpus={args.size} checks={len(workload)} semantic={'yes' if semantic else 'no'} "
+          f"total={elapsed:.2f}s")
+    for kind, stats in by_kind.items():
+        print(f"  {kind:<15} n={stats['checks']:<5} avg={stats['ms'] / stats['checks']:.2f}ms stages={stats['stages']}")
+    print(f"decided by: {resolved}")
+    scored, skipped = work.get('rows_scored', 0), work.get('rows_skipped', 0)
+    if scored + skipped:
+        print(f"row evaluations: {int(scored)} scored, {int(skipped)} skipped "
+              f"({skipped / (scored + skipped):.1%} of a full MinHash{'+SBERT' if semantic else ''} scan)")
+    if semantic:
+        encodes, encodes_skipped = work.get('encodes', 0), work.get('encodes_skipped', 0)
+        print(f"SBERT encodes: {int(encodes)} run, {int(encodes_skipped)} skipped "
+              f"({encodes_skipped / max(encodes + encodes_skipped, 1):.1%})")
+
+
+if __name__ == "__main__":
+    main()
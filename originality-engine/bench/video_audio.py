@@ -0,0 +1,161 @@
+"""
+Video soundtrack extraction: the full-fidelity WAV upload vs mono PCM streamed to the
+audio service.
+
+Synthesizes a --minutes long video with a stereo 44.1 kHz AAC soundtrack, then sends
+its audio both ways to an HTTP sink that only counts body bytes (or to a running audio
+service with --audio-url):
+
+  wav - MoviePy writes the soundtrack as a WAV file, which is uploaded as multipart,
+        and the service then re-runs ffmpeg on it (44.1 kHz mono WAV, as
+        wav.ConvertToWAV does; timed here with the same command)
+  pcm - ffmpeg decodes straight to mono 16-bit PCM at 11025 Hz, streamed as the
+        request body while it decodes (videoFiles.originality.pcm_stream)
+
+Reports bytes sent, temp-file bytes written and seconds, all per minute of video.
+
+Usage (from originality-engine/):
+    python bench/video_audio.py --minutes 2
+    python bench/video_audio.py --minutes 2 --audio-url http://localhost:8080
+"""
+import argparse
+import http.server
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+
+
+class CountingSink(http.server.BaseHTTPRequestHandler):
+    """Reads and discards request bodies (Content-Length or chunked), counting their bytes."""
+    received = 0
+
+    def do_POST(self):
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            while True:
+                size = int(self.rfile.readline().split(b';')[0], 16)
+                if not size:
+                    self.rfile.readline()
+                    break
+                self._drain(size)
+                self.rfile.readline()
+        else:
+            self._drain(int(self.headers.get('Content-Length', 0)))
+        body = b'{"status": "ORIGINAL", "top_score": 0, "matches": []}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _drain(self, size):
+        while size:
+            chunk = self.rfile.read(min(size, 1 << 20))
+            size -= len(chunk)
+            CountingSink.received += len(chunk)
+
+    def log_message(self, *args):
+        pass
+
+
+def make_video(path, seconds):
+    """Test pattern video with a two-tone stereo 44.1 kHz AAC soundtrack."""
+    from videoFiles.originality import ffmpeg_binary
+    subprocess.run([ffmpeg_binary(), '-y', '-v', 'error',
+                    '-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=10:duration={seconds}',
+                    '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+                    '-f', 'lavfi', '-i', f'sine=frequency=660:duration={seconds}',
+                    '-filter_complex', '[1:a][2:a]join=inputs=2:channel_layout=stereo[a]',
+                    '-map', '0:v', '-map', '[a]', '-c:v', 'libx264', '-preset', 'ultrafast',
+                    '-c:a', 'aac', '-ar', '44100', path], check=True)
+
+
+def wav_path(session, url, video, tmp):
+    """The original path. Returns (bytes sent, temp bytes, client s, service conversion s)."""
+    from moviepy import VideoFileClip
+    from videoFiles.originality import ffmpeg_binary
+    wav = os.path.join(tmp, 'extracted_audio.wav')
+    clip = VideoFileClip(video)  # opened for the frames either way, so not timed
+    started = time.perf_counter()
+    clip.audio.write_audiofile(wav, logger=None)
+    clip.close()
+    before = CountingSink.received
+    with open(wav, 'rb') as f:
+        session.post(f"{url}/check", files={'file': f}).raise_for_status()
+    client_s = time.perf_counter() - started
+    sent = CountingSink.received - before if CountingSink.received else os.path.getsize(wav)
+
+    # What the Go service does with the upload before fingerprinting it
+    converted = os.path.join(tmp, 'extracted_audio_processed.wav')
+    started = time.perf_counter()
+    subprocess.run([ffmpeg_binary(), '-y', '-v', 'error', '-i', wav, '-c', 'pcm_s16le',
+                    '-ar', '44100', '-ac', '1', converted], check=True)
+    service_s = time.perf_counter() - started
+    temp_bytes = os.path.getsize(wav) * 2 + os.path.getsize(converted)  # client file, upload copy, conversion
+    return sent, temp_bytes, client_s, service_s
+
+
+def pcm_path(session, url, video):
+    from videoFiles.originality import AUDIO_SAMPLE_RATE, pcm_stream
+    sent = 0
+
+    def counted():
+        nonlocal sent
+        for chunk in pcm_stream(video):
+            sent += len(chunk)
+            yield chunk
+
+    started = time.perf_counter()
+    session.post(f"{url}/check/pcm", params={'rate': AUDIO_SAMPLE_RATE}, data=counted(),
+                 headers={'Content-Type': 'application/octet-stream'}).raise_for_status()
+    return sent, 0, time.perf_counter() - started, 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Video audio extraction benchmark")
+    parser.add_argument('--minutes', type=float, default=2.0, help='Length of the synthetic video')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per path (best kept)')
+    parser.add_argument('--audio-url', default=None, help='Running audio service (default: local byte sink)')
+    args = parser.parse_args()
+
+    from videoFiles.originality import make_session
+
+    server = None
+    url = args.audio_url
+    if not url:
+        server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), CountingSink)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+    session = make_session()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        video = os.path.join(tmp, 'bench.mp4')
+        make_video(video, int(args.minutes * 60))
+        print(f"{args.minutes:g} min video, {os.path.getsize(video) / 1e6:.1f} MB, audio to {url}")
+        results = {}
+        for name, run in (("wav", lambda: wav_path(session, url, video, tmp)),
+                          ("pcm", lambda: pcm_path(session, url, video))):
+            runs = [run() for _ in range(args.repeat)]
+            results[name] = min(runs, key=lambda r: r[2] + r[3])
+
+    if server:
+        server.shutdown()
+    per_min = 1.0 / args.minutes
+    print(f"\n{'per minute of video':<22} {'wav':>10} {'pcm':>10}")
+    for i, label, scale, fmt in ((0, "MB sent", 1e-6, "{:10.2f}"), (1, "temp MB written", 1e-6, "{:10.2f}"),
+                                 (2, "client s", 1, "{:10.3f}"), (3, "service ffmpeg s", 1, "{:10.3f}")):
+        print(f"{label:<22} " + " ".join(fmt.format(results[n][i] * scale * per_min) for n in results))
+    total = {n: (results[n][2] + results[n][3]) * per_min for n in results}
+    print(f"{'total s':<22} " + " ".join(f"{total[n]:10.3f}" for n in results))
+    print(f"\nbytes moved: {results['wav'][0] / max(results['pcm'][0], 1):.1f}x less, "
+          f"time saved: {total['wav'] - total['pcm']:.3f} s per minute of video")
+
+
+if __name__ == '__main__':
+    main()
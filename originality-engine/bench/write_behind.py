@@ -0,0 +1,144 @@
+"""
+Registration throughput: one SQLite commit per asset vs the write-behind log.
+
+Generates --texts synthetic documents and --images synthetic images (bench/corpus.py),
+then registers them from --threads threads into a scratch DB, once with the engines
+writing synchronously and once with write_behind=True. Each registration is
+immediately followed by a check of the same file from the same thread, which must
+come back as a duplicate even though its commit may not have landed yet. Reports
+registrations/s, register p50 / p95 latency, check latency under the ingest load, the
+SQLite commits the registrations took and any duplicate the check missed.
+
+The gain depends on what an fsync costs where the DB lives; --dir puts the scratch DB
+on a given disk instead of the temp directory.
+
+Usage (from originality-engine/):
+    python bench/write_behind.py --texts 400 --images 400 --threads 8
+    python bench/write_behind.py --dir /var/lib/originality/bench
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ENGINE_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.append(ENGINE_ROOT)
+sys.path.append(BENCH_DIR)
+
+import numpy as np
+
+import corpus as corpus_gen
+
+
+def make_files(tmp, texts, images, seed):
+    rng = random.Random(seed)
+    files = []
+    for i in range(texts):
+        path = os.path.join(tmp, f"doc_{i}.txt")
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(" ".join(corpus_gen.make_document(rng, 30)))
+        files.append(("text", path, f"doc_{i}"))
+    for i in range(images):
+        path = os.path.join(tmp, f"img_{i}.png")
+        corpus_gen.make_image(rng).save(path)
+        files.append(("image", path, f"img_{i}"))
+    random.Random(seed).shuffle(files)
+    return files
+
+
+def run(files, db_path, threads, write_behind):
+    from imageFiles.originality import ImageOriginalityRequest
+    from common.writebehind import COMMITS
+    from textFiles.originality import TextOriginalityRequest
+
+    def commits():
+        return sum(COMMITS.labels(log=name).value for name in ("text", "image"))
+
+    text = TextOriginalityRequest(db_path=db_path, semantic=False, write_behind=write_behind)
+    image = ImageOriginalityRequest(db_path=db_path, write_behind=write_behind)
+    register = {"text": text.register_text, "image": image.register_image}
+    is_duplicate = {
+        "text": lambda path: text.check(path)["classification"] != "ORIGINAL",
+        "image": lambda path: image.check_originality(path)[0] != "ORIGINAL",
+    }
+    register_ms, check_ms, failures, missed = [], [], [], []
+    queue = list(files)
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            with lock:
+                if not queue:
+                    return
+                modality, path, asset_id = queue.pop()
+            t0 = time.perf_counter()
+            ok, msg = register[modality](path, asset_id)
+            t1 = time.perf_counter()
+            duplicate = is_duplicate[modality](path)
+            t2 = time.perf_counter()
+            with lock:
+                register_ms.append((t1 - t0) * 1000)
+                check_ms.append((t2 - t1) * 1000)
+                if not ok:
+                    failures.append(msg)
+                elif not duplicate:
+                    missed.append(asset_id)
+
+    commits_before = commits()
+    started = time.perf_counter()
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - started
+    for engine in (text, image):
+        if engine.writer:
+            engine.writer.close()
+    conn = sqlite3.connect(db_path)
+    stored = (conn.execute("SELECT COUNT(*) FROM text_assets").fetchone()[0]
+              + conn.execute("SELECT COUNT(DISTINCT image_id) FROM image_hashes").fetchone()[0])
+    conn.close()
+    return {
+        "per_s": len(files) / elapsed,
+        "register": register_ms,
+        "check": check_ms,
+        "failures": failures,
+        "missed": missed,
+        "stored": stored,
+        # One transaction per registration without the log
+        "commits": int(commits() - commits_before) if write_behind else len(files) - len(failures),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write-behind registration benchmark")
+    parser.add_argument('--texts', type=int, default=400)
+    parser.add_argument('--images', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--dir', default=None, help='Directory for the scratch DBs and logs')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        files = make_files(tmp, args.texts, args.images, args.seed)
+        print(f"{args.texts} texts + {args.images} images, {args.threads} threads")
+        print(f"{'mode':<13} {'reg/s':>7} {'reg p50':>8} {'reg p95':>8} {'chk p50':>8} {'chk p95':>8} "
+              f"{'commits':>8} {'stored':>7} {'missed':>7}")
+        for mode, write_behind in (("sync", False), ("write-behind", True)):
+            result = run(files, os.path.join(tmp, f"{mode}.db"), args.threads, write_behind)
+            reg, chk = result["register"], result["check"]
+            print(f"{mode:<13} {result['per_s']:>7.1f} {np.percentile(reg, 50):>8.1f} "
+                  f"{np.percentile(reg, 95):>8.1f} {np.percentile(chk, 50):>8.1f} {np.percentile(chk, 95):>8.1f} "
+                  f"{result['commits']:>8} {result['stored']:>7} {len(result['missed']):>7}")
+            for msg in result["failures"][:5]:
+                print(f"  failed: {msg}")
+
+
+if __name__ == '__main__':
+    main()
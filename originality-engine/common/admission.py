@@ -0,0 +1,214 @@
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+# Admission control and backpressure. Every heavy operation runs under a per-operation
+# concurrency limit with a bounded FIFO-ish wait queue:
+#
+#   request - a whole /check or /register (install_admission)
+#   extract - PDF / DOCX text extraction
+#   encode  - SBERT embedding
+#   decode  - MoviePy / ffmpeg video and soundtrack decode
+#
+# A caller that finds the queue full is rejected at once with 429; one that waits longer
+# than ORIGINALITY_ADMISSION_TIMEOUT_S gets 503. Both carry Retry-After, estimated from
+# the queue depth and the recent hold time. Limits come from the environment:
+#   ORIGINALITY_<OPERATION>_CONCURRENCY  (0 = unlimited)   ORIGINALITY_<OPERATION>_QUEUE
+
+CPUS = os.cpu_count() or 1
+DEFAULT_LIMITS = {
+    # operation: (concurrency, queue)
+    'request': (max(4, 2 * CPUS), 64),
+    'extract': (CPUS, 32),
+    'encode': (16, 64),  # >= TEXT_BATCH_MAX_SIZE, so a full encode batch can still form
+    'decode': (max(1, CPUS // 2), 8),
+}
+TIMEOUT = float(os.environ.get('ORIGINALITY_ADMISSION_TIMEOUT_S', '30'))
+MAX_RETRY_AFTER = 60
+
+IN_FLIGHT = REGISTRY.gauge('originality_admission_in_flight', 'Operations holding an admission slot', ['operation'])
+QUEUE_DEPTH = REGISTRY.gauge('originality_admission_queue_depth', 'Operations waiting for an admission slot',
+                             ['operation'])
+QUEUE_LIMIT = REGISTRY.gauge('originality_admission_queue_limit', 'Admission wait queue capacity', ['operation'])
+WAIT_SECONDS = REGISTRY.histogram('originality_admission_wait_seconds', 'Time spent waiting for an admission slot',
+                                  ['operation'])
+REJECTED = REGISTRY.counter('originality_admission_rejected_total', 'Operations rejected by admission control',
+                            ['operation', 'reason'])
+
+
+class Overloaded(Exception):
+    """Raised when an operation is not admitted; `status` is 429 (queue full) or 503 (wait timed out)."""
+
+    def __init__(self, operation, reason, retry_after):
+        super().__init__(f"{operation} overloaded ({reason}), retry after {retry_after}s")
+        self.operation = operation
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status = 429 if reason == 'queue_full' else 503
+
+
+class Limiter:
+    def __init__(self, operation, concurrency, queue, timeout=TIMEOUT):
+        self.operation = operation
+        self.concurrency = concurrency
+        self.queue = queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self.hold_seconds = 1.0  # EWMA of slot hold time, for Retry-After
+        self._cond = threading.Condition()
+        self._in_flight = IN_FLIGHT.labels(operation=operation)
+        self._depth = QUEUE_DEPTH.labels(operation=operation)
+        QUEUE_LIMIT.labels(operation=operation).set(queue)
+
+    def retry_after(self):
+        per_slot = self.hold_seconds / max(self.concurrency, 1)
+        return max(1, min(MAX_RETRY_AFTER, math.ceil((self.waiting + 1) * per_slot)))
+
+    def _reject(self, reason):
+        REJECTED.labels(operation=self.operation, reason=reason).inc()
+        raise Overloaded(self.operation, reason, self.retry_after())
+
+    def acquire(self):
+        """Takes a slot, waiting in the queue if needed. Raises Overloaded instead of waiting forever."""
+        with self._cond:
+            if self.concurrency <= 0 or (self.active < self.concurrency and not self.waiting):
+                self.active += 1
+                self._in_flight.inc()
+                return
+            if self.waiting >= self.queue:
+                self._reject('queue_full')
+            self.waiting += 1
+            self._depth.inc()
+            started = time.perf_counter()
+            deadline = started + self.timeout
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self._reject('timeout')
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+                self._depth.dec()
+                WAIT_SECONDS.labels(operation=self.operation).observe(time.perf_counter() - started)
+            self.active += 1
+            self._in_flight.inc()
+
+    def release(self, held_seconds=None):
+        with self._cond:
+            self.active -= 1
+            self._in_flight.dec()
+            if held_seconds is not None:
+                self.hold_seconds = 0.8 * self.hold_seconds + 0.2 * held_seconds
+            self._cond.notify()
+
+    @contextmanager
+    def slot(self):
+        self.acquire()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(time.perf_counter() - started)
+
+    def saturated(self):
+        return self.concurrency > 0 and self.waiting >= self.queue
+
+    def stats(self):
+        return {"concurrency": self.concurrency, "queue": self.queue, "in_flight": self.active,
+                "queue_depth": self.waiting, "hold_seconds": round(self.hold_seconds, 3),
+                "saturated": self.saturated()}
+
+
+class AdmissionController:
+    """One limiter per operation, configured from the environment."""
+
+    def __init__(self, limits=None, timeout=TIMEOUT):
+        self.limiters = {}
+        for operation, (concurrency, queue) in (limits or DEFAULT_LIMITS).items():
+            prefix = f'ORIGINALITY_{operation.upper()}'
+            concurrency = int(os.environ.get(f'{prefix}_CONCURRENCY', concurrency))
+            queue = int(os.environ.get(f'{prefix}_QUEUE', queue))
+            self.limiters[operation] = Limiter(operation, concurrency, queue, timeout)
+
+    def slot(self, operation):
+        return self.limiters[operation].slot()
+
+    def stats(self):
+        return {operation: limiter.stats() for operation, limiter in self.limiters.items()}
+
+    def saturated(self):
+        return [operation for operation, limiter in self.limiters.items() if limiter.saturated()]
+
+
+ADMISSION = AdmissionController()
+
+
+def limited(operation):
+    """Decorator: runs the function under the `operation` admission slot."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with ADMISSION.slot(operation):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def overloaded_response(error):
+    """Flask response tuple for an Overloaded error."""
+    from flask import jsonify
+    return (jsonify({"error": str(error), "operation": error.operation, "retry_after": error.retry_after}),
+            error.status, {"Retry-After": str(error.retry_after)})
+
+
+def install_admission(app, service, endpoints=('/check', '/register')):
+    """
+    Admits requests to `endpoints` through the `request` limiter, turns Overloaded errors
+    into 429/503 + Retry-After, and adds GET /health/load for load balancers (503 while
+    any wait queue is full).
+    """
+    from flask import g, jsonify, request
+
+    limiter = ADMISSION.limiters['request']
+
+    @app.before_request
+    def _admit():
+        if request.path not in endpoints:
+            return None
+        try:
+            limiter.acquire()
+        except Overloaded as e:
+            return overloaded_response(e)
+        g._admission_started = time.perf_counter()
+        return None
+
+    @app.teardown_request
+    def _release(exc):
+        started = g.pop('_admission_started', None)
+        if started is not None:
+            limiter.release(time.perf_counter() - started)
+
+    @app.errorhandler(Overloaded)
+    def _overloaded(e):
+        return overloaded_response(e)
+
+    @app.route('/health/load', methods=['GET'])
+    def load():
+        saturated = ADMISSION.saturated()
+        body = {"service": service, "saturated": saturated, "operations": ADMISSION.stats()}
+        if saturated:
+            retry_after = max(ADMISSION.limiters[op].retry_after() for op in saturated)
+            return jsonify(body), 503, {"Retry-After": str(retry_after)}
+        return jsonify(body), 200
+
+    return app
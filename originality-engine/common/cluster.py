@@ -0,0 +1,250 @@
+import os
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from .admission import Overloaded
+    from .metrics import REGISTRY
+    from .profiling import admin_headers
+except ImportError:
+    from admission import Overloaded
+    from metrics import REGISTRY
+    from profiling import admin_headers
+
+# Cluster mode: the text and image corpora are hash-partitioned by asset id across N
+# ordinary engine nodes (textFiles/server.py, imageFiles/main.py, each with its own
+# ORIGINALITY_DB_PATH). A registration or delete goes to the node owning the id
+# (crc32(id) mod N); a check is sent to every node at once and their answers are merged
+# into the single-node response shape. Before a registration, the other nodes are asked
+# (/exact) whether they hold an exact duplicate, which the owner cannot see. Node lists are comma-separated base URLs, in
+# partition order, so every router must list them identically:
+#
+#   ORIGINALITY_TEXT_NODES=http://10.0.0.1:5002,http://10.0.0.2:5002
+#   ORIGINALITY_IMAGE_NODES=http://10.0.0.1:8081,http://10.0.0.2:8081
+
+TEXT_NODES = [u.strip().rstrip('/') for u in os.environ.get('ORIGINALITY_TEXT_NODES', '').split(',') if u.strip()]
+IMAGE_NODES = [u.strip().rstrip('/') for u in os.environ.get('ORIGINALITY_IMAGE_NODES', '').split(',') if u.strip()]
+CLUSTER_TIMEOUT_MS = float(os.environ.get('ORIGINALITY_CLUSTER_TIMEOUT_MS', '2000'))
+# Read timeout of the owner's /register and /delete, which extract, hash and encode
+CLUSTER_REGISTER_TIMEOUT_MS = float(os.environ.get('ORIGINALITY_CLUSTER_REGISTER_TIMEOUT_MS', '60000'))
+TOP_K = 5
+
+# Text stages in the order a single node tries them (textFiles/originality.py check)
+TEXT_STAGES = ('exact', 'minhash', 'passage', 'semantic')
+TEXT_MATCH_KEYS = {'exact': 'minhash', 'minhash': 'minhash', 'passage': 'passage', 'semantic': 'semantic'}
+
+PARTITION_SECONDS = REGISTRY.histogram('originality_cluster_partition_seconds',
+                                       'Per-partition check latency seen by the router', ['modality', 'partition'])
+PARTITION_FAILURES = REGISTRY.counter('originality_cluster_partition_failures_total',
+                                      'Partition calls that timed out or failed', ['modality', 'partition', 'reason'])
+
+
+def partition(asset_id, partitions):
+    """Partition owning `asset_id`: crc32 of the id, mod the partition count."""
+    return zlib.crc32(str(asset_id).encode('utf-8')) % partitions
+
+
+def merge_text(results, top_k=TOP_K):
+    """
+    Merges text node /check responses. The verdict is the one a single node holding the
+    whole corpus would give: the earliest stage that flagged a partition, best score
+    first. Matches of that stage's metric are merged across partitions into one top-k.
+    """
+    valid = [r for r in results if not r.get("detailed_classification", "").startswith("ERROR")]
+    if not valid:
+        return results[0]
+    flagged = [r for r in valid if r["status"] != "Original"]
+    if flagged:
+        best = min(flagged, key=lambda r: (TEXT_STAGES.index(r["matched_by"]), -r["similarity_score"]))
+    else:
+        best = max(valid, key=lambda r: r["similarity_score"])
+    key = TEXT_MATCH_KEYS.get(best["matched_by"], 'minhash')
+    matches = [m for r in valid for m in r.get("matches", []) if key in m]
+    merged = dict(best, matches=sorted(matches, key=lambda m: (-m[key], m["id"]))[:top_k])
+    if not flagged:
+        merged["similarity_score"] = max(r["similarity_score"] for r in valid)
+    return merged
+
+
+def merge_image(results):
+    """Merges image node /check responses: an exact match, else the closest flagged match, else the closest row."""
+    valid = [r for r in results if r.get("status") != "ERROR"]
+    if not valid:
+        return results[0]
+    flagged = [r for r in valid if r["status"] != "ORIGINAL"]
+    # distance is null when a partition had no candidate row
+    candidates = flagged or [r for r in valid if r.get("distance") is not None]
+    if not candidates:
+        return valid[0]
+    return min(candidates, key=lambda r: (r["status"] != "DUPLICATE (Exact)", r["distance"]))
+
+
+class Cluster:
+    """
+    Router for one modality's partitions. register / delete / check return
+    (body, http status) like the gateway's audio proxy.
+    """
+    merges = {'text': merge_text, 'image': merge_image}
+
+    def __init__(self, modality, nodes, session=None, timeout_ms=CLUSTER_TIMEOUT_MS,
+                 register_timeout_ms=CLUSTER_REGISTER_TIMEOUT_MS):
+        self.modality = modality
+        self.nodes = list(nodes)
+        self.timeout = timeout_ms / 1000.0
+        self.register_timeout = register_timeout_ms / 1000.0
+        self.merge = self.merges[modality]
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=len(self.nodes), pool_maxsize=32)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+        self.session = session
+        # A few concurrent checks' worth of fan-out calls
+        self.pool = ThreadPoolExecutor(max_workers=len(self.nodes) * 8, thread_name_prefix=f"{modality}-fanout")
+
+    def owner(self, asset_id):
+        return self.nodes[partition(asset_id, len(self.nodes))]
+
+    @staticmethod
+    def _reply(resp):
+        try:
+            return resp.json(), resp.status_code
+        except ValueError:
+            return {"error": resp.text.strip()}, resp.status_code
+
+    @staticmethod
+    def _raise_overloaded(resp, body):
+        """A node's admission refusal (429/503) becomes Overloaded, keeping its Retry-After."""
+        if resp.status_code not in (429, 503):
+            return
+        try:
+            retry_after = int(resp.headers.get('Retry-After') or body.get("retry_after") or 1)
+        except ValueError:
+            retry_after = 1
+        raise Overloaded(body.get("operation", "partition"), 'queue_full' if resp.status_code == 429 else 'timeout',
+                         retry_after)
+
+    def _overloaded(self, operation, errors):
+        """One refusal for the router's caller: 429 only if every partition said 429, the longest Retry-After."""
+        reason = 'queue_full' if all(e.status == 429 for e in errors) else 'timeout'
+        return Overloaded(f"{self.modality} {operation}", reason, max(e.retry_after for e in errors))
+
+    def register(self, filepath, filename, asset_id):
+        """
+        Registers on the owner, unless another partition already holds an exact duplicate
+        (the owner only rejects the ones it holds itself). Without every other partition's
+        answer the registration is refused with a 503.
+        """
+        owner = partition(asset_id, len(self.nodes))
+        others = [(i, node) for i, node in enumerate(self.nodes) if i != owner]
+        answers, failed, overloaded = self._scatter('/exact', filepath, filename, others)
+        if overloaded:
+            raise self._overloaded('register', overloaded)
+        if failed:
+            return {"error": "Duplicate check incomplete", "partitions": {
+                "total": len(self.nodes), "answered": len(answers) + 1, "failed": failed}}, 503
+        existing = next((a["match_id"] for a in answers if a.get("match_id")), None)
+        if existing:
+            return {"success": False, "error": f"Exact duplicate of registered asset {existing}", "match_id": existing}, 409
+        try:
+            with open(filepath, 'rb') as f:
+                resp = self.session.post(f"{self.nodes[owner]}/register", files={'file': (filename, f)},
+                                         data={'id': asset_id}, timeout=(self.timeout, self.register_timeout))
+        except requests.Timeout:
+            return self._owner_timeout('register', owner), 504
+        body, code = self._reply(resp)
+        self._raise_overloaded(resp, body)
+        return body, code
+
+    def delete(self, asset_id):
+        owner = partition(asset_id, len(self.nodes))
+        try:
+            resp = self.session.post(f"{self.nodes[owner]}/delete", data={'id': asset_id}, headers=admin_headers(),
+                                     timeout=(self.timeout, self.register_timeout))
+        except requests.Timeout:
+            return self._owner_timeout('delete', owner), 504
+        return self._reply(resp)
+
+    def _owner_timeout(self, operation, owner):
+        PARTITION_FAILURES.labels(modality=self.modality, partition=owner, reason='timeout').inc()
+        # The owner may still complete it: the outcome is unknown, not failed
+        return {"success": False, "error": f"Partition {owner} did not answer the {operation} in time; "
+                                           f"its outcome is unknown", "node": self.nodes[owner]}
+
+    def _call(self, index, node, endpoint, filename, data):
+        started = time.perf_counter()
+        # The read timeout bounds a stuck node's thread; the caller stops waiting at self.timeout
+        resp = self.session.post(f"{node}{endpoint}", files={'file': (filename, data)},
+                                 timeout=(self.timeout, self.timeout))
+        if endpoint == '/check':
+            PARTITION_SECONDS.labels(modality=self.modality, partition=index).observe(time.perf_counter() - started)
+        body, code = self._reply(resp)
+        self._raise_overloaded(resp, body)
+        if code != 200:
+            raise RuntimeError(body.get("error", f"HTTP {code}"))
+        return body
+
+    def _scatter(self, endpoint, filepath, filename, nodes):
+        """
+        Posts the upload to `nodes` [(partition, url)] concurrently, each with the timeout.
+        Returns (answers, failed, overloaded): the 200 bodies, the partitions that missed
+        the timeout or answered with an error, and the Overloaded refusals among those.
+        """
+        with open(filepath, 'rb') as f:
+            data = f.read()
+        futures = {self.pool.submit(self._call, i, node, endpoint, filename, data): (i, node) for i, node in nodes}
+        done, _ = wait(futures, timeout=self.timeout) if futures else (set(), set())
+        answers, failed, overloaded = [], [], []
+        for future, (index, node) in futures.items():
+            if future not in done:
+                reason, error = 'timeout', f"no answer within {self.timeout * 1000:.0f} ms"
+            elif isinstance(future.exception(), Overloaded):
+                reason, error = 'overloaded', str(future.exception())
+                overloaded.append(future.exception())
+            elif future.exception() is not None:
+                reason, error = 'error', str(future.exception())
+            else:
+                answers.append(future.result())
+                continue
+            PARTITION_FAILURES.labels(modality=self.modality, partition=index, reason=reason).inc()
+            failed.append({"partition": index, "node": node, "error": error})
+        return answers, failed, overloaded
+
+    def check(self, filepath, filename):
+        """
+        Checks the upload on every partition concurrently and merges the answers. Each
+        partition gets the timeout; one that misses it is left out and reported under
+        `partitions`. A duplicate found anywhere is a complete answer, but "original"
+        needs every partition, so without all of them the response is a 503. Partitions
+        that refused the check (429/503) are passed on as Overloaded, with their
+        Retry-After, when the answer depends on them; 504 is left for real timeouts.
+        """
+        results, failed, overloaded = self._scatter('/check', filepath, filename, enumerate(self.nodes))
+        partitions = {"total": len(self.nodes), "answered": len(results), "failed": failed}
+        if not results:
+            if overloaded and len(overloaded) == len(failed):
+                raise self._overloaded('check', overloaded)
+            return {"error": "No partition answered", "partitions": partitions}, 504
+        merged = dict(self.merge(results), partitions=partitions)
+        original = merged.get("status") in ("Original", "ORIGINAL")
+        if failed and original:
+            if overloaded:
+                raise self._overloaded('check', overloaded)
+            return merged, 503
+        return merged, 200
+
+    def health(self):
+        """[{partition, node, ok, corpus_size}] from every node's /health."""
+        def probe(node):
+            try:
+                resp = self.session.get(f"{node}/health", timeout=self.timeout)
+                return resp.status_code == 200, resp.json().get("corpus_size")
+            except (requests.RequestException, ValueError):
+                return False, None
+        answers = list(self.pool.map(probe, self.nodes))
+        return [{"partition": i, "node": node, "ok": ok, "corpus_size": size}
+                for i, (node, (ok, size)) in enumerate(zip(self.nodes, answers))]
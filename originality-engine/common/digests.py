@@ -0,0 +1,55 @@
+import hashlib
+
+try:
+    from . import generations
+    from .metrics import stage
+except ImportError:
+    import generations
+    from metrics import stage
+
+# Content digests for the exact-duplicate fast path: an indexed equality lookup on
+# these answers re-uploads before any extraction, hashing or model inference.
+
+CHUNK_SIZE = 1 << 20
+
+
+def sha256_file(path):
+    """Hex SHA-256 of a file's raw bytes, read in 1 MiB chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sha256_text(text):
+    return hashlib.sha256(text.encode('utf8')).hexdigest()
+
+
+class Duplicate(str):
+    """
+    register_* rejection message for an exact duplicate. It is still the plain message
+    of the (success, message) pair; servers answer it with 409 and its `match_id`.
+    """
+
+    def __new__(cls, message, match_id):
+        self = super().__new__(cls, message)
+        self.match_id = match_id
+        return self
+
+
+def find_digest(conn, modality, table, id_column, column, digest, writer=None, field=None, limit=1):
+    """
+    Ids of the live assets of the active generation whose `column` is `digest` (an
+    indexed lookup), followed by those only pending in write-behind logs, in this and
+    the other processes, whose record[`field` or `column`] is `digest`.
+    """
+    # Pending first: a record committed while the table is queried is then found there
+    pending = [r[id_column] for r in writer.shared_pending() if r[field or column] == digest] if writer else []
+    with stage(modality, 'exact_lookup'):
+        # +generation: keeps the planner on the digest index (every row shares a generation)
+        rows = conn.execute(f'SELECT DISTINCT {id_column} FROM {table} '
+                            f'WHERE {column} = ? AND +generation = ? AND deleted = 0 LIMIT ?',
+                            (digest, generations.active_generation(conn, modality), limit)).fetchall()
+    found = [asset_id for (asset_id,) in rows]
+    return (found + [asset_id for asset_id in dict.fromkeys(pending) if asset_id not in found])[:limit]
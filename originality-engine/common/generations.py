@@ -0,0 +1,73 @@
+import json
+import time
+
+# Index generations: every signature row (text_assets, image_hashes) carries the
+# generation it was computed in. Readers only see the modality's *active* generation,
+# so a re-index (reindex.py) can fill a new generation while /check keeps serving the
+# old one, then switch readers over in a single transaction.
+#
+#   index_generations(modality, generation, status, params, created_at, activated_at)
+#   status: building -> active -> retired
+
+BUILDING = 'building'
+ACTIVE = 'active'
+RETIRED = 'retired'
+
+
+def ensure_schema(conn, table):
+    """Creates index_generations and adds the generation column to `table` (older DBs)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS index_generations (
+            modality     TEXT NOT NULL,
+            generation   INTEGER NOT NULL,
+            status       TEXT NOT NULL,
+            params       TEXT,
+            created_at   REAL,
+            activated_at REAL,
+            PRIMARY KEY (modality, generation)
+        )
+    ''')
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if 'generation' not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN generation INTEGER NOT NULL DEFAULT 0')
+    conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_generation ON {table}(generation)')
+
+
+def active_generation(conn, modality):
+    """The generation readers and new registrations use (0 until a re-index is activated)."""
+    row = conn.execute('SELECT generation FROM index_generations WHERE modality = ? AND status = ?',
+                       (modality, ACTIVE)).fetchone()
+    return row[0] if row else 0
+
+
+def building_generation(conn, modality):
+    row = conn.execute('SELECT generation, params FROM index_generations WHERE modality = ? AND status = ? '
+                       'ORDER BY generation DESC LIMIT 1', (modality, BUILDING)).fetchone()
+    return (row[0], json.loads(row[1] or '{}')) if row else (None, None)
+
+
+def begin_generation(conn, modality, params):
+    """Registers a new building generation and returns its number."""
+    row = conn.execute('SELECT MAX(generation) FROM index_generations WHERE modality = ?', (modality,)).fetchone()
+    generation = max(row[0] if row[0] is not None else 0, active_generation(conn, modality)) + 1
+    conn.execute('INSERT INTO index_generations (modality, generation, status, params, created_at) '
+                 'VALUES (?, ?, ?, ?, ?)', (modality, generation, BUILDING, json.dumps(params), time.time()))
+    conn.commit()
+    return generation
+
+
+def activate(conn, modality, generation):
+    """Atomically makes `generation` the one readers see; the previous one is retired."""
+    with conn:
+        conn.execute('UPDATE index_generations SET status = ? WHERE modality = ? AND status = ?',
+                     (RETIRED, modality, ACTIVE))
+        # Record the implicit pre-reindex generation 0 (if still unrecorded) so it can be dropped later
+        conn.execute('INSERT OR IGNORE INTO index_generations (modality, generation, status, created_at) '
+                     'VALUES (?, 0, ?, ?)', (modality, RETIRED, time.time()))
+        conn.execute('UPDATE index_generations SET status = ?, activated_at = ? WHERE modality = ? AND generation = ?',
+                     (ACTIVE, time.time(), modality, generation))
+
+
+def retired_generations(conn, modality):
+    return [row[0] for row in conn.execute(
+        'SELECT generation FROM index_generations WHERE modality = ? AND status = ?', (modality, RETIRED))]
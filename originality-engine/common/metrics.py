@@ -0,0 +1,298 @@
+import functools
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Minimal Prometheus-style instrumentation (text exposition format 0.0.4).
+# Dependency-free and cheap enough to stay on in production: an observation is one
+# bisect over the bucket bounds plus a short critical section.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[n]) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        # Unlabelled metrics act as their own single child
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.samples(self.name, self.labelnames, key))
+        return lines
+
+
+class _Value:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+    def samples(self, name, labelnames, key):
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self.value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _Value()
+
+    def set(self, value):
+        self._default().set(value)
+
+    def inc(self, amount=1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount=1.0):
+        self._default().dec(amount)
+
+
+class _FunctionGauge(_Metric):
+    """Gauge whose value is computed at scrape time (e.g. corpus size, queue depth)."""
+    kind = "gauge"
+
+    def __init__(self, name, documentation, fn, kind="gauge"):
+        super().__init__(name, documentation)
+        self.fn = fn
+        self.kind = kind
+
+    def render(self):
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}",
+                f"{self.name} {_format_value(value)}"]
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self, name, labelnames, key):
+        with self._lock:
+            counts = list(self.counts)
+            total_sum = self.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, [('le', _format_value(bound))])} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total_sum)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def _register(self, metric):
+        with self._lock:
+            # Re-registering the same name returns the existing metric (module reloads, several engines per process)
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge_fn(self, name, documentation, fn, kind="gauge"):
+        """Registers (or replaces) a metric computed by `fn()` at scrape time."""
+        metric = _FunctionGauge(name, documentation, fn, kind)
+        with self._lock:
+            self._metrics[name] = metric
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'originality_stage_seconds', 'Latency of engine processing stages', ['engine', 'stage'])
+REQUEST_SECONDS = REGISTRY.histogram(
+    'originality_http_request_seconds', 'HTTP request latency', ['service', 'endpoint', 'status'])
+REQUESTS_IN_FLIGHT = REGISTRY.gauge(
+    'originality_http_requests_in_flight', 'HTTP requests currently being served', ['service'])
+CACHE_REQUESTS = REGISTRY.counter(
+    'originality_cache_requests_total', 'Cache lookups by cache and result (hit/miss)', ['cache', 'result'])
+
+
+# Per-request stage breakdown (see common/profiling.py): when a trace is active on the
+# current thread, every stage also appends its timing to it.
+_trace = threading.local()
+
+
+def begin_trace():
+    _trace.stages = []
+
+
+def end_trace():
+    """Stops the current thread's trace and returns [(engine, stage, seconds), ...] or None."""
+    stages = getattr(_trace, 'stages', None)
+    _trace.stages = None
+    return stages
+
+
+@contextmanager
+def stage(engine, name):
+    """Times a processing stage into originality_stage_seconds{engine, stage}."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.labels(engine=engine, stage=name).observe(elapsed)
+        stages = getattr(_trace, 'stages', None)
+        if stages is not None:
+            stages.append((engine, name, elapsed))
+
+
+def timed(engine, name):
+    """Decorator form of `stage` for engine methods."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(engine, name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def cache_result(cache, hit):
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def instrument_app(app, service):
+    """Adds request latency / in-flight metrics and a GET /metrics endpoint to a Flask app."""
+    from flask import Response, g, request
+
+    in_flight = REQUESTS_IN_FLIGHT.labels(service=service)
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started = time.perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def _record(response):
+        started = g.pop('_metrics_started', None)
+        if started is not None:
+            in_flight.dec()
+            endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+            REQUEST_SECONDS.labels(service=service, endpoint=endpoint,
+                                   status=response.status_code).observe(time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def _teardown(exc):
+        # after_request is skipped when a handler raises; keep the in-flight gauge honest
+        if g.pop('_metrics_started', None) is not None:
+            in_flight.dec()
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+    return app
@@ -0,0 +1,421 @@
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from common import tombstones
+
+# Flat, versioned, memory-mappable index segments shared by every worker process.
+#
+#   <db dir>/<db name>.index/<modality>-g<generation>/
+#       CURRENT                   {"version", "last_row", "last_tombstone", ...} (replaced atomically)
+#       v000003-<array>.npy       base segment arrays, opened with np.load(mmap_mode='r')
+#
+# Readers map the base segment read-only, so N workers share one copy in the page cache.
+# Rows registered after the base was written (id > last_row) form a small per-process
+# delta loaded from SQLite; deletions after it (asset_tombstones) become a dead mask.
+# Once the delta or the dead set grows past a threshold, one process (lock file) merges
+# base + delta - dead into a new version and swaps CURRENT; the others remap on refresh.
+# Old versions are never overwritten in place (Windows cannot replace a mapped file).
+# Rows accepted by a write-behind log but not committed yet (common/writebehind.py) are
+# searched with the delta as pending rows until a refresh loads their committed ids.
+
+INDEX_DIR = os.environ.get('ORIGINALITY_INDEX_DIR')
+MERGE_ROWS = int(os.environ.get('ORIGINALITY_INDEX_MERGE_ROWS', '1024'))
+MERGE_DEAD_RATIO = 0.1
+LOCK_STALE_SECONDS = 600
+
+# Full scans (semantic cosine, image Hamming) split the rows into one chunk per thread,
+# at least CHUNK_ROWS each, and score them on a shared pool: NumPy releases the GIL
+# inside ufuncs and matmul, so the chunks run on separate cores.
+SCORING_THREADS = int(os.environ.get('ORIGINALITY_SCORING_THREADS', '0')) or (os.cpu_count() or 1)
+CHUNK_ROWS = int(os.environ.get('ORIGINALITY_SCORING_CHUNK_ROWS', '65536'))
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def scoring_pool(threads):
+    with _pools_lock:
+        if threads not in _pools:
+            _pools[threads] = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='scoring')
+        return _pools[threads]
+
+
+def map_chunks(fn, rows, threads=None, chunk_rows=None):
+    """
+    Calls fn(start, stop) over contiguous row ranges covering `rows` rows, concurrently
+    when there is more than one range. Returns the results in row order.
+    """
+    threads = threads or SCORING_THREADS
+    chunks = max(1, min(threads, rows // (chunk_rows or CHUNK_ROWS)))
+    bounds = np.linspace(0, rows, chunks + 1).astype(np.int64)
+    ranges = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+    if chunks == 1:
+        return [fn(0, rows)]
+    return list(scoring_pool(threads).map(lambda r: fn(*r), ranges))
+
+
+def advise_random(array):
+    """
+    Tells the kernel a mapped array is read at random rows, so a page fault reads the
+    page it needs from disk instead of a readahead window around it.
+    """
+    while array is not None and not isinstance(array, mmap.mmap):
+        array = getattr(array, '_mmap', None) or getattr(array, 'base', None)
+    if array is not None and hasattr(array, 'madvise') and hasattr(mmap, 'MADV_RANDOM'):
+        array.madvise(mmap.MADV_RANDOM)
+
+
+def index_root(db_path):
+    base = INDEX_DIR or os.path.dirname(os.path.abspath(db_path))
+    return os.path.join(base, os.path.splitext(os.path.basename(db_path))[0] + '.index')
+
+
+def generation_dir(db_path, modality, generation):
+    return os.path.join(index_root(db_path), f"{modality}-g{generation}")
+
+
+def drop_generation(db_path, modality, generation):
+    """Removes the index files of a dropped generation."""
+    shutil.rmtree(generation_dir(db_path, modality, generation), ignore_errors=True)
+
+
+class SegmentStore:
+    """One directory of versioned .npy segments plus the CURRENT manifest."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.current_path = os.path.join(directory, 'CURRENT')
+        self.lock_path = os.path.join(directory, 'merge.lock')
+
+    def manifest(self):
+        try:
+            with open(self.current_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def load(self, manifest):
+        # Plain ndarray views of the read-only maps: slicing a np.memmap costs a subclass wrap per call
+        return {name: np.asarray(np.load(self._path(manifest["version"], name), mmap_mode='r'))
+                for name in manifest["arrays"]}
+
+    def _path(self, version, name):
+        return os.path.join(self.directory, f"v{version:06d}-{name}.npy")
+
+    def write(self, arrays, meta):
+        """Writes a new version and atomically points CURRENT at it. Returns the manifest."""
+        os.makedirs(self.directory, exist_ok=True)
+        current = self.manifest()
+        version = (current["version"] if current else 0) + 1
+        for name, array in arrays.items():
+            tmp = self._path(version, name) + '.tmp'
+            with open(tmp, 'wb') as f:
+                np.save(f, np.ascontiguousarray(array))
+            os.replace(tmp, self._path(version, name))
+        manifest = dict(meta, version=version, arrays=sorted(arrays), created_at=time.time())
+        tmp = self.current_path + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, self.current_path)
+        self._cleanup(version)
+        return manifest
+
+    def _cleanup(self, version):
+        # Keep the previous version for readers that have not remapped yet
+        for name in os.listdir(self.directory):
+            if name.startswith('v') and name.endswith('.npy'):
+                try:
+                    if int(name[1:7]) < version - 1:
+                        os.remove(os.path.join(self.directory, name))
+                except (ValueError, OSError):
+                    pass  # still mapped elsewhere (Windows) - removed on a later merge
+
+    def try_lock(self):
+        os.makedirs(self.directory, exist_ok=True)
+        try:
+            if time.time() - os.path.getmtime(self.lock_path) > LOCK_STALE_SECONDS:
+                os.remove(self.lock_path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def unlock(self):
+        try:
+            os.remove(self.lock_path)
+        except OSError:
+            pass
+
+
+class MappedIndex:
+    """
+    Base + delta + dead-mask view of one signature table. Subclasses define how DB rows
+    become arrays (`_decode`) and any derived lookup arrays for the base (`_derive`).
+    Every array has one entry per row along axis 0, except derived ones.
+    """
+    modality = None
+    table = None
+    id_column = None
+    columns = ()          # selected after id and the asset id column
+    row_arrays = ()       # per-row arrays kept in base and delta (besides rows / ids)
+
+    def __init__(self, db_path, merge_rows=MERGE_ROWS, threads=None):
+        self.db_path = db_path
+        self.merge_rows = merge_rows
+        self.threads = threads or SCORING_THREADS
+        self._lock = threading.RLock()
+        self._merging = False
+        self.generation = None
+        self.store = None
+        self._pending = {}  # key -> [committed max row id or None, [(asset id, decoded values)]]
+        self._reset()
+
+    def _reset(self):
+        self.manifest = None
+        self.base = None
+        self._stale_base = False  # on-disk base written with other params; rebuilt from the DB
+        self.dead = None          # bool mask over base rows (per process)
+        self._last_row = 0
+        self._last_tombstone = 0
+        self._delta = {name: [] for name in ('rows', 'ids') + self.row_arrays}
+        self._delta_arrays = None
+
+    # --- subclass hooks ---
+
+    def _decode(self, db_row):
+        """DB row -> {array name: value} or None to skip the row."""
+        raise NotImplementedError
+
+    def _stack(self, name, values):
+        if name == 'rows':
+            return np.asarray(values, dtype=np.int64)
+        if name == 'ids':
+            return np.asarray(values, dtype=str) if values else np.zeros(0, dtype='<U1')
+        return np.asarray(values)
+
+    def _concat(self, name, parts):
+        return np.concatenate(parts)
+
+    def _derive(self, arrays):
+        """Lookup arrays built from the per-row arrays (for the base and the delta alike)."""
+        return {}
+
+    def _derive_base(self, arrays, base, alive):
+        """
+        Arrays only a merged base carries (e.g. trained codes). `arrays` holds the rows of
+        the previous `base` still `alive`, in order, followed by the delta rows.
+        """
+        return {}
+
+    def _params(self):
+        """Settings the on-disk arrays depend on; a base written with others is rebuilt."""
+        return {}
+
+    def _compatible(self, manifest):
+        return all(manifest.get(key) == value for key, value in self._params().items())
+
+    def _on_remap(self):
+        pass
+
+    def _resident(self, name):
+        """Whether base array `name` is read on every check (prefault() touches those)."""
+        return True
+
+    # --- refresh ---
+
+    def __len__(self):
+        base = int(self.base['rows'].shape[0] - self.dead.sum()) if self.base is not None else 0
+        return base + len(self._delta['rows']) + sum(len(rows) for _, rows in self._pending.values())
+
+    def refresh(self, conn, generation=0):
+        """Remaps a newer base version, loads new delta rows and replays tombstones."""
+        with self._lock:
+            if generation != self.generation:
+                self._reset()
+                self.generation = generation
+                self.store = SegmentStore(generation_dir(self.db_path, self.modality, generation))
+            manifest = self.store.manifest()
+            if manifest and (self.manifest is None or manifest["version"] != self.manifest["version"]):
+                if self._compatible(manifest):
+                    self._remap(manifest)
+                else:
+                    # Keep loading everything as delta; the next merge replaces the base
+                    self.manifest, self._stale_base = manifest, True
+
+            rows = conn.execute(f'SELECT id, {self.id_column}, {", ".join(self.columns)} FROM {self.table} '
+                                f'WHERE id > ? AND generation = ? AND deleted = 0 ORDER BY id',
+                                (self._last_row, generation)).fetchall()
+            for db_row in rows:
+                self._last_row = db_row[0]
+                values = self._decode(db_row)
+                if values is None:
+                    continue
+                self._delta['rows'].append(db_row[0])
+                self._delta['ids'].append(db_row[1])
+                for name in self.row_arrays:
+                    self._delta[name].append(values[name])
+                self._delta_arrays = None
+
+            for tombstone_id, asset_id, max_row in tombstones.since(conn, self.modality, self._last_tombstone):
+                self._last_tombstone = tombstone_id
+                self._remove(asset_id, max_row)
+
+            self._prune_pending()
+            if self.merge_rows > 0 and not self._merging and self._needs_merge():
+                self._merging = True
+                threading.Thread(target=self._merge, name=f"{self.modality}-index-merge", daemon=True).start()
+            return len(rows)
+
+    def _remap(self, manifest):
+        self.manifest = manifest
+        self.base = self.store.load(manifest)
+        self.dead = np.zeros(self.base['rows'].shape[0], dtype=bool)
+        # The new base covers every row up to last_row; keep only newer delta rows
+        keep = [i for i, row in enumerate(self._delta['rows']) if row > manifest["last_row"]]
+        self._delta = {name: [values[i] for i in keep] for name, values in self._delta.items()}
+        self._delta_arrays = None
+        self._last_row = max(self._last_row, manifest["last_row"])
+        # Tombstones up to last_tombstone are already excluded from the base; newer ones are replayed
+        self._last_tombstone = manifest["last_tombstone"]
+        self._on_remap()
+
+    def prefault(self):
+        """
+        Reads one byte per page of the mapped base arrays checks scan, so the first checks
+        don't fault them in from disk. Returns the bytes covered.
+        """
+        with self._lock:
+            base = self.base
+        if base is None:
+            return 0
+        total = 0
+        for name, array in base.items():
+            if self._resident(name) and array.size:
+                data = array.reshape(-1).view(np.uint8)
+                int(data[::mmap.PAGESIZE].sum())
+                total += data.nbytes
+        return total
+
+    def remove(self, asset_id, max_row):
+        """Drops the rows of `asset_id` up to `max_row` (a deletion made by this process)."""
+        with self._lock:
+            self._remove(asset_id, max_row)
+
+    def _remove(self, asset_id, max_row):
+        # Committed pending rows a refresh will not load now that they are deleted
+        for key in [key for key, (row, rows) in self._pending.items()
+                    if row is not None and row <= max_row and rows and rows[0][0] == asset_id]:
+            del self._pending[key]
+            self._delta_arrays = None
+        if self.base is not None:
+            hit = (self.base['ids'] == asset_id) & (self.base['rows'] <= max_row)
+            self.dead |= hit
+        keep = [i for i, (row, aid) in enumerate(zip(self._delta['rows'], self._delta['ids']))
+                if not (aid == asset_id and row <= max_row)]
+        if len(keep) != len(self._delta['rows']):
+            self._delta = {name: [values[i] for i in keep] for name, values in self._delta.items()}
+            self._delta_arrays = None
+
+    def delta(self):
+        """The delta segment plus the pending rows as arrays (cached until it changes)."""
+        with self._lock:
+            if self._delta_arrays is None:
+                columns = {name: list(values) for name, values in self._delta.items()}
+                for _, rows in self._pending.values():
+                    for asset_id, values in rows:
+                        columns['rows'].append(-1)  # no row id until committed
+                        columns['ids'].append(asset_id)
+                        for name in self.row_arrays:
+                            columns[name].append(values[name])
+                arrays = {name: self._stack(name, values) for name, values in columns.items()}
+                arrays.update(self._derive(arrays))
+                self._delta_arrays = arrays
+            return self._delta_arrays
+
+    # --- pending rows (write-behind) ---
+
+    def add_pending(self, key, db_rows):
+        """Makes rows not committed to SQLite yet searchable; `db_rows` are shaped like refresh's SELECT."""
+        rows = []
+        for db_row in db_rows:
+            values = self._decode(db_row)
+            if values is not None:
+                rows.append((db_row[1], values))
+        with self._lock:
+            self._pending[key] = [None, rows]
+            self._delta_arrays = None
+
+    def commit_pending(self, key, max_row):
+        """The rows of `key` are committed up to `max_row`; they stay pending until refresh loads that row."""
+        with self._lock:
+            if key in self._pending:
+                self._pending[key][0] = max_row
+
+    def drop_pending(self, key):
+        """Forgets the rows of `key`, which will never be committed."""
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self._delta_arrays = None
+
+    def _prune_pending(self):
+        done = [key for key, (max_row, _) in self._pending.items() if max_row is not None and max_row <= self._last_row]
+        for key in done:
+            del self._pending[key]
+        if done:
+            self._delta_arrays = None
+
+    # --- merge ---
+
+    def _needs_merge(self):
+        if self._stale_base:
+            return True
+        dead = int(self.dead.sum()) if self.dead is not None else 0
+        base_rows = self.base['rows'].shape[0] if self.base is not None else 0
+        return (len(self._delta['rows']) >= self.merge_rows
+                or (dead and dead > MERGE_DEAD_RATIO * base_rows))
+
+    def merge(self):
+        """Writes base + delta - dead as a new version (also run in the background by refresh)."""
+        store = self.store  # a generation switch mid-merge replaces self.store
+        if not store.try_lock():
+            return None
+        try:
+            with self._lock:
+                if self.store is not store or store.manifest() != self.manifest:
+                    return None  # another process merged; remap on the next refresh
+                base, alive = self.base, (~self.dead if self.dead is not None else None)
+                # Committed delta rows only: pending rows have no row id yet
+                delta = {name: self._stack(name, values) for name, values in self._delta.items()}
+                meta = dict(self._params(), generation=self.generation, last_row=self._last_row,
+                            last_tombstone=self._last_tombstone)
+            arrays = {}
+            for name in ('rows', 'ids') + self.row_arrays:
+                parts = ([np.asarray(base[name][alive])] if base is not None else []) + \
+                        ([delta[name]] if len(delta['rows']) else [])
+                arrays[name] = self._concat(name, parts) if parts else self._stack(name, [])
+            arrays.update(self._derive(arrays))
+            arrays.update(self._derive_base(arrays, base, alive))
+            return store.write(arrays, meta)
+        finally:
+            store.unlock()
+
+    def _merge(self):
+        try:
+            manifest = self.merge()
+            if manifest:
+                print(f"[{self.modality} index] merged to version {manifest['version']} "
+                      f"({manifest['last_row']} last row)")
+        except Exception as e:
+            print(f"[{self.modality} index] merge failed: {e}")
+        finally:
+            self._merging = False
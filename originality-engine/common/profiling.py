@@ -0,0 +1,267 @@
+import cProfile
+import heapq
+import hmac
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+try:
+    from .metrics import begin_trace, end_trace
+except ImportError:
+    from metrics import begin_trace, end_trace
+
+# Opt-in per-request profiling + rolling "slowest N requests" with stage breakdowns.
+#
+# A request is profiled when it carries `X-Profile: sample|cprofile` (or `?profile=...`)
+# AND a valid `X-Admin-Token` matching ORIGINALITY_ADMIN_TOKEN. Without that env var
+# profiling and the /debug endpoints are disabled. Asset deletes (/delete on every
+# service) need the same token, see admin_refusal.
+#
+#   sample   - wall-clock stack sampler; stored as collapsed stacks (`a;b;c 42`), which
+#              flamegraph.pl, speedscope and inferno read directly
+#   cprofile - deterministic cProfile; stored as a pstats dump (snakeviz, flameprof)
+
+ADMIN_TOKEN = os.environ.get('ORIGINALITY_ADMIN_TOKEN')
+PROFILE_DIR = os.environ.get('ORIGINALITY_PROFILE_DIR', 'profiles')
+SAMPLE_INTERVAL = float(os.environ.get('ORIGINALITY_PROFILE_INTERVAL_MS', '5')) / 1000.0
+PROFILE_KEEP = int(os.environ.get('ORIGINALITY_PROFILE_KEEP', '200'))  # newest profile files kept on disk
+SLOWEST_N = int(os.environ.get('ORIGINALITY_SLOWEST_N', '20'))
+SLOWEST_WINDOW = float(os.environ.get('ORIGINALITY_SLOWEST_WINDOW_S', '3600'))
+PROFILE_MODES = ('sample', 'cprofile')
+# Request ids become file names, so client-supplied ones must be plain tokens
+REQUEST_ID_RE = re.compile(r'[A-Za-z0-9_-]{1,64}')
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, thread_id, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class CProfileRunner:
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def dump(self, path):
+        self.profile.dump_stats(path)
+
+
+class SlowestRequests:
+    """Keeps the N slowest requests of the last `window` seconds, with their stage breakdowns."""
+
+    def __init__(self, n=SLOWEST_N, window=SLOWEST_WINDOW):
+        self.n = n
+        self.window = window
+        self._heap = []  # min-heap of (duration, seq, entry)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        if any(now - entry["finished_at"] > self.window for _, _, entry in self._heap):
+            self._heap = [item for item in self._heap if now - item[2]["finished_at"] <= self.window]
+            heapq.heapify(self._heap)
+
+    def record(self, duration, entry):
+        with self._lock:
+            self._expire(entry["finished_at"])
+            self._seq += 1
+            item = (duration, self._seq, entry)
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, item)
+            elif duration > self._heap[0][0]:
+                heapq.heapreplace(self._heap, item)
+
+    def snapshot(self):
+        with self._lock:
+            self._expire(time.time())
+            return [entry for _, _, entry in sorted(self._heap, reverse=True)]
+
+
+def stage_breakdown(stages):
+    """[(engine, stage, seconds)] -> {"engine.stage": {"ms": total, "calls": n}}"""
+    breakdown = {}
+    for engine, name, seconds in stages or []:
+        item = breakdown.setdefault(f"{engine}.{name}", {"ms": 0.0, "calls": 0})
+        item["ms"] += seconds * 1000.0
+        item["calls"] += 1
+    for item in breakdown.values():
+        item["ms"] = round(item["ms"], 3)
+    return breakdown
+
+
+def request_id_from(headers):
+    """The caller's X-Request-Id if it is a safe token, else a fresh uuid."""
+    request_id = headers.get('X-Request-Id', '')
+    return request_id if REQUEST_ID_RE.fullmatch(request_id) else uuid.uuid4().hex
+
+
+def prune_profiles(profile_dir, keep=PROFILE_KEEP):
+    """Deletes all but the `keep` newest profile files."""
+    try:
+        entries = [e for e in os.scandir(profile_dir)
+                   if e.is_file() and e.name.endswith(('.folded', '.prof'))]
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime, reverse=True)
+    for entry in entries[max(0, keep):]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass  # already removed by another worker
+
+
+def is_admin(request):
+    token = request.headers.get('X-Admin-Token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def admin_refusal(request):
+    """None for an admin request, else a Flask error tuple: 401 without a token, 403 with a wrong one."""
+    if is_admin(request):
+        return None
+    from flask import jsonify
+    if not ADMIN_TOKEN:
+        return jsonify({"error": "Disabled: ORIGINALITY_ADMIN_TOKEN is not set"}), 403
+    if not request.headers.get('X-Admin-Token'):
+        return jsonify({"error": "Missing X-Admin-Token"}), 401
+    return jsonify({"error": "Invalid X-Admin-Token"}), 403
+
+
+def admin_headers():
+    """Headers for service-to-service admin calls (e.g. a video delete removing its frames)."""
+    return {'X-Admin-Token': ADMIN_TOKEN} if ADMIN_TOKEN else {}
+
+
+def install_profiling(app, service, tracked_endpoints=('/check', '/register'), profiled_endpoints=('/check',)):
+    """
+    Adds request ids, stage traces, opt-in profiling and the admin-only endpoints
+    GET /debug/slowest and GET /debug/profiles/<request_id> to a Flask app.
+    """
+    from flask import abort, g, jsonify, request, send_from_directory
+
+    slowest = SlowestRequests()
+    profile_dir = os.path.abspath(PROFILE_DIR)
+
+    @app.before_request
+    def _start_profiling():
+        rule = request.url_rule.rule if request.url_rule else None
+        if rule not in tracked_endpoints:
+            return
+        g._request_id = request_id_from(request.headers)
+        g._request_started = time.perf_counter()
+        begin_trace()
+
+        mode = request.headers.get('X-Profile') or request.args.get('profile')
+        if mode and rule in profiled_endpoints and is_admin(request):
+            mode = mode if mode in PROFILE_MODES else 'sample'
+            runner = StackSampler(threading.get_ident()) if mode == 'sample' else CProfileRunner()
+            try:
+                runner.start()
+            except ValueError:
+                # cProfile refuses to run while another profiler is active (Python 3.12+)
+                runner = StackSampler(threading.get_ident())
+                runner.start()
+                mode = 'sample'
+            g._profiler = (mode, runner)
+
+    @app.after_request
+    def _finish_profiling(response):
+        started = g.pop('_request_started', None)
+        if started is None:
+            return response
+        duration = time.perf_counter() - started
+        request_id = g.pop('_request_id')
+        stages = end_trace()
+        response.headers['X-Request-Id'] = request_id
+
+        profile_file = None
+        profiler = g.pop('_profiler', None)
+        if profiler:
+            mode, runner = profiler
+            runner.stop()
+            os.makedirs(profile_dir, exist_ok=True)
+            profile_file = f"{request_id}.{'folded' if mode == 'sample' else 'prof'}"
+            runner.dump(os.path.join(profile_dir, profile_file))
+            prune_profiles(profile_dir)
+            response.headers['X-Profile-Id'] = request_id
+            response.headers['X-Profile-File'] = profile_file
+
+        slowest.record(duration, {
+            "request_id": request_id,
+            "service": service,
+            "endpoint": request.url_rule.rule,
+            "status": response.status_code,
+            "duration_ms": round(duration * 1000.0, 3),
+            "finished_at": time.time(),
+            "stages": stage_breakdown(stages),
+            "profile": profile_file,
+        })
+        return response
+
+    @app.teardown_request
+    def _cleanup_profiling(exc):
+        # Handler raised before after_request ran: stop the profiler and drop the trace
+        profiler = g.pop('_profiler', None)
+        if profiler:
+            profiler[1].stop()
+        if g.pop('_request_started', None) is not None:
+            end_trace()
+
+    @app.route('/debug/slowest', methods=['GET'])
+    def debug_slowest():
+        if not is_admin(request):
+            abort(403)
+        return jsonify({"service": service, "window_seconds": slowest.window, "requests": slowest.snapshot()})
+
+    @app.route('/debug/profiles/<request_id>', methods=['GET'])
+    def debug_profile(request_id):
+        if not is_admin(request):
+            abort(403)
+        if not REQUEST_ID_RE.fullmatch(request_id):
+            abort(404)
+        for ext in ('folded', 'prof'):
+            name = f"{request_id}.{ext}"
+            if os.path.exists(os.path.join(profile_dir, name)):
+                return send_from_directory(profile_dir, name, as_attachment=True)
+        abort(404)
+
+    return slowest
@@ -0,0 +1,182 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Asset deletion. Deleting an asset sets `deleted = 1` on its signature rows (SQL scans
+# skip them at once) and appends to the asset_tombstones log, which in-memory indexes
+# in every process replay on their next refresh. Compaction later removes tombstoned
+# rows for good and VACUUMs, once they make up more than `threshold` of a table.
+#
+#   asset_tombstones(id, modality, asset_id, max_row, deleted_at)
+#   max_row: highest row id deleted, so a later re-registration under the same id survives
+#
+# Readers only need a log entry until every process has replayed it and the shared index
+# base (common/mmap_index.py) excludes its rows, so compaction prunes entries older than
+# TOMBSTONE_RETENTION that the active base's last_tombstone already covers.
+#
+#   deleted_assets(modality, asset_id, deleted_at)
+#
+# is the durable record of what was deleted, one row per asset, never pruned: reindex.py
+# build reads it to keep deleted assets out of new generations long after the log entry
+# is gone.
+
+COMPACT_THRESHOLD = float(os.environ.get('ORIGINALITY_COMPACT_THRESHOLD', '0.2'))
+COMPACT_INTERVAL = float(os.environ.get('ORIGINALITY_COMPACT_INTERVAL_S', '300'))
+TOMBSTONE_RETENTION = float(os.environ.get('ORIGINALITY_TOMBSTONE_RETENTION_S', '86400'))
+MODALITIES = {'text_assets': 'text', 'image_hashes': 'image'}
+
+
+def ensure_schema(conn, table):
+    """Creates asset_tombstones and adds the deleted flag to `table` (older DBs)."""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS asset_tombstones (
+            id          INTEGER PRIMARY KEY AUTOINCREMENT,
+            modality    TEXT NOT NULL,
+            asset_id    TEXT NOT NULL,
+            max_row     INTEGER NOT NULL,
+            deleted_at  REAL NOT NULL
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS deleted_assets (
+            modality    TEXT NOT NULL,
+            asset_id    TEXT NOT NULL,
+            deleted_at  REAL NOT NULL,
+            PRIMARY KEY (modality, asset_id)
+        )
+    ''')
+    # Deletes logged before deleted_assets existed (and not pruned yet)
+    conn.execute('INSERT OR IGNORE INTO deleted_assets SELECT modality, asset_id, MAX(deleted_at) '
+                 'FROM asset_tombstones GROUP BY modality, asset_id')
+    columns = {row[1] for row in conn.execute(f'PRAGMA table_info({table})')}
+    if 'deleted' not in columns:
+        conn.execute(f'ALTER TABLE {table} ADD COLUMN deleted INTEGER NOT NULL DEFAULT 0')
+
+
+def tombstone(conn, modality, table, id_column, asset_ids):
+    """Marks the live rows of `asset_ids` deleted and logs them. Returns {asset_id: (rows, max_row)}."""
+    deleted = {}
+    for asset_id in asset_ids:
+        count, max_row = conn.execute(f'SELECT COUNT(*), MAX(id) FROM {table} WHERE {id_column} = ? AND deleted = 0',
+                                      (asset_id,)).fetchone()
+        if not count:
+            continue
+        conn.execute(f'UPDATE {table} SET deleted = 1 WHERE {id_column} = ? AND deleted = 0 AND id <= ?',
+                     (asset_id, max_row))
+        conn.execute('INSERT INTO asset_tombstones (modality, asset_id, max_row, deleted_at) VALUES (?, ?, ?, ?)',
+                     (modality, asset_id, max_row, time.time()))
+        conn.execute('INSERT OR REPLACE INTO deleted_assets VALUES (?, ?, ?)', (modality, asset_id, time.time()))
+        deleted[asset_id] = (count, max_row)
+    return deleted
+
+
+def since(conn, modality, last_id):
+    """Tombstones logged after `last_id`: [(id, asset_id, max_row)]."""
+    return conn.execute('SELECT id, asset_id, max_row FROM asset_tombstones WHERE modality = ? AND id > ? ORDER BY id',
+                        (modality, last_id)).fetchall()
+
+
+def deleted_ids(conn, modality, table, id_column, generation):
+    """Asset ids ever deleted that have no live rows in `generation` (not registered again since)."""
+    return {row[0] for row in conn.execute(
+        f'SELECT asset_id FROM deleted_assets WHERE modality = ? AND asset_id NOT IN '
+        f'(SELECT {id_column} FROM {table} WHERE deleted = 0 AND generation = ?)', (modality, generation))}
+
+
+def base_horizon(conn, db_path, modality):
+    """Last tombstone id the active index base already excludes (None: no base written yet)."""
+    from common import generations, mmap_index  # mmap_index imports this module
+    try:
+        generation = generations.active_generation(conn, modality)
+    except sqlite3.OperationalError:
+        generation = 0  # DB from before re-indexing
+    directory = mmap_index.generation_dir(db_path, modality, generation)
+    manifest = mmap_index.SegmentStore(directory).manifest()
+    return manifest["last_tombstone"] if manifest else None
+
+
+def prune(conn, db_path, modality, retention=TOMBSTONE_RETENTION):
+    """Drops log entries no reader can still need (deleted_assets is kept). Returns how many were removed."""
+    cutoff = time.time() - retention
+    horizon = base_horizon(conn, db_path, modality)
+    if horizon is None:
+        # Without a base every reader loads live rows from SQL; only running processes replay
+        query, params = 'modality = ? AND deleted_at < ?', (modality, cutoff)
+    else:
+        query, params = 'modality = ? AND deleted_at < ? AND id <= ?', (modality, cutoff, horizon)
+    with conn:
+        return conn.execute(f'DELETE FROM asset_tombstones WHERE {query}', params).rowcount
+
+
+def tombstone_ratio(conn, table):
+    total, deleted = conn.execute(f'SELECT COUNT(*), COALESCE(SUM(deleted), 0) FROM {table}').fetchone()
+    return (deleted / total) if total else 0.0
+
+
+def compact(db_path, tables, threshold=COMPACT_THRESHOLD, vacuum=True):
+    """
+    Physically removes tombstoned rows from every table whose tombstone ratio exceeds
+    `threshold`, then VACUUMs so the file (and scan cost) tracks the live corpus.
+    Old asset_tombstones entries are pruned as well. Returns {table: rows removed}.
+    """
+    conn = sqlite3.connect(db_path, timeout=30)
+    removed = {}
+    try:
+        for table in tables:
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+                continue
+            ratio = tombstone_ratio(conn, table)
+            if ratio <= threshold or ratio == 0:
+                continue
+            with conn:
+                removed[table] = conn.execute(f'DELETE FROM {table} WHERE deleted = 1').rowcount
+            print(f"[compaction] {table}: removed {removed[table]} tombstoned rows (ratio {ratio:.2f})")
+        for table in tables:
+            if table in MODALITIES and conn.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'asset_tombstones'").fetchone():
+                pruned = prune(conn, db_path, MODALITIES[table])
+                if pruned:
+                    print(f"[compaction] {MODALITIES[table]}: pruned {pruned} tombstone log entries")
+        if removed and vacuum:
+            try:
+                conn.execute('VACUUM')
+            except sqlite3.OperationalError as e:
+                # Another connection is mid-transaction; the next pass retries
+                print(f"[compaction] VACUUM skipped: {e}")
+    finally:
+        conn.close()
+    return removed
+
+
+def start_compactor(db_path, tables, interval=COMPACT_INTERVAL, threshold=COMPACT_THRESHOLD):
+    """Runs `compact` every `interval` seconds on a daemon thread (interval <= 0 disables it)."""
+    if interval <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                compact(db_path, tables, threshold)
+            except Exception as e:
+                print(f"[compaction] failed: {e}")
+
+    thread = threading.Thread(target=run, name="compactor", daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Remove tombstoned rows and VACUUM the fingerprint DB")
+    parser.add_argument('--db', default=os.environ.get('ORIGINALITY_DB_PATH') or os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audioFiles', 'fingerprints.db'))
+    parser.add_argument('--threshold', type=float, default=0.0, help='Only compact tables above this ratio')
+    args = parser.parse_args()
+    removed = compact(args.db, ('text_assets', 'image_hashes'), args.threshold)
+    print(f"Compacted: {removed or 'nothing to do'}")
+
+
+if __name__ == "__main__":
+    main()
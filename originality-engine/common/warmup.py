@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+# Service warm-up. A freshly started service otherwise pays for its cold caches on its
+# first real requests: SQLite pages read from disk, mapped index files faulted in page by
+# page, the encoder's first (much slower) call. Each engine's warm_up() does that work up
+# front as a list of timed steps; install_warmup exposes it as POST /warmup, plus GET
+# /ready, which answers 503 until a warm-up has succeeded so a supervisor
+# (start_servers.py) or a load balancer can hold traffic until then.
+
+WARMUP_DB_MB = float(os.environ.get('ORIGINALITY_WARMUP_DB_MB', '1024'))  # DB bytes read into the page cache
+
+WARMUP_SECONDS = REGISTRY.gauge('originality_warmup_seconds', 'Duration of the last warm-up step', ['service', 'step'])
+
+
+def prefetch_file(path, limit_mb=WARMUP_DB_MB):
+    """Reads (up to `limit_mb` of) a file so its pages are in the page cache. Returns bytes read."""
+    limit, done = int(limit_mb * 1024 * 1024), 0
+    try:
+        with open(path, 'rb', buffering=0) as f:
+            while done < limit:
+                chunk = f.read(min(1 << 20, limit - done))
+                if not chunk:
+                    break
+                done += len(chunk)
+    except OSError:
+        pass
+    return done
+
+
+def run_steps(service, steps):
+    """
+    Runs [(name, fn)] in order and returns {name: {"ms": ..., **fn()}}; fn returns a dict
+    of details or None. A failing step raises, so the service is not reported ready.
+    """
+    report = {}
+    for name, fn in steps:
+        started = time.perf_counter()
+        details = fn() or {}
+        seconds = time.perf_counter() - started
+        WARMUP_SECONDS.labels(service=service, step=name).set(seconds)
+        report[name] = dict(details, ms=round(seconds * 1000, 1))
+    return report
+
+
+def install_warmup(app, service, warm_up):
+    """
+    Adds POST /warmup, which runs warm_up() (one at a time) and returns its step report,
+    and GET /ready: 200 once a warm-up has succeeded, 503 before.
+    """
+    from flask import jsonify
+
+    lock = threading.Lock()
+    state = {"ready": False, "steps": None}
+
+    @app.route('/warmup', methods=['POST'])
+    def _warmup():
+        with lock:
+            started = time.perf_counter()
+            try:
+                state["steps"] = warm_up()
+            except Exception as e:
+                return jsonify({"service": service, "ready": state["ready"], "error": str(e)}), 500
+            state["ready"] = True
+            return jsonify({"service": service, "ready": True, "steps": state["steps"],
+                            "ms": round((time.perf_counter() - started) * 1000, 1)})
+
+    @app.route('/ready', methods=['GET'])
+    def _ready():
+        return jsonify({"service": service, "ready": state["ready"], "steps": state["steps"]}), \
+            200 if state["ready"] else 503
@@ -0,0 +1,403 @@
+import atexit
+import os
+import pickle
+import sqlite3
+import struct
+import threading
+import time
+import zlib
+
+try:
+    from .metrics import REGISTRY
+except ImportError:
+    from metrics import REGISTRY
+
+# Optional write-behind for registrations. A registration is acknowledged once its
+# record is durable in an append-only local log (fsync'd; concurrent registrations
+# share one fsync). A flusher thread group-commits the queued records to SQLite every
+# WRITE_BEHIND_INTERVAL_MS, or as soon as WRITE_BEHIND_MAX_ROWS are waiting, in one
+# transaction that also advances the log's applied watermark:
+#
+#   <db dir>/<db name>.writebehind/<name>-<slot>.log    [length, crc32, seq, pickled record]*
+#   write_behind_applied(log, seq)                      highest seq committed to SQLite
+#
+# Until its commit lands, a record is visible to checks through the engine's on_submit
+# hook (pending index rows, digests, fingerprints); on_commit retires it. Other processes
+# read it from the log itself: refresh_foreign() runs their hooks for it, so every check
+# stage sees it, and exact-digest lookups read it directly (shared_pending). Records are
+# keyed (log, seq) in the hooks, which is unique across processes. The log is
+# truncated whenever everything in it is committed. Each process claims a log slot
+# with a lock file it keeps touching; records in the log of a slot whose lock went
+# stale (a crashed process) are replayed past the watermark by the next writer that
+# finds it, so an acknowledged registration is never lost or applied twice.
+#
+# A batch that keeps failing is retried record by record after WRITE_BEHIND_MAX_ATTEMPTS;
+# a record that still fails as many times again is moved to <name>-<slot>.dead (same
+# format as the log, readable with read_log), skipped by the watermark and handed to the
+# engine's on_dead hook, so it cannot block the records queued behind it.
+
+WRITE_BEHIND = os.environ.get('ORIGINALITY_WRITE_BEHIND', '0') == '1'
+WRITE_BEHIND_INTERVAL_MS = float(os.environ.get('ORIGINALITY_WRITE_BEHIND_INTERVAL_MS', '5'))
+WRITE_BEHIND_MAX_ROWS = int(os.environ.get('ORIGINALITY_WRITE_BEHIND_MAX_ROWS', '256'))
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get('ORIGINALITY_WRITE_BEHIND_MAX_ATTEMPTS', '5'))
+LOCK_STALE_SECONDS = 60
+MAX_SLOTS = 64
+
+_HEADER = struct.Struct('<IIQ')  # payload length, payload crc32, seq
+
+COMMITS = REGISTRY.counter('originality_write_behind_commits_total', 'Write-behind group commits', ['log'])
+COMMITTED = REGISTRY.counter('originality_write_behind_records_total', 'Records group-committed', ['log'])
+DEAD_LETTERS = REGISTRY.counter('originality_write_behind_dead_letters_total',
+                                'Records moved to the dead-letter file after failed commits', ['log'])
+
+
+def log_dir(db_path):
+    return os.path.splitext(os.path.abspath(db_path))[0] + '.writebehind'
+
+
+def ensure_schema(conn):
+    conn.execute('CREATE TABLE IF NOT EXISTS write_behind_applied (log TEXT PRIMARY KEY, seq INTEGER NOT NULL)')
+
+
+def read_log(path):
+    """[(seq, record)] of the complete records in a log; a torn tail write ends it."""
+    records = []
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return records
+    offset = 0
+    while offset + _HEADER.size <= len(data):
+        length, crc, seq = _HEADER.unpack_from(data, offset)
+        payload = data[offset + _HEADER.size:offset + _HEADER.size + length]
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            break
+        records.append((seq, pickle.loads(payload)))
+        offset += _HEADER.size + length
+    return records
+
+
+class WriteBehind:
+    """
+    Durable-log-then-group-commit writer for one engine table. `apply(conn, records)`
+    inserts a batch inside the writer's transaction and returns one row id per record;
+    `on_submit(key, record)` makes a record visible as it is logged (before submit
+    returns) and `on_commit(key, record, row)` runs once it is committed. Both also run
+    for the records of other processes' logs (see refresh_foreign). `on_dead(key, record)`
+    runs instead of on_commit for a record given up on and moved to the dead-letter file.
+    """
+
+    def __init__(self, db_path, name, apply, on_submit=None, on_commit=None, on_dead=None,
+                 interval_ms=WRITE_BEHIND_INTERVAL_MS, max_rows=WRITE_BEHIND_MAX_ROWS,
+                 max_attempts=WRITE_BEHIND_MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.name = name
+        self.apply = apply
+        self.on_submit = on_submit
+        self.on_commit = on_commit
+        self.on_dead = on_dead
+        self.interval = interval_ms / 1000.0
+        self.max_rows = max_rows
+        self.max_attempts = max_attempts
+        self.directory = log_dir(db_path)
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._append_lock = threading.Lock()  # log writes, seq
+        self._sync_lock = threading.Lock()    # one fsync at a time; waiters share the next one
+        self._cond = threading.Condition()    # queue, applied watermark
+        self._queue = []                      # [(seq, record)] logged, not yet committed
+        self._flush_now = False
+        self._closed = False
+        self._foreign_lock = threading.Lock()  # one refresh_foreign at a time
+        self._foreign = {}                     # (log, seq) -> record passed to on_submit from other logs
+
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                ensure_schema(conn)
+        finally:
+            conn.close()
+        self.slot, self.log_path = self._claim_slot()
+        self._seq = self._applied = self._recover(self.log_path)
+        self._synced = self._written = self._seq
+        self._log = open(self.log_path, 'ab')
+        self._thread = threading.Thread(target=self._run, name=f"{name}-write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # --- slots and recovery ---
+
+    def _lock_path(self, slot):
+        return os.path.join(self.directory, f"{self.name}-{slot}.lock")
+
+    def _log_name(self, slot):
+        return f"{self.name}-{slot}"
+
+    def _try_lock(self, slot):
+        path = self._lock_path(slot)
+        try:
+            if time.time() - os.path.getmtime(path) > LOCK_STALE_SECONDS:
+                os.remove(path)
+        except OSError:
+            pass
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            return False
+
+    def _claim_slot(self):
+        for slot in range(MAX_SLOTS):
+            if self._try_lock(slot):
+                return slot, os.path.join(self.directory, self._log_name(slot) + '.log')
+        raise RuntimeError(f"No free write-behind log slot in {self.directory}")
+
+    def _recover(self, path):
+        """Commits the records of `path` past its watermark and empties it. Returns its last seq."""
+        log = os.path.splitext(os.path.basename(path))[0]
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            row = conn.execute('SELECT seq FROM write_behind_applied WHERE log = ?', (log,)).fetchone()
+            applied = row[0] if row else 0
+            records = [(seq, record) for seq, record in read_log(path) if seq > applied]
+            if records:
+                with conn:
+                    self.apply(conn, [record for _, record in records])
+                    applied = records[-1][0]
+                    conn.execute('INSERT OR REPLACE INTO write_behind_applied (log, seq) VALUES (?, ?)', (log, applied))
+                print(f"[{self.name} write-behind] replayed {len(records)} record(s) from {os.path.basename(path)}")
+        finally:
+            conn.close()
+        if os.path.exists(path):
+            with open(path, 'r+b') as f:
+                f.truncate(0)
+        return applied
+
+    def _recover_orphans(self):
+        """Replays the logs of slots whose owner stopped touching its lock."""
+        for slot in range(MAX_SLOTS):
+            path = os.path.join(self.directory, self._log_name(slot) + '.log')
+            if slot == self.slot or not os.path.exists(path) or not os.path.getsize(path):
+                continue
+            if self._try_lock(slot):
+                try:
+                    self._recover(path)
+                except Exception as e:
+                    print(f"[{self.name} write-behind] recovery of {os.path.basename(path)} failed: {e}")
+                finally:
+                    os.remove(self._lock_path(slot))
+
+    # --- submit ---
+
+    def submit(self, record):
+        """Appends `record` to the log and returns its seq once it is durable (and visible)."""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._append_lock:
+            if self._closed:
+                raise RuntimeError("write-behind log is closed")
+            self._seq += 1
+            seq = self._seq
+            self._log.write(_HEADER.pack(len(payload), zlib.crc32(payload), seq) + payload)
+            self._written = seq
+            # Queued in seq order, so every commit covers a prefix of the log
+            with self._cond:
+                if self.on_submit:
+                    self.on_submit((self._log_name(self.slot), seq), record)
+                self._queue.append((seq, record))
+                if len(self._queue) == 1 or len(self._queue) >= self.max_rows:
+                    self._cond.notify_all()
+        self._sync(seq)
+        return seq
+
+    def _sync(self, seq):
+        """fsyncs the log up to at least `seq`; appends made meanwhile ride along."""
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._append_lock:
+                target = self._written
+                self._log.flush()
+            os.fsync(self._log.fileno())
+            self._synced = target
+
+    def pending(self):
+        """Records submitted but not committed yet, oldest first."""
+        with self._cond:
+            return [record for _, record in self._queue]
+
+    def foreign_pending(self):
+        """{(log, seq): record} of the uncommitted records in the other processes' logs."""
+        own, prefix = self._log_name(self.slot) + '.log', self.name + '-'
+        try:
+            logs = [entry for entry in os.scandir(self.directory)
+                    if entry.name != own and entry.name.startswith(prefix) and entry.name.endswith('.log')
+                    and entry.name[len(prefix):-len('.log')].isdigit() and entry.stat().st_size]
+        except OSError:
+            return {}
+        if not logs:
+            return {}
+        # Watermarks before the logs: a record committed after this read is still in its log
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            applied = dict(conn.execute('SELECT log, seq FROM write_behind_applied'))
+        finally:
+            conn.close()
+        records = {}
+        for entry in logs:
+            log = entry.name[:-len('.log')]
+            watermark = applied.get(log, 0)
+            records.update(((log, seq), record) for seq, record in read_log(entry.path) if seq > watermark)
+        return records
+
+    def shared_pending(self):
+        """
+        pending() plus the uncommitted records in the other processes' logs, so a digest
+        lookup there sees a registration acknowledged here before its commit lands.
+        Call it before querying the table: a record committed meanwhile is then found there.
+        """
+        return self.pending() + list(self.foreign_pending().values())
+
+    def refresh_foreign(self):
+        """
+        Runs on_submit for the records other processes logged since the last call, and
+        on_commit(key, record, 0) for those they committed meanwhile (row 0: already in
+        the table). Call it before refreshing from the table, so each record is in one
+        or the other.
+        """
+        with self._foreign_lock:
+            pending = self.foreign_pending()
+            with self._cond:
+                for key, record in pending.items():
+                    if key not in self._foreign and self.on_submit:
+                        self.on_submit(key, record)
+                for key in [key for key in self._foreign if key not in pending]:
+                    if self.on_commit:
+                        self.on_commit(key, self._foreign[key], 0)
+                self._foreign = pending
+
+    # --- group commit ---
+
+    def _run(self):
+        touched = 0.0
+        failures = 0  # consecutive failed commits of the queue head
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    if time.time() - touched > LOCK_STALE_SECONDS / 4:
+                        break
+                    self._cond.wait(LOCK_STALE_SECONDS / 4)
+                if self._closed and not self._queue:
+                    return
+                deadline = time.perf_counter() + self.interval
+                while (self._queue and len(self._queue) < self.max_rows and not self._flush_now
+                       and not self._closed):
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                batch = self._queue[:self.max_rows]
+                self._flush_now = False
+            if time.time() - touched > LOCK_STALE_SECONDS / 4:
+                touched = time.time()
+                os.utime(self._lock_path(self.slot))
+                self._recover_orphans()
+            if not batch:
+                continue
+            if failures >= self.max_attempts:
+                batch = batch[:1]  # find the record that fails: commit the head alone
+            if self._commit(batch):
+                failures = 0
+                continue
+            failures += 1
+            if failures >= 2 * self.max_attempts and self._dead_letter(*batch[0]):
+                failures = 0
+                continue
+            time.sleep(max(self.interval, 0.05))  # e.g. the DB is locked: retry
+
+    def _commit(self, batch):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                rows = self.apply(conn, [record for _, record in batch])
+                conn.execute('INSERT OR REPLACE INTO write_behind_applied (log, seq) VALUES (?, ?)',
+                             (self._log_name(self.slot), batch[-1][0]))
+        except Exception as e:
+            print(f"[{self.name} write-behind] commit of {len(batch)} record(s) failed: {e}")
+            return False
+        finally:
+            conn.close()
+        self._retire(batch, rows)
+        COMMITS.labels(log=self.name).inc()
+        COMMITTED.labels(log=self.name).inc(len(batch))
+        return True
+
+    def _dead_letter(self, seq, record):
+        """Moves a record that keeps failing to the dead-letter file and past the watermark."""
+        payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        path = os.path.join(self.directory, self._log_name(self.slot) + '.dead')
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with open(path, 'ab') as f:
+                f.write(_HEADER.pack(len(payload), zlib.crc32(payload), seq) + payload)
+                f.flush()
+                os.fsync(f.fileno())
+            with conn:
+                conn.execute('INSERT OR REPLACE INTO write_behind_applied (log, seq) VALUES (?, ?)',
+                             (self._log_name(self.slot), seq))
+        except Exception as e:
+            print(f"[{self.name} write-behind] dead-lettering record {seq} failed: {e}")
+            return False
+        finally:
+            conn.close()
+        print(f"[{self.name} write-behind] gave up on record {seq}, moved to {os.path.basename(path)}")
+        self._retire([(seq, record)], None)
+        DEAD_LETTERS.labels(log=self.name).inc()
+        return True
+
+    def _retire(self, batch, rows):
+        """Drops a committed (rows) or dead-lettered (None) prefix of the queue."""
+        with self._cond:
+            for i, (seq, record) in enumerate(batch):
+                key = (self._log_name(self.slot), seq)
+                if rows is not None and self.on_commit:
+                    self.on_commit(key, record, rows[i])
+                elif rows is None and self.on_dead:
+                    self.on_dead(key, record)
+            del self._queue[:len(batch)]
+            self._applied = batch[-1][0]
+            self._cond.notify_all()
+        with self._append_lock:
+            if self._applied == self._seq:
+                self._log.truncate(0)  # everything in it is committed (or dead-lettered)
+
+    def flush(self, timeout=None):
+        """Commits everything submitted so far. Returns False if that took longer than `timeout`."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self._cond:
+            target = self._seq
+            while self._applied < target:
+                self._flush_now = True
+                self._cond.notify_all()
+                remaining = None if deadline is None else deadline - time.perf_counter()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout=10):
+        """Commits what is queued, then releases the log slot (registered with atexit)."""
+        if self._closed:
+            return
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        with self._append_lock:
+            self._log.close()
+        if flushed:
+            try:
+                os.remove(self._lock_path(self.slot))
+            except OSError:
+                pass
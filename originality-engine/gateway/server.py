@@ -0,0 +1,254 @@
+import mimetypes
+import os
+import sys
+import uuid
+from flask import Flask, Response, request, jsonify, stream_with_context
+from flask_cors import CORS
+
+# Unified originality gateway: one process hosts the text, image and video engines and
+# routes by MIME type. Video frames are hashed in-process by the image engine; audio is
+# proxied to the Go service over pooled keep-alive connections. In cluster mode
+# (ORIGINALITY_TEXT_NODES / ORIGINALITY_IMAGE_NODES, see common/cluster.py) text and
+# image requests go to partitioned engine nodes instead of the in-process engines.
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)
+
+from textFiles.originality import TextOriginalityRequest
+from imageFiles.originality import ImageOriginalityRequest
+from videoFiles.originality import (VideoOriginalityRequest, AUDIO_SERVICE_URL, audio_song_id, make_session,
+                                    sse_stream)
+from common.cluster import IMAGE_NODES, TEXT_NODES, Cluster
+from common.admission import Overloaded, install_admission, overloaded_response
+from common.digests import Duplicate
+from common.metrics import REGISTRY, instrument_app
+from common.profiling import admin_headers, admin_refusal, install_profiling
+from common.tombstones import start_compactor
+
+# Configuration
+UPLOAD_FOLDER = 'uploads'
+GATEWAY_PORT = int(os.environ.get('GATEWAY_PORT', '5010'))
+
+# Explicit `type` form field wins; otherwise the upload's MIME type decides
+MODALITIES = ('text', 'image', 'video', 'audio')
+TEXT_MIME_TYPES = {
+    'text/plain',
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+TEXT_EXTENSIONS = {'txt', 'pdf', 'docx'}
+
+app = Flask(__name__)
+CORS(app)
+app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+print("Initializing Originality Gateway...")
+session = make_session(pool_size=32)
+text_cluster = Cluster('text', TEXT_NODES, session) if TEXT_NODES else None
+image_cluster = Cluster('image', IMAGE_NODES, session) if IMAGE_NODES else None
+text_engine = None
+if not text_cluster:
+    text_engine = TextOriginalityRequest(batching=os.environ.get('TEXT_BATCHING', '1') != '0',
+                                         semantic=os.environ.get('TEXT_SEMANTIC', '1') != '0')
+    text_engine.load_model()
+# Still hashes video frames in-process when images are clustered
+image_engine = ImageOriginalityRequest()
+video_engine = VideoOriginalityRequest(image_engine=image_engine, session=session)
+print("Gateway initialized.")
+
+instrument_app(app, 'gateway')
+install_profiling(app, 'gateway')
+install_admission(app, 'gateway')
+if text_engine:
+    REGISTRY.gauge_fn('originality_text_corpus_size', 'Registered text assets', text_engine.corpus_size)
+if not image_cluster:
+    REGISTRY.gauge_fn('originality_image_corpus_size', 'Stored image segment hashes', image_engine.corpus_size)
+# Removes tombstoned rows and VACUUMs once deletions pass ORIGINALITY_COMPACT_THRESHOLD
+start_compactor(image_engine.db_path, ('text_assets', 'image_hashes'))
+
+def detect_modality(file, explicit=None):
+    """Returns 'text' | 'image' | 'video' | 'audio' or None."""
+    if explicit:
+        return explicit if explicit in MODALITIES else None
+
+    mime = file.mimetype
+    if not mime or mime == 'application/octet-stream':
+        mime = mimetypes.guess_type(file.filename)[0] or ''
+
+    if mime in TEXT_MIME_TYPES:
+        return 'text'
+    for prefix in ('image', 'video', 'audio'):
+        if mime.startswith(prefix + '/'):
+            return prefix
+
+    ext = file.filename.rsplit('.', 1)[-1].lower() if '.' in file.filename else ''
+    return 'text' if ext in TEXT_EXTENSIONS else None
+
+def save_upload(file):
+    filename = f"gw_{uuid.uuid4().hex}_{os.path.basename(file.filename)}"
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    file.save(filepath)
+    return filepath
+
+def text_check_response(filepath):
+    result = text_engine.check(filepath)
+    return {
+        "status": "Original" if result["classification"] == "ORIGINAL" else "Duplicate",
+        "detailed_classification": result["classification"],
+        "closest_match_id": result["match_id"],
+        "similarity_score": round(float(result["score"]), 4),
+        "matched_by": result["stage"],
+        "matches": result["matches"],
+        "passages": result.get("passages", []),
+    }
+
+def image_check_response(filepath):
+    classification, match_id, dist = image_engine.check_originality(filepath)
+    return {
+        "status": classification,
+        "match_id": match_id if match_id else None,
+        "distance": int(dist) if 0 <= dist < float('inf') else None
+    }
+
+def audio_proxy(path, filepath, filename, data=None):
+    with open(filepath, 'rb') as f:
+        resp = session.post(f"{AUDIO_SERVICE_URL}{path}", files={'file': (filename, f)}, data=data)
+    if resp.status_code != 200:
+        return {"error": resp.text.strip()}, resp.status_code
+    return resp.json(), 200
+
+@app.route('/health', methods=['GET'])
+def health_check():
+    body = {"status": "healthy", "service": "originality-gateway",
+            "semantic": text_engine.model is not None if text_engine else None}
+    for modality, cluster in (('text', text_cluster), ('image', image_cluster)):
+        if cluster:
+            body.setdefault("cluster", {})[modality] = cluster.health()
+    return jsonify(body)
+
+@app.route('/check', methods=['POST'])
+def check():
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    modality = detect_modality(file, request.form.get('type'))
+    if not modality:
+        return jsonify({"error": "Unsupported media type"}), 415
+
+    filepath = save_upload(file)
+    streaming = False  # a streamed response removes the upload itself when it ends
+    try:
+        # Each modality keeps its own service's response shape (the backend normalises them)
+        if modality == 'text':
+            result, code = (text_cluster.check(filepath, file.filename) if text_cluster
+                            else (text_check_response(filepath), 200))
+        elif modality == 'image':
+            result, code = (image_cluster.check(filepath, file.filename) if image_cluster
+                            else (image_check_response(filepath), 200))
+        elif modality == 'video':
+            if request.form.get('stream') == '1':
+                events = sse_stream(video_engine.check_progressive(filepath), lambda: os.remove(filepath))
+                streaming = True
+                return Response(stream_with_context(events), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+            result = video_engine.check_originality(filepath, progressive=request.form.get('progressive') == '1')
+            code = 500 if "error" in result else 200
+        else:
+            result, code = audio_proxy('/check', filepath, file.filename)
+        result["modality"] = modality
+        return jsonify(result), code
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"error": str(e), "modality": modality}), 500
+    finally:
+        if not streaming and os.path.exists(filepath): os.remove(filepath)
+
+@app.route('/register', methods=['POST'])
+def register():
+    asset_id = request.form.get('id')
+    if not asset_id:
+        return jsonify({"error": "Missing 'id' parameter"}), 400
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"error": "No selected file"}), 400
+
+    modality = detect_modality(file, request.form.get('type'))
+    if not modality:
+        return jsonify({"error": "Unsupported media type"}), 415
+
+    filepath = save_upload(file)
+    try:
+        cluster = {'text': text_cluster, 'image': image_cluster}.get(modality)
+        if cluster:
+            data, code = cluster.register(filepath, file.filename, asset_id)
+            success, details = code == 200, data
+            if code == 409:
+                details = Duplicate(data.get("error", ""), data.get("match_id"))
+        elif modality == 'text':
+            success, details = text_engine.register_text(filepath, asset_id)
+        elif modality == 'image':
+            success, details = image_engine.register_image(filepath, asset_id)
+        elif modality == 'video':
+            success, details = video_engine.register_video(filepath, asset_id)
+        else:
+            data, code = audio_proxy('/register', filepath, file.filename, {'id': str(audio_song_id(asset_id))})
+            success, details = code == 200, data
+
+        body = {"success": success, "id": asset_id, "modality": modality, "details": details}
+        if isinstance(details, Duplicate):
+            # Rejected as an exact duplicate: a conflict, not a server fault
+            return jsonify(dict(body, match_id=details.match_id)), 409
+        if cluster and code in (503, 504):
+            return jsonify(body), code  # the router could not complete it (partition missing or timed out)
+        return jsonify(body), 200 if success else 500
+    except Overloaded as e:
+        return overloaded_response(e)
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "modality": modality}), 500
+    finally:
+        if os.path.exists(filepath): os.remove(filepath)
+
+@app.route('/delete', methods=['POST'])
+def delete():
+    refusal = admin_refusal(request)
+    if refusal:
+        return refusal
+    asset_id = request.form.get('id')
+    modality = request.form.get('type')
+    if not asset_id:
+        return jsonify({"error": "Missing 'id' parameter"}), 400
+    if modality not in MODALITIES:
+        return jsonify({"error": f"'type' must be one of {', '.join(MODALITIES)}"}), 400
+
+    try:
+        cluster = {'text': text_cluster, 'image': image_cluster}.get(modality)
+        if cluster:
+            data, code = cluster.delete(asset_id)
+            success, details = code == 200, data
+        elif modality == 'text':
+            success, details = text_engine.delete_text(asset_id)
+        elif modality == 'image':
+            success, details = image_engine.delete_image(asset_id)
+        elif modality == 'video':
+            success, details = video_engine.delete_video(asset_id)
+        else:
+            resp = session.post(f"{AUDIO_SERVICE_URL}/delete", data={'id': str(audio_song_id(asset_id))},
+                                headers=admin_headers())
+            success, details = resp.status_code == 200, resp.text.strip()
+        body = {"success": success, "id": asset_id, "modality": modality, "details": details}
+        if cluster and code in (503, 504):
+            return jsonify(body), code
+        return jsonify(body), 200 if success else 404
+    except Exception as e:
+        return jsonify({"success": False, "error": str(e), "modality": modality}), 500
+
+if __name__ == '__main__':
+    print(f"Starting originality gateway on port {GATEWAY_PORT}...")
+    app.run(host='0.0.0.0', port=GATEWAY_PORT, debug=True, use_reloader=False)
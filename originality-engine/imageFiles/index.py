@@ -0,0 +1,171 @@
+import os
+
+import numpy as np
+
+from common.mmap_index import MappedIndex
+
+# Shared view of `image_hashes` (see common/mmap_index.py): per segment row a uint64
+# pHash, dHash, wHash and colorhash plus the segment code, memory-mapped from disk.
+#
+# Lookups cascade:
+#   1. the dHash is split into MIH_BLOCKS 16-bit blocks, each indexed in a bucket table
+#      (multi-index hashing): a query only visits rows agreeing with it on some block to
+#      within PROBE_RADIUS bits, which finds every row within
+#      MIH_BLOCKS * (PROBE_RADIUS + 1) - 1 dHash bits (and many a little further)
+#   2. of those, rows within DHASH_LIMIT dHash bits of some query orientation
+#   3. are re-ranked on the median pHash / dHash / wHash distance; a close colorhash
+#      (same colour distribution, e.g. a recompressed copy) lets a slightly larger
+#      structural distance count as a match
+# Rows stored before the ensemble hashes existed (NULL dhash) are scanned by pHash alone.
+
+SEGMENTS = ('full', 'top_half', 'bottom_half', 'left_half', 'right_half',
+            'q1_top_left', 'q2_top_right', 'q3_bottom_left', 'q4_bottom_right')
+HASHES = ('phash', 'dhash', 'whash', 'colorhash')
+
+MIH_BLOCKS = 4
+BLOCK_BITS = 16
+PROBE_RADIUS = int(os.environ.get('ORIGINALITY_IMAGE_PROBE_RADIUS', '2'))
+DHASH_LIMIT = 20
+COLOR_AGREE = 2   # colorhash bits within which two images count as the same colours
+COLOR_MARGIN = 4  # extra structural distance allowed when the colours agree
+
+_POPCOUNT8 = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+def popcount64(x):
+    """Set bits per element of a uint64 array."""
+    if hasattr(np, 'bitwise_count'):  # numpy >= 2.0
+        return np.bitwise_count(x)
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.uint8)
+
+
+def probe_masks(radius, bits=BLOCK_BITS):
+    """Every `bits`-bit XOR mask with at most `radius` bits set (the block's Hamming ball)."""
+    values = np.arange(1 << bits, dtype=np.uint64)
+    return values[popcount64(values) <= radius]
+
+
+def mih_blocks(hashes):
+    """[n, MIH_BLOCKS] block keys of uint64 hashes, offset so every block has its own key range."""
+    shifts = np.arange(MIH_BLOCKS, dtype=np.uint64) * np.uint64(BLOCK_BITS)
+    blocks = (np.asarray(hashes, dtype=np.uint64)[:, None] >> shifts) & np.uint64((1 << BLOCK_BITS) - 1)
+    return blocks.astype(np.int64) + (np.arange(MIH_BLOCKS, dtype=np.int64) << BLOCK_BITS)
+
+
+def expand_ranges(lo, hi):
+    """Concatenation of arange(lo[i], hi[i]) for every i, without a Python loop."""
+    lengths = hi - lo
+    keep = lengths > 0
+    lo, lengths = lo[keep], lengths[keep]
+    if not len(lo):
+        return np.zeros(0, dtype=np.int64)
+    starts = np.repeat(lo - np.concatenate(([0], np.cumsum(lengths)[:-1])), lengths)
+    return starts + np.arange(int(lengths.sum()), dtype=np.int64)
+
+
+class ImageIndex(MappedIndex):
+    modality = 'image'
+    table = 'image_hashes'
+    id_column = 'image_id'
+    columns = ('segment',) + HASHES
+    row_arrays = ('segment', 'has_ensemble') + HASHES
+
+    def __init__(self, db_path, probe_radius=PROBE_RADIUS, **kwargs):
+        self._masks = probe_masks(probe_radius).astype(np.int64)
+        super().__init__(db_path, **kwargs)
+
+    def _params(self):
+        return {"hash_bits": 64, "segments": list(SEGMENTS), "hashes": list(HASHES),
+                "mih_blocks": MIH_BLOCKS, "block_bits": BLOCK_BITS}
+
+    def _decode(self, db_row):
+        _, _, segment, *hex_hashes = db_row
+        values = {}
+        for name, value in zip(HASHES, hex_hashes):
+            try:
+                values[name] = int(value, 16)
+            except (TypeError, ValueError):
+                values[name] = None
+            if values[name] is not None and values[name] >= 1 << 64:
+                values[name] = None  # hash_size other than 8
+        if values['phash'] is None:
+            return None
+        values['has_ensemble'] = all(values[name] is not None for name in HASHES[1:])
+        if not values['has_ensemble']:
+            values.update({name: 0 for name in HASHES[1:]})
+        values['segment'] = SEGMENTS.index(segment) if segment in SEGMENTS else 0
+        return values
+
+    def _stack(self, name, values):
+        if name in HASHES:
+            return np.asarray(values, dtype=np.uint64)
+        if name == 'segment':
+            return np.asarray(values, dtype=np.uint8)
+        if name == 'has_ensemble':
+            return np.asarray(values, dtype=bool)
+        return super()._stack(name, values)
+
+    def _derive(self, arrays):
+        # dHash block buckets: the positions of the rows whose block b equals v are
+        # mih_pos[mih_offsets[k]:mih_offsets[k + 1]], k = b << BLOCK_BITS | v
+        has = arrays['has_ensemble']
+        pos = np.flatnonzero(has)
+        keys = mih_blocks(arrays['dhash'][pos]).ravel()
+        order = np.argsort(keys, kind='stable')
+        counts = np.bincount(keys, minlength=MIH_BLOCKS << BLOCK_BITS)
+        pos_type = np.int32 if len(has) < 2 ** 31 else np.int64
+        return {"mih_offsets": np.concatenate(([0], np.cumsum(counts))).astype(np.int64),
+                "mih_pos": pos[order // MIH_BLOCKS].astype(pos_type),
+                "legacy_pos": np.flatnonzero(~has).astype(np.int64)}
+
+    def _candidates(self, segment, dhashes):
+        """Positions in `segment` within PROBE_RADIUS bits of a query dHash on some block."""
+        probes = (mih_blocks(dhashes)[:, :, None] ^ self._masks).ravel()
+        offsets = segment['mih_offsets']
+        found = np.zeros(len(segment['rows']), dtype=bool)
+        found[segment['mih_pos'][expand_ranges(offsets[probes], offsets[probes + 1])]] = True
+        return np.flatnonzero(found)
+
+    def search(self, queries):
+        """
+        Cascaded ensemble lookup. `queries` is one {hash name: int} per query orientation.
+        The closest row (lowest median distance, less COLOR_MARGIN when the colorhash
+        agrees; ties to the earlier query, then the earlier row) as
+        (distance, image_id, segment, colours agree, rows compared) or
+        (inf, None, 'full', False, rows compared) when no candidate is close enough.
+        """
+        targets = {name: np.asarray([q[name] for q in queries], dtype=np.uint64)[:, None] for name in HASHES}
+        with self._lock:
+            base, dead, delta = self.base, self.dead, self.delta()
+        best, scored = None, 0
+        for segment, dead_rows in ((base, dead), (delta, None)):
+            if segment is None or not len(segment['rows']):
+                continue
+            pos = self._candidates(segment, targets['dhash'][:, 0])
+            scored += len(pos) + len(segment['legacy_pos'])
+            close = popcount64(segment['dhash'][pos] ^ targets['dhash']).min(axis=0) <= DHASH_LIMIT
+            # Rows without the ensemble hashes (older registrations) are compared on pHash only
+            pos = np.concatenate((pos[close], segment['legacy_pos']))
+            if dead_rows is not None:
+                pos = pos[~dead_rows[pos]]
+            if not len(pos):
+                continue
+            dist = {name: popcount64(segment[name][pos] ^ targets[name]).astype(np.int16) for name in HASHES}
+            has = segment['has_ensemble'][pos]
+            p, d, w = dist['phash'], dist['dhash'], dist['whash']
+            median = np.where(has, p + d + w - np.maximum(np.maximum(p, d), w) - np.minimum(np.minimum(p, d), w), p)
+            agree = has & (dist['colorhash'] <= COLOR_AGREE)
+            rank = median - COLOR_MARGIN * agree
+            # Best (rank, distance) per candidate over the queries, earliest query first
+            q = np.lexsort((median, rank), axis=0)[0]
+            cols = np.arange(len(pos))
+            rank, median, agree = rank[q, cols], median[q, cols], agree[q, cols]
+            i = int(np.lexsort((pos, q, median, rank))[0])
+            found = (int(rank[i]), int(median[i]), int(q[i]), segment, int(pos[i]), bool(agree[i]))
+            if best is None or found[:3] < best[:3]:
+                best = found
+        if best is None:
+            return float('inf'), None, 'full', False, scored
+        _, distance, _, segment, row, agree = best
+        return distance, str(segment['ids'][row]), SEGMENTS[int(segment['segment'][row])], agree, scored
@@ -1,85 +1,155 @@
 import argparse
 import sys
 import os
-from originality import ImageOriginalityRequest
-from flask import Flask, request, jsonify
-from flask_cors import CORS
 import uuid
 
-app = Flask(__name__)
-CORS(app)  # Enable CORS for frontend access
-engine = ImageOriginalityRequest()
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)  # common/ is imported before the engine adds it
+
+# Flask, imagehash and the engine are imported lazily so CLI use never builds the web app
+_engine = None
 
 UPLOAD_FOLDER = os.path.join(os.getcwd(), 'uploads')
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-@app.route('/check', methods=['POST'])
-def check_image():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-
-    filename = str(uuid.uuid4()) + "_" + file.filename
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-
-    try:
-        classification, match_id, dist = engine.check_originality(filepath)
-        
-        # Handle numpy int64 and infinity for JSON serialization
-        d_val = -1
-        if dist != float('inf'):
-            d_val = int(dist)
-
-        response = {
-            "status": classification, # "DUPLICATE..." or "ORIGINAL"
-            "match_id": match_id if match_id else None,
-            "distance": d_val
-        }
-        
-        return jsonify(response)
-    finally:
-        if os.path.exists(filepath):
-            os.remove(filepath)
-
-@app.route('/register', methods=['POST'])
-def register_image():
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part"}), 400
-    
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"error": "No selected file"}), 400
-    
-    image_id = request.form.get('id')
-    if not image_id:
-        return jsonify({"error": "Missing 'id' parameter"}), 400
-
-    filename = str(uuid.uuid4()) + "_" + file.filename
-    filepath = os.path.join(UPLOAD_FOLDER, filename)
-    file.save(filepath)
-
-    try:
-        success, msg = engine.register_image(filepath, image_id)
+PORT = int(os.environ.get('IMAGE_PORT', '8081'))  # one node per port in cluster mode (common/cluster.py)
+
+def get_engine():
+    """Returns the shared ImageOriginalityRequest, creating it on first use."""
+    global _engine
+    if _engine is None:
+        from originality import ImageOriginalityRequest
+        _engine = ImageOriginalityRequest()
+    return _engine
+
+def create_app():
+    """Builds the Flask app (only needed in server mode)."""
+    from flask import Flask, request, jsonify
+    from flask_cors import CORS
+
+    from common.admission import install_admission
+    from common.digests import Duplicate
+    from common.metrics import REGISTRY, instrument_app
+    from common.profiling import admin_refusal, install_profiling
+    from common.tombstones import start_compactor
+    from common.warmup import install_warmup
+
+    app = Flask(__name__)
+    CORS(app)  # Enable CORS for frontend access
+    engine = get_engine()
+    instrument_app(app, 'image')
+    install_profiling(app, 'image')
+    install_admission(app, 'image')
+    install_warmup(app, 'image', engine.warm_up)
+    start_compactor(engine.db_path, ('image_hashes',))
+    REGISTRY.gauge_fn('originality_image_corpus_size', 'Stored image segment hashes', engine.corpus_size)
+
+    @app.route('/health', methods=['GET'])
+    def health_check():
+        return jsonify({"status": "healthy", "service": "image-originality-engine",
+                        "corpus_size": engine.corpus_size()})
+
+    if not os.path.exists(UPLOAD_FOLDER):
+        os.makedirs(UPLOAD_FOLDER)
+
+    @app.route('/check', methods=['POST'])
+    def check_image():
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        filename = str(uuid.uuid4()) + "_" + file.filename
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        file.save(filepath)
+
+        try:
+            classification, match_id, dist = engine.check_originality(filepath)
+
+            response = {
+                "status": classification, # "DUPLICATE..." or "ORIGINAL"
+                "match_id": match_id if match_id else None,
+                # null when no stored segment was a candidate (or the image could not be read)
+                "distance": int(dist) if 0 <= dist < float('inf') else None
+            }
+
+            return jsonify(response)
+        finally:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    @app.route('/register', methods=['POST'])
+    def register_image():
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+
+        file = request.files['file']
+        if file.filename == '':
+            return jsonify({"error": "No selected file"}), 400
+
+        image_id = request.form.get('id')
+        if not image_id:
+            return jsonify({"error": "Missing 'id' parameter"}), 400
+
+        filename = str(uuid.uuid4()) + "_" + file.filename
+        filepath = os.path.join(UPLOAD_FOLDER, filename)
+        file.save(filepath)
+
+        try:
+            # video=<id> records the image as a frame of that video (deleted with it)
+            success, msg = engine.register_image(filepath, image_id, video_id=request.form.get('video'))
+            if success:
+                return jsonify({"status": "success", "message": msg})
+            elif isinstance(msg, Duplicate):
+                return jsonify({"status": "error", "message": msg, "match_id": msg.match_id}), 409
+            else:
+                return jsonify({"status": "error", "message": msg}), 500
+        finally:
+            # For registration, we might want to keep the file, but current logic mimics audio
+            # where we process and delete temp file unless we decide to store it.
+            # Original logic processed from path.
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    @app.route('/exact', methods=['POST'])
+    def exact_image():
+        # Exact-duplicate lookup only; a cluster router asks every partition before registering
+        if 'file' not in request.files:
+            return jsonify({"error": "No file part"}), 400
+
+        file = request.files['file']
+        filepath = os.path.join(UPLOAD_FOLDER, str(uuid.uuid4()) + "_" + file.filename)
+        file.save(filepath)
+        try:
+            return jsonify({"match_id": engine.find_exact(filepath)})
+        finally:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+
+    @app.route('/delete', methods=['POST'])
+    def delete_image():
+        refusal = admin_refusal(request)
+        if refusal:
+            return refusal
+        image_id = request.form.get('id')
+        if not image_id:
+            return jsonify({"error": "Missing 'id' parameter"}), 400
+
+        # frames=1 also removes the frames registered for video {id}
+        success, msg = engine.delete_image(image_id, include_frames=request.form.get('frames') == '1')
         if success:
             return jsonify({"status": "success", "message": msg})
-        else:
-            return jsonify({"status": "error", "message": msg}), 500
-    finally:
-        # For registration, we might want to keep the file, but current logic mimics audio
-        # where we process and delete temp file unless we decide to store it.
-        # Original logic processed from path.
-        if os.path.exists(filepath):
-            os.remove(filepath)
+        return jsonify({"status": "error", "message": msg}), 404
+
+    return app
 
 def start_server():
-    print("Starting Image Originality Server on port 8081...")
+    print(f"Starting Image Originality Server on port {PORT}...")
     # Using 8081 to avoid conflict if audio server is running on 8080
-    app.run(host='0.0.0.0', port=8081, debug=True)
+    app = create_app()
+    # No reloader: it would start a second copy of the engine in a child process
+    app.run(host='0.0.0.0', port=PORT, debug=True, use_reloader=False)
 
 def main():
     parser = argparse.ArgumentParser(description="Image Originality Engine CLI & Server")
@@ -98,7 +168,7 @@ def main():
     server_parser = subparsers.add_parser("server", help="Start the HTTP server")
 
     args = parser.parse_args()
-    
+
     # If no arguments provided, start server by default (or help? let's default to server based on request flow)
     # But standard CLI requires commands. Let's make "server" default if no args, or explicitly check.
     if args.command is None:
@@ -116,7 +186,7 @@ def main():
             print(f"Error: File not found {args.image_path}")
             return
 
-        success, msg = engine.register_image(args.image_path, args.id)
+        success, msg = get_engine().register_image(args.image_path, args.id)
         if success:
             print(f"[SUCCESS] {msg}")
         else:
@@ -127,7 +197,7 @@ def main():
             print(f"Error: File not found {args.image_path}")
             return
 
-        classification, match_id, dist = engine.check_originality(args.image_path)
+        classification, match_id, dist = get_engine().check_originality(args.image_path)
         print("-" * 30)
         print(f"CLASSIFICATION: {classification}")
         if match_id:
@@ -1,15 +1,105 @@
 import imagehash
+import numpy as np
+import pywt
 from PIL import Image
 import sqlite3
 import os
+import re
+import sys
 import uuid
 
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audioFiles', 'fingerprints.db')
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)
+from common import generations, tombstones
+from common.digests import Duplicate, find_digest, sha256_file
+from common.metrics import REGISTRY, cache_result, stage, timed
+from common.warmup import prefetch_file, run_steps
+from common.writebehind import WRITE_BEHIND, WriteBehind
+
+try:
+    from .index import COLOR_MARGIN, HASHES, SEGMENTS, ImageIndex
+except ImportError:
+    from index import COLOR_MARGIN, HASHES, SEGMENTS, ImageIndex
+
+DB_PATH = os.environ.get('ORIGINALITY_DB_PATH') or os.path.join(ENGINE_ROOT, 'audioFiles', 'fingerprints.db')
+
+# Every hash is computed from one shared downsample: the image is decoded (JPEG at a
+# reduced DCT scale) and resized once to BUFFER_SIZE, segments and query orientations
+# are cut from that buffer, and each is reduced to the HASH_INPUT square pHash works
+# on. dHash / wHash / pHash read its grey levels, colorhash its colours. At 256 px the
+# pHash bits match hashing the full-resolution segment (rows stored before the buffer).
+BUFFER_SIZE = 256
+HASH_INPUT = 32
+
+# Segment rows the cascade re-ranked vs left unscored (the pHash-only path scanned all of them)
+CHECK_ROWS = REGISTRY.counter('originality_image_check_rows_total', 'Image check rows scored or skipped', ['kind'])
+
+
+def wavelet_hashes(grays):
+    """
+    imagehash.whash (Haar, coarsest LL removed, 8x8) of HASH_INPUT grey squares, bit for
+    bit, with one PyWavelets pass over all of them instead of one per image.
+    """
+    pixels = np.stack([np.asarray(gray) for gray in grays]) / 255.
+    top = int(np.log2(HASH_INPUT))
+    coeffs = pywt.wavedec2(pixels, 'haar', level=top, axes=(-2, -1))
+    coeffs[0] = coeffs[0] * 0
+    pixels = pywt.waverec2(coeffs, 'haar', axes=(-2, -1))
+    low = pywt.wavedec2(pixels, 'haar', level=top - 3, axes=(-2, -1))[0]
+    return [imagehash.ImageHash(band > np.median(band)) for band in low]
+
+
+def hash_value(image_hash):
+    """The int of an ImageHash's bits: int(str(image_hash), 16) without the string round trip."""
+    bits = image_hash.hash.ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), 'big') >> (-len(bits) % 8)
+
 
 class ImageOriginalityRequest:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, write_behind=WRITE_BEHIND):
         self.db_path = db_path
         self._init_db()
+        self.index = ImageIndex(db_path)
+        # Optional write-behind (common/writebehind.py): registrations are acknowledged once
+        # logged; checks (here and in other processes) see them as pending index rows /
+        # digests until they are committed
+        self.writer = WriteBehind(db_path, 'image', self._apply_records, self._on_submit,
+                                  self._on_commit, self._on_dead) if write_behind else None
+
+    def warm_up(self):
+        """
+        Warm-up steps for a freshly started server (common/warmup.py): the DB into the page
+        cache, the index refreshed and its mapped pages touched, then one image hashed.
+        """
+        def index():
+            conn = sqlite3.connect(self.db_path)
+            try:
+                self.index.refresh(conn, generations.active_generation(conn, 'image'))
+            finally:
+                conn.close()
+            return {"rows": len(self.index), "bytes": self.index.prefault()}
+
+        def hash_image():
+            gradient = np.add.outer(np.arange(256), np.arange(256)).astype(np.uint8)
+            return {"segments": len(self.compute_segment_hashes(Image.fromarray(gradient).convert('RGB')))}
+
+        return run_steps('image', [('db', lambda: {"bytes": prefetch_file(self.db_path)}),
+                                   ('index', index), ('hash', hash_image)])
+
+    def corpus_size(self):
+        """Number of stored segment hashes in the active generation (scraped as a gauge)."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM image_hashes WHERE generation = ? AND deleted = 0',
+                                (generations.active_generation(conn, 'image'),)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def index_params(self):
+        """Everything a stored hash depends on; recorded per generation by reindex.py."""
+        return {"hashes": list(HASHES), "hash_size": 8, "buffer_size": BUFFER_SIZE, "hash_input": HASH_INPUT,
+                "segments": list(SEGMENTS)}
 
     def _init_db(self):
         """Initializes the database with the schema."""
@@ -25,9 +115,31 @@ class ImageOriginalityRequest:
         ''')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_phash ON image_hashes(phash)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_id ON image_hashes(image_id)')
+        # SHA-256 of the uploaded file, stored on the 'full' segment row: exact re-uploads are
+        # answered by one indexed lookup instead of a pHash scan (column added on older DBs)
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(image_hashes)')}
+        if 'content_sha256' not in columns:
+            cursor.execute('ALTER TABLE image_hashes ADD COLUMN content_sha256 TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_image_content_sha256 ON image_hashes(content_sha256) '
+                       'WHERE content_sha256 IS NOT NULL')
+        # Ensemble hashes (hex, like phash); NULL on rows registered before them
+        for name in HASHES[1:]:
+            if name not in columns:
+                cursor.execute(f'ALTER TABLE image_hashes ADD COLUMN {name} TEXT')
+        # Frame assets registered for a video, so deleting the video removes exactly these
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS video_frames (
+                video_id    TEXT NOT NULL,
+                frame_id    TEXT NOT NULL,
+                PRIMARY KEY (video_id, frame_id)
+            )
+        ''')
+        generations.ensure_schema(conn, 'image_hashes')
+        tombstones.ensure_schema(conn, 'image_hashes')
         conn.commit()
         conn.close()
 
+    @timed('image', 'generate_segments')
     def _generate_segments(self, img):
         """
         Generates 9 segments from the image:
@@ -55,37 +167,129 @@ class ImageOriginalityRequest:
 
         return segments
 
-    def compute_hash(self, img_obj):
-        """Computes the perceptual hash of an image object."""
+    def compute_hashes(self, regions):
+        """[{hash name: hex}] of regions of the shared buffer, or None if they cannot be hashed."""
         try:
-            return str(imagehash.phash(img_obj)) 
+            smalls = [region.resize((HASH_INPUT, HASH_INPUT), Image.LANCZOS) for region in regions]
+            structural = self._structural_hashes([small.convert('L') for small in smalls])
+            return [{name: str(value) for name, value in dict(hashes, colorhash=imagehash.colorhash(small)).items()}
+                    for small, hashes in zip(smalls, structural)]
         except Exception as e:
             return None
 
-    def register_image(self, image_path, image_id=None):
-        """Registers an image AND its segments in the database."""
+    @staticmethod
+    def _structural_hashes(grays):
+        """[{name: ImageHash}] pHash / dHash / wHash of HASH_INPUT grey squares."""
+        return [{"phash": imagehash.phash(gray), "dhash": imagehash.dhash(gray), "whash": whash}
+                for gray, whash in zip(grays, wavelet_hashes(grays))]
+
+    def _buffer(self, img):
+        """The shared downsample every segment / orientation is hashed from."""
+        return img.convert('RGB').resize((BUFFER_SIZE, BUFFER_SIZE), Image.LANCZOS, reducing_gap=2.0)
+
+    def _open(self, image):
+        """Accepts a file path or an already-decoded PIL image (e.g. an in-process video frame)."""
+        if isinstance(image, Image.Image):
+            return image
+        img = Image.open(image)
+        # JPEG: decode at the smallest DCT scale still at least twice the buffer
+        img.draft('RGB', (2 * BUFFER_SIZE, 2 * BUFFER_SIZE))
+        return img
+
+    def _content_digest(self, image):
+        """SHA-256 of the file's bytes; None for in-memory images (e.g. video frames)."""
+        if isinstance(image, Image.Image):
+            return None
+        return sha256_file(image)
+
+    def _find_digest(self, conn, digest):
+        found = find_digest(conn, 'image', 'image_hashes', 'image_id', 'content_sha256', digest, self.writer,
+                            field='digest')
+        return found[0] if found else None
+
+    def compute_segment_hashes(self, img):
+        """[(segment, {hash name: hex})] for the 9 segments; no DB access (used by reindex.py workers)."""
+        with stage('image', 'hash'):
+            segments = self._generate_segments(self._buffer(img))
+            hashes = self.compute_hashes(list(segments.values()))
+        return list(zip(segments, hashes)) if hashes else []
+
+    @staticmethod
+    def insert_hashes(conn, image_id, hashes, digest, generation):
+        conn.executemany(f'INSERT INTO image_hashes (image_id, segment, content_sha256, generation, '
+                         f'{", ".join(HASHES)}) VALUES (?, ?, ?, ?{", ?" * len(HASHES)})',
+                         [(image_id, name, digest if name == 'full' else None, generation,
+                           *(values[h] for h in HASHES)) for name, values in hashes])
+        return len(hashes)
+
+    @staticmethod
+    def insert_frame(conn, video_id, frame_id):
+        conn.execute('INSERT OR IGNORE INTO video_frames (video_id, frame_id) VALUES (?, ?)', (video_id, frame_id))
+
+    def _apply_records(self, conn, records):
+        """Group commit of write-behind records. Returns the last image_hashes row id of each."""
+        generation = generations.active_generation(conn, 'image')
+        rows = []
+        for record in records:
+            self.insert_hashes(conn, record["image_id"], record["hashes"], record["digest"], generation)
+            if record.get("video_id"):
+                self.insert_frame(conn, record["video_id"], record["image_id"])
+            rows.append(conn.execute('SELECT last_insert_rowid()').fetchone()[0])
+        return rows
+
+    def _on_submit(self, key, record):
+        self.index.add_pending(key, [(None, record["image_id"], name, *(values[h] for h in HASHES))
+                                     for name, values in record["hashes"]])
+
+    def _on_commit(self, key, record, row):
+        self.index.commit_pending(key, row)
+
+    def _on_dead(self, key, record):
+        self.index.drop_pending(key)
+
+    def find_exact(self, image_path):
+        """image_id of a registered asset with the same file bytes, else None (cluster routers)."""
+        conn = sqlite3.connect(self.db_path)
         try:
-            img = Image.open(image_path)
+            return self._find_digest(conn, sha256_file(image_path))
+        finally:
+            conn.close()
+
+    def register_image(self, image_path, image_id=None, video_id=None):
+        """Registers an image AND its segments in the database (as a frame of `video_id`, if given)."""
+        try:
+            digest = self._content_digest(image_path)
+            img = self._open(image_path)
         except Exception as e:
             return False, f"Failed to open image: {e}"
 
+        # Exact re-uploads are rejected before decoding / segment hashing
+        if digest:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                existing = self._find_digest(conn, digest)
+            finally:
+                conn.close()
+            if existing:
+                return False, Duplicate(f"Exact duplicate of registered asset {existing}", existing)
+
         if not image_id:
             image_id = str(uuid.uuid4())
 
-        segments = self._generate_segments(img)
-        
+        hashes = self.compute_segment_hashes(img)
+
+        if self.writer:
+            try:
+                self.writer.submit({"image_id": image_id, "hashes": hashes, "digest": digest, "video_id": video_id})
+            except Exception as e:
+                return False, f"Write-behind log error: {e}"
+            return True, f"Registered asset {image_id} with {len(hashes)} segment hashes"
+
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
         try:
-            count = 0
-            for name, segment_img in segments.items():
-                phash = self.compute_hash(segment_img)
-                if phash:
-                    cursor.execute('INSERT INTO image_hashes (image_id, phash, segment) VALUES (?, ?, ?)', 
-                                   (image_id, phash, name))
-                    count += 1
-            
+            count = self.insert_hashes(conn, image_id, hashes, digest, generations.active_generation(conn, 'image'))
+            if video_id:
+                self.insert_frame(conn, video_id, image_id)
             conn.commit()
             return True, f"Registered asset {image_id} with {count} segment hashes"
         except Exception as e:
@@ -93,6 +297,46 @@ class ImageOriginalityRequest:
         finally:
             conn.close()
 
+    @staticmethod
+    def _legacy_frames(conn, video_id):
+        """
+        `{video_id}_{i}` frame rows of a video registered before video_frames existed.
+        Frames recorded for another video are left alone.
+        """
+        frame_id = re.compile(re.escape(video_id) + r'_\d+')
+        like = video_id.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '\\_%'
+        return [row[0] for row in conn.execute(
+            "SELECT DISTINCT image_id FROM image_hashes WHERE image_id LIKE ? ESCAPE '\\' AND deleted = 0 "
+            "AND image_id NOT IN (SELECT frame_id FROM video_frames)", (like,)) if frame_id.fullmatch(row[0])]
+
+    def delete_image(self, image_id, include_frames=False):
+        """
+        Tombstones the rows of `image_id`. With include_frames, also the frame assets
+        registered for video `image_id`.
+        """
+        if self.writer:
+            self.writer.flush()  # so its pending rows are in the table to tombstone
+        conn = sqlite3.connect(self.db_path)
+        try:
+            ids = [image_id]
+            if include_frames:
+                frames = [row[0] for row in conn.execute('SELECT frame_id FROM video_frames WHERE video_id = ?',
+                                                         (image_id,))]
+                ids += frames or self._legacy_frames(conn, image_id)
+            with conn:
+                deleted = tombstones.tombstone(conn, 'image', 'image_hashes', 'image_id', ids)
+                conn.executemany('DELETE FROM video_frames WHERE frame_id = ?', [(i,) for i in ids])
+        except Exception as e:
+            return False, f"Database error: {e}"
+        finally:
+            conn.close()
+        if not deleted:
+            return False, f"Asset {image_id} not found"
+        for asset_id, (_, max_row) in deleted.items():
+            self.index.remove(asset_id, max_row)
+        rows = sum(count for count, _ in deleted.values())
+        return True, f"Deleted {len(deleted)} image asset(s) for {image_id} ({rows} segment hashes)"
+
     def check_originality(self, image_path, threshold=10):
         """
         Checks if the image is original, a duplicate, or a partial crop.
@@ -100,48 +344,54 @@ class ImageOriginalityRequest:
         Returns: classification (str), closest_match_id (str or None), distance (int)
         """
         try:
-            original_img = Image.open(image_path)
+            digest = self._content_digest(image_path)
+            if digest:
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    existing = self._find_digest(conn, digest)
+                finally:
+                    conn.close()
+                cache_result('image_content_digest', bool(existing))
+                if existing:
+                    return "DUPLICATE (Exact)", existing, 0
+            original_img = self._open(image_path)
         except Exception as e:
             print(f"Error opening image {image_path}: {e}")
             return "ERROR", None, -1
 
-        # Calculate hashes for 4 rotations + Mirroring
-        hashes_to_check = []
-        # Normal & Rotations
-        hashes_to_check.append(imagehash.phash(original_img))
-        hashes_to_check.append(imagehash.phash(original_img.rotate(90, expand=True)))
-        hashes_to_check.append(imagehash.phash(original_img.rotate(180, expand=True)))
-        hashes_to_check.append(imagehash.phash(original_img.rotate(270, expand=True)))
-        
-        # Mirroring (Horizontal Flip)
-        mirrored_img = original_img.transpose(Image.FLIP_LEFT_RIGHT)
-        hashes_to_check.append(imagehash.phash(mirrored_img))
+        # Calculate hashes for 4 rotations + Mirroring, all from the shared buffer. The
+        # orientations are transposes of its HASH_INPUT square; colorhash ignores orientation.
+        with stage('image', 'hash'):
+            try:
+                small = self._buffer(original_img).resize((HASH_INPUT, HASH_INPUT), Image.LANCZOS)
+                colorhash = hash_value(imagehash.colorhash(small))
+                gray = small.convert('L')
+                orientations = [gray, gray.transpose(Image.ROTATE_90), gray.transpose(Image.ROTATE_180),
+                                gray.transpose(Image.ROTATE_270), gray.transpose(Image.FLIP_LEFT_RIGHT)]
+                hashes_to_check = [dict({name: hash_value(h) for name, h in hashes.items()}, colorhash=colorhash)
+                                   for hashes in self._structural_hashes(orientations)]
+            except Exception as e:
+                print(f"Error hashing image {image_path}: {e}")
+                return "ERROR", None, -1
 
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        # Fetch all hashes including segment info
-        cursor.execute('SELECT image_id, phash, segment FROM image_hashes')
-        rows = cursor.fetchall()
-        conn.close()
+        with stage('image', 'db_fetch'):
+            if self.writer:
+                self.writer.refresh_foreign()  # other processes' pending records
+            conn = sqlite3.connect(self.db_path)
+            try:
+                self.index.refresh(conn, generations.active_generation(conn, 'image'))
+            finally:
+                conn.close()
 
-        global_min_dist = float('inf')
-        closest_match_id = None
-        matched_segment = 'full'
+        # dHash candidates from the mapped bucket tables, re-ranked on the full ensemble
+        with stage('image', 'scoring'):
+            global_min_dist, closest_match_id, matched_segment, colours_agree, scored = self.index.search(
+                hashes_to_check)
+        CHECK_ROWS.labels(kind='scored').inc(scored)
+        CHECK_ROWS.labels(kind='skipped').inc(max(len(self.index) - scored, 0))
 
-        for target_hash in hashes_to_check:
-            for img_id, db_phash_str, segment in rows:
-                try:
-                    db_phash = imagehash.hex_to_hash(db_phash_str)
-                    dist = target_hash - db_phash  # Hamming distance
-                    
-                    if dist < global_min_dist:
-                        global_min_dist = dist
-                        closest_match_id = img_id
-                        matched_segment = segment
-                except Exception:
-                    continue
-
-        if global_min_dist < 10:
+        # Same colours (e.g. a recompressed copy): allow a little more structural noise
+        if global_min_dist < threshold + (COLOR_MARGIN if colours_agree else 0):
             if global_min_dist == 0 and matched_segment == 'full':
                 return "DUPLICATE (Exact)", closest_match_id, 0
             
@@ -0,0 +1,342 @@
+"""
+Bulk re-index / backfill of stored signatures into a new index generation.
+
+When NUM_PERM, the shingle size, the SBERT model or the pHash segment scheme changes,
+every stored signature is stale. This tool recomputes them from the original files:
+
+  build     streams assets from a directory or manifest, recomputes signatures in a
+            process pool and writes them to a new *building* generation. Progress is
+            checkpointed per asset (same transaction as its rows), so re-running the
+            same command after a crash resumes where it stopped.
+  activate  switches readers to the built generation in one transaction. /check keeps
+            serving the previous generation until then.
+  status    lists generations and build progress.
+  drop      deletes the rows of retired (or abandoned building) generations.
+
+Sources:
+  - a directory: every file, asset id = file name without extension; modality from extension
+  - a manifest JSON: {"assets": [{"modality", "id", "path", ["role"]}]} (bench/corpus.py format;
+    only originals are indexed)
+
+Video files are re-indexed as part of the image generation (their sampled frames are
+stored as `{asset_id}_{i}` image rows, listed in video_frames). Audio fingerprints belong to the Go service and
+are not handled here.
+
+Usage (from originality-engine/):
+    python reindex.py build --modality text --source /data/originals --workers 4
+    python reindex.py status
+    python reindex.py activate --modality text
+    python reindex.py drop --modality text
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+ENGINE_ROOT = os.path.dirname(os.path.abspath(__file__))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)
+
+from common import generations, tombstones
+from common.mmap_index import drop_generation
+
+DB_PATH = os.environ.get('ORIGINALITY_DB_PATH') or os.path.join(ENGINE_ROOT, 'audioFiles', 'fingerprints.db')
+
+TEXT_EXTENSIONS = {'.txt', '.pdf', '.docx'}
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.bmp', '.gif', '.webp', '.tif', '.tiff'}
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.webm'}
+TABLES = {'text': 'text_assets', 'image': 'image_hashes'}
+ID_COLUMNS = {'text': 'text_id', 'image': 'image_id'}
+
+
+def source_modality(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in TEXT_EXTENSIONS:
+        return 'text'
+    if ext in IMAGE_EXTENSIONS:
+        return 'image'
+    if ext in VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+
+def iter_sources(source, modality):
+    """Yields (asset_id, path, kind) for the assets feeding `modality`'s tables."""
+    kinds = {'text'} if modality == 'text' else {'image', 'video'}
+    if os.path.isdir(source):
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                kind = source_modality(path)
+                if kind in kinds:
+                    yield os.path.splitext(name)[0], path, kind
+        return
+    with open(source) as f:
+        manifest = json.load(f)
+    base = os.path.dirname(os.path.abspath(source))
+    for asset in manifest.get("assets", manifest) if isinstance(manifest, dict) else manifest:
+        if asset.get("role", "original") != "original" or asset.get("modality") not in kinds:
+            continue
+        path = asset["path"]
+        if not os.path.isabs(path) and not os.path.exists(path):
+            path = os.path.join(base, path)  # relative to the manifest
+        yield asset["id"], path, asset["modality"]
+
+
+def ensure_checkpoints(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS reindex_checkpoints (
+            modality    TEXT NOT NULL,
+            generation  INTEGER NOT NULL,
+            asset_id    TEXT NOT NULL,
+            status      TEXT NOT NULL,
+            detail      TEXT,
+            PRIMARY KEY (modality, generation, asset_id)
+        )
+    ''')
+    conn.commit()
+
+
+# --- worker side: one engine per process, no DB writes ---
+
+_worker = {}
+
+
+def _init_worker(modality, db_path, semantic):
+    if modality == 'text':
+        from textFiles.originality import TextOriginalityRequest
+        _worker['engine'] = TextOriginalityRequest(db_path=db_path, semantic=semantic, write_behind=False)
+    else:
+        from imageFiles.originality import ImageOriginalityRequest
+        from videoFiles.originality import VideoOriginalityRequest
+        _worker['engine'] = ImageOriginalityRequest(db_path=db_path, write_behind=False)
+        _worker['video'] = VideoOriginalityRequest(image_engine=_worker['engine'])
+
+
+def _compute(asset_id, path, kind):
+    """Returns (asset_id, records, error). records: text -> [record]; image -> [(image_id, hashes, digest)]"""
+    engine = _worker['engine']
+    try:
+        if kind == 'text':
+            record, error = engine.compute_record(path)
+            return asset_id, [record] if record else [], error
+        if kind == 'image':
+            from PIL import Image
+            from common.digests import sha256_file
+            with Image.open(path) as img:
+                img.load()
+                return asset_id, [(asset_id, engine.compute_segment_hashes(img), sha256_file(path))], None
+        # Video: the sampled frames become `{asset_id}_{i}` image rows, as register_video stores them
+        work_dir = tempfile.mkdtemp()
+        try:
+            _, frames = _worker['video'].process_video(path, work_dir)
+            return asset_id, [(f"{asset_id}_{i}", engine.compute_segment_hashes(frame), None)
+                              for i, frame in enumerate(frames)], None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    except Exception as e:
+        return asset_id, [], f"{type(e).__name__}: {e}"
+
+
+# --- commands ---
+
+def engine_params(modality, semantic):
+    if modality == 'text':
+        from textFiles.originality import TextOriginalityRequest
+        return TextOriginalityRequest(db_path=DB_PATH, semantic=semantic, write_behind=False).index_params()
+    from imageFiles.originality import ImageOriginalityRequest
+    return ImageOriginalityRequest(db_path=DB_PATH, write_behind=False).index_params()
+
+
+def write_result(conn, modality, generation, asset_id, records, error):
+    if error:
+        conn.execute('INSERT OR REPLACE INTO reindex_checkpoints VALUES (?, ?, ?, ?, ?)',
+                     (modality, generation, asset_id, 'error', error))
+        return
+    if modality == 'text':
+        from textFiles.originality import TextOriginalityRequest
+        for record in records:
+            TextOriginalityRequest.insert_record(conn, asset_id, record, generation)
+    else:
+        from imageFiles.originality import ImageOriginalityRequest
+        for image_id, hashes, digest in records:
+            ImageOriginalityRequest.insert_hashes(conn, image_id, hashes, digest, generation)
+            if image_id != asset_id:  # a video frame: recorded so deleting the video removes it
+                ImageOriginalityRequest.insert_frame(conn, asset_id, image_id)
+    conn.execute('INSERT OR REPLACE INTO reindex_checkpoints VALUES (?, ?, ?, ?, ?)',
+                 (modality, generation, asset_id, 'done', str(len(records))))
+
+
+def cmd_build(args):
+    semantic = not args.no_semantic
+    params = engine_params(args.modality, semantic)  # also creates / migrates the schema
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    ensure_checkpoints(conn)
+
+    generation, built_params = generations.building_generation(conn, args.modality)
+    if generation is not None and built_params != params:
+        print(f"Generation {generation} is being built with different parameters {built_params}.")
+        print("Drop it first (reindex.py drop --modality ... --building) or build with the same settings.")
+        return 1
+    if generation is None:
+        generation = generations.begin_generation(conn, args.modality, params)
+        print(f"Building {args.modality} generation {generation} with {params}")
+    else:
+        print(f"Resuming {args.modality} generation {generation}")
+
+    if args.retry_errors:
+        conn.execute('DELETE FROM reindex_checkpoints WHERE modality = ? AND generation = ? AND status = ?',
+                     (args.modality, generation, 'error'))
+        conn.commit()
+    done = {row[0] for row in conn.execute(
+        'SELECT asset_id FROM reindex_checkpoints WHERE modality = ? AND generation = ?', (args.modality, generation))}
+    # Deleted assets stay deleted: skip ids that were tombstoned and not registered again since
+    table, id_col = TABLES[args.modality], ID_COLUMNS[args.modality]
+    deleted = tombstones.deleted_ids(conn, args.modality, table, id_col,
+                                     generations.active_generation(conn, args.modality))
+    todo = [(asset_id, path, kind) for asset_id, path, kind in iter_sources(args.source, args.modality)
+            if asset_id not in done and (f"{asset_id}_0" if kind == 'video' else asset_id) not in deleted]
+    print(f"{len(done)} assets already checkpointed, {len(todo)} to go ({args.workers} workers)")
+
+    started = time.perf_counter()
+    processed = errors = pending_commit = 0
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker,
+                             initargs=(args.modality, DB_PATH, semantic)) as pool:
+        items = iter(todo)
+        in_flight = set()
+        while True:
+            # Keep a bounded window in flight so huge sources stream instead of queueing up front
+            while len(in_flight) < args.workers * 4:
+                item = next(items, None)
+                if item is None:
+                    break
+                in_flight.add(pool.submit(_compute, *item))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                asset_id, records, error = future.result()
+                write_result(conn, args.modality, generation, asset_id, records, error)
+                processed += 1
+                errors += bool(error)
+                pending_commit += 1
+                if error:
+                    print(f"[ERROR] {asset_id}: {error}")
+            if pending_commit >= args.commit_every:
+                conn.commit()
+                pending_commit = 0
+                print(f"  {processed}/{len(todo)} ({processed / (time.perf_counter() - started):.1f} assets/s)")
+    conn.commit()
+    conn.close()
+    print(f"Generation {generation}: {processed} assets processed, {errors} errors in "
+          f"{time.perf_counter() - started:.1f}s. Activate with: reindex.py activate --modality {args.modality}")
+    return 0
+
+
+def cmd_activate(args):
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    ensure_checkpoints(conn)
+    generation = args.generation
+    if generation is None:
+        generation, _ = generations.building_generation(conn, args.modality)
+    if generation is None:
+        print(f"No {args.modality} generation is being built.")
+        return 1
+
+    table, id_col = TABLES[args.modality], ID_COLUMNS[args.modality]
+    active = generations.active_generation(conn, args.modality)
+    # Assets registered after the build started (or absent from the source) would vanish from checks
+    missing = [row[0] for row in conn.execute(
+        f'SELECT DISTINCT {id_col} FROM {table} WHERE generation = ? AND deleted = 0 AND {id_col} NOT IN '
+        f'(SELECT {id_col} FROM {table} WHERE generation = ?)', (active, generation))]
+    if missing and not args.allow_missing:
+        print(f"{len(missing)} assets of generation {active} are missing from generation {generation}, "
+              f"e.g. {missing[:5]}. Re-run build with a source that includes them, or pass --allow-missing.")
+        return 1
+
+    generations.activate(conn, args.modality, generation)
+    conn.close()
+    print(f"{args.modality}: generation {generation} is now active (was {active}).")
+    return 0
+
+
+def cmd_status(args):
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    ensure_checkpoints(conn)
+    for modality, table in TABLES.items():
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)).fetchone():
+            continue
+        generations.ensure_schema(conn, table)
+        active = generations.active_generation(conn, modality)
+        counts = dict(conn.execute(f'SELECT generation, COUNT(*) FROM {table} GROUP BY generation').fetchall())
+        print(f"{modality}: active generation {active} ({counts.get(active, 0)} rows)")
+        for gen, status, params in conn.execute(
+                'SELECT generation, status, params FROM index_generations WHERE modality = ? ORDER BY generation',
+                (modality,)):
+            progress = dict(conn.execute(
+                'SELECT status, COUNT(*) FROM reindex_checkpoints WHERE modality = ? AND generation = ? GROUP BY status',
+                (modality, gen)).fetchall())
+            print(f"  gen {gen:<3} {status:<9} rows={counts.get(gen, 0):<8} checkpoints={progress} params={params}")
+    conn.close()
+    return 0
+
+
+def cmd_drop(args):
+    conn = sqlite3.connect(DB_PATH, timeout=30)
+    ensure_checkpoints(conn)
+    table = TABLES[args.modality]
+    targets = generations.retired_generations(conn, args.modality)
+    if args.building:
+        building, _ = generations.building_generation(conn, args.modality)
+        targets += [building] if building is not None else []
+    with conn:
+        for gen in targets:
+            removed = conn.execute(f'DELETE FROM {table} WHERE generation = ?', (gen,)).rowcount
+            conn.execute('DELETE FROM reindex_checkpoints WHERE modality = ? AND generation = ?', (args.modality, gen))
+            conn.execute('DELETE FROM index_generations WHERE modality = ? AND generation = ?', (args.modality, gen))
+            drop_generation(DB_PATH, args.modality, gen)
+            print(f"{args.modality}: dropped generation {gen} ({removed} rows)")
+    conn.close()
+    if not targets:
+        print(f"{args.modality}: nothing to drop.")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-index stored signatures into a new generation")
+    subparsers = parser.add_subparsers(dest="command")
+
+    build = subparsers.add_parser("build", help="Build (or resume) a new generation from source files")
+    build.add_argument('--modality', choices=sorted(TABLES), required=True)
+    build.add_argument('--source', required=True, help='Directory of original files or a manifest JSON')
+    build.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    build.add_argument('--commit-every', type=int, default=50, help='Assets per checkpoint commit')
+    build.add_argument('--no-semantic', action='store_true', help='Text: MinHash only (no embeddings)')
+    build.add_argument('--retry-errors', action='store_true', help='Re-process assets that failed last time')
+
+    activate = subparsers.add_parser("activate", help="Atomically switch readers to the built generation")
+    activate.add_argument('--modality', choices=sorted(TABLES), required=True)
+    activate.add_argument('--generation', type=int)
+    activate.add_argument('--allow-missing', action='store_true')
+
+    subparsers.add_parser("status", help="Show generations and build progress")
+
+    drop = subparsers.add_parser("drop", help="Delete rows of retired generations")
+    drop.add_argument('--modality', choices=sorted(TABLES), required=True)
+    drop.add_argument('--building', action='store_true', help='Also abandon the generation being built')
+
+    args = parser.parse_args()
+    commands = {"build": cmd_build, "activate": cmd_activate, "status": cmd_status, "drop": cmd_drop}
+    if args.command is None:
+        parser.print_help()
+        return
+    sys.exit(commands[args.command](args))
+
+
+if __name__ == "__main__":
+    main()
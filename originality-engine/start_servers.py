@@ -1,77 +1,381 @@
-import subprocess
+"""
+Starts and supervises the originality engine microservices (Windows, Linux and macOS).
+
+    python start_servers.py                         # audio, image, video and text
+    python start_servers.py --services text,image   # a subset
+
+Each service runs as a child process, with its output appended to logs/<service>.log.
+A service is started, then:
+  1. listening - its /health answers (the Go audio server has none: any HTTP response)
+  2. warm-up   - POST /warmup: the DB read into the page cache, the index mapped and its
+                 pages touched, a first model encode (common/warmup.py)
+  3. check     - one synthetic /check through the real HTTP path: a generated text, PNG
+                 and PCM tone, and WARMUP_VIDEO (default test_asset.mp4). The video check
+                 calls the image and audio services, so it waits until they are ready
+and only then is it ready. The stack is ready once every service is; GET /ready on
+SUPERVISOR_PORT answers 503 until then, and GET /status reports each service's state,
+pid, restarts and startup time per phase.
+
+A service whose process exits, or whose health probe fails SUPERVISOR_HEALTH_FAILURES
+times in a row, is restarted (with backoff) and goes through warm-up again.
+"""
+import argparse
+import json
+import math
 import os
+import shlex
+import signal
+import struct
+import subprocess
 import sys
+import threading
 import time
-import signal
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+START_TIMEOUT_S = float(os.environ.get('SUPERVISOR_START_TIMEOUT_S', '300'))
+HEALTH_INTERVAL_S = float(os.environ.get('SUPERVISOR_HEALTH_INTERVAL_S', '5'))
+HEALTH_FAILURES = int(os.environ.get('SUPERVISOR_HEALTH_FAILURES', '3'))
+MAX_BACKOFF_S = float(os.environ.get('SUPERVISOR_MAX_BACKOFF_S', '30'))
+STABLE_S = 60  # a service up this long restarts with the initial backoff again
+STATUS_PORT = int(os.environ.get('SUPERVISOR_PORT', '5011'))  # 0: no status endpoint
+WARMUP_VIDEO = os.environ.get('WARMUP_VIDEO') or os.path.join(BASE_DIR, 'test_asset.mp4')
+
+TEXT_PORT = int(os.environ.get('TEXT_PORT', '5002'))
+IMAGE_PORT = int(os.environ.get('IMAGE_PORT', '8081'))
+VIDEO_PORT = int(os.environ.get('VIDEO_PORT', '5003'))
+AUDIO_PORT = 8080  # fixed in audioFiles/main.go
+
+
+def python_executable():
+    """ORIGINALITY_PYTHON, else the project venv (venv311_cpu) if present, else this interpreter."""
+    if os.environ.get('ORIGINALITY_PYTHON'):
+        return os.environ['ORIGINALITY_PYTHON']
+    for parts in (('Scripts', 'python.exe'), ('bin', 'python')):
+        path = os.path.join(BASE_DIR, 'venv311_cpu', *parts)
+        if os.path.exists(path):
+            return path
+    return sys.executable
+
+
+# --- synthetic warm-up payloads (stdlib only: the supervisor may run outside the venv) ---
+
+def synthetic_text():
+    words = ("originality ledger asset rights register verify chain token media license owner "
+             "digital content proof hash signature market creator archive").split()
+    return " ".join(words[(i * 7 + i // 5) % len(words)] for i in range(300)).encode('utf-8')
+
+
+def synthetic_png(size=128):
+    """A small RGB PNG with a diagonal gradient and a checkerboard."""
+    raw = b''.join(b'\x00' + bytes(value for x in range(size)
+                                    for value in ((x + y) % 256, (x * 2) % 256, 255 * ((x // 16 + y // 16) % 2)))
+                   for y in range(size))
+
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', size, size, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw)) + chunk(b'IEND', b''))
+
+
+def synthetic_pcm(seconds=5, rate=11025):
+    """Mono 16-bit little-endian PCM: a tone changing pitch every quarter second."""
+    samples = []
+    for i in range(seconds * rate):
+        frequency = 220 * 2 ** (((i // (rate // 4)) % 12) / 12)
+        samples.append(int(12000 * math.sin(2 * math.pi * frequency * i / rate)))
+    return struct.pack(f'<{len(samples)}h', *samples)
+
+
+def check_upload(filename, payload):
+    def check(session, url):
+        resp = session.post(f"{url}/check", files={'file': (filename, payload)}, timeout=START_TIMEOUT_S)
+        resp.raise_for_status()
+    return check
+
+
+def check_pcm(session, url):
+    resp = session.post(f"{url}/check/pcm", params={'rate': 11025}, data=synthetic_pcm(),
+                        headers={'Content-Type': 'application/octet-stream'}, timeout=START_TIMEOUT_S)
+    resp.raise_for_status()
+
+
+def check_video(session, url):
+    if not os.path.exists(WARMUP_VIDEO):
+        return
+    with open(WARMUP_VIDEO, 'rb') as f:
+        check_upload(os.path.basename(WARMUP_VIDEO), f.read())(session, url)
+
+
+class Service:
+    """One supervised child process and its readiness state."""
+
+    def __init__(self, name, cmd, cwd, port, health='/health', warmup=True, check=None, depends=()):
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.url = f"http://127.0.0.1:{port}"
+        self.health = health
+        self.warmup = warmup
+        self.check = check
+        self.depends = depends
+        self.process = None
+        self.spawned_at = None
+        self.state = 'stopped'
+        self.restarts = 0
+        self.ready_since = None
+        self.startup = {}
+        self.error = None
+        self.session = requests.Session()
+
+    def status(self):
+        return {"state": self.state, "pid": self.process.pid if self.process else None, "restarts": self.restarts,
+                "startup": self.startup, "error": self.error}
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def probe(self, timeout=2):
+        """Health probe: /health answers 200 (without a health path, any HTTP answer)."""
+        try:
+            resp = self.session.get(f"{self.url}{self.health or '/'}", timeout=timeout)
+        except requests.RequestException:
+            return False
+        return resp.status_code == 200 if self.health else True
+
+
+class Supervisor:
+    def __init__(self, services, log_dir):
+        self.services = {service.name: service for service in services}
+        self.log_dir = log_dir
+        self.stopping = threading.Event()
+        self.started_at = time.perf_counter()
+        self.was_ready = False
+        self.lock = threading.Lock()
+
+    def ready(self):
+        return all(service.state == 'ready' for service in self.services.values())
+
+    # --- one thread per service ---
+
+    def run_service(self, service):
+        backoff = 1.0
+        while not self.stopping.is_set():
+            self.spawn(service)
+            if self.bring_up(service):
+                self.report()
+                self.monitor(service)
+            if self.stopping.is_set():
+                break
+            if service.ready_since and time.perf_counter() - service.ready_since > STABLE_S:
+                backoff = 1.0
+            delay, backoff = backoff, min(backoff * 2, MAX_BACKOFF_S)
+            service.state, service.ready_since = 'restarting', None
+            self.report()
+            self.terminate(service)
+            print(f"[{service.name}] Restarting in {delay:.0f} s ({service.error})")
+            if self.stopping.wait(delay):
+                break
+            service.restarts += 1
+        self.terminate(service)
+
+    def spawn(self, service):
+        os.makedirs(self.log_dir, exist_ok=True)
+        log = open(os.path.join(self.log_dir, f"{service.name}.log"), 'a', buffering=1)
+        log.write(f"\n--- {time.strftime('%Y-%m-%d %H:%M:%S')} starting: {' '.join(service.cmd)}\n")
+        if os.name == 'nt':
+            group = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+        else:
+            group = {"start_new_session": True}  # its own process group: `go run` forks the server
+        service.process = subprocess.Popen(service.cmd, cwd=service.cwd, stdout=log, stderr=subprocess.STDOUT,
+                                           env=dict(os.environ, PYTHONUNBUFFERED='1'), **group)
+        log.close()
+        service.state, service.error, service.startup = 'starting', None, {}
+        service.spawned_at = time.perf_counter()
+        print(f"[{service.name}] Started with PID {service.process.pid}")
+
+    def bring_up(self, service):
+        """Waits for the service to listen, warms it up and runs its synthetic check. True when ready."""
+        started = service.spawned_at
+        deadline = started + START_TIMEOUT_S
+        while not service.probe():
+            if not service.alive():
+                service.error = f"exited with code {service.process.returncode} while starting"
+                return False
+            if time.perf_counter() > deadline or self.stopping.wait(0.25):
+                service.error = service.error or f"not listening after {START_TIMEOUT_S:.0f} s"
+                return False
+        service.startup["listening_s"] = round(time.perf_counter() - started, 2)
+
+        service.state = 'warming'
+        try:
+            if service.warmup:
+                t0 = time.perf_counter()
+                resp = service.session.post(f"{service.url}/warmup", timeout=START_TIMEOUT_S)
+                body = resp.json()
+                if resp.status_code != 200:
+                    raise RuntimeError(f"warm-up failed: {body.get('error', resp.status_code)}")
+                service.startup["warmup_s"] = round(time.perf_counter() - t0, 2)
+                service.startup["warmup_steps"] = {name: step["ms"] for name, step in body["steps"].items()}
+            if service.check:
+                # The check exercises the services it calls, so they have to be up first
+                while not all(self.services[name].state == 'ready' for name in service.depends
+                              if name in self.services):
+                    if not service.alive() or self.stopping.wait(0.25):
+                        raise RuntimeError("stopped while waiting for dependencies")
+                t0 = time.perf_counter()
+                service.check(service.session, service.url)
+                service.startup["check_s"] = round(time.perf_counter() - t0, 2)
+        except (requests.RequestException, ValueError, RuntimeError, KeyError) as e:
+            service.error = str(e)
+            return False
+        service.startup["total_s"] = round(time.perf_counter() - started, 2)
+        service.state, service.ready_since = 'ready', time.perf_counter()
+        print(f"[{service.name}] Ready in {service.startup['total_s']:.1f} s "
+              f"({', '.join(f'{k} {v}' for k, v in service.startup.items() if k != 'total_s')})")
+        return True
+
+    def monitor(self, service):
+        """Returns once the ready service exits or fails its health probe HEALTH_FAILURES times in a row."""
+        failures = 0
+        while not self.stopping.wait(HEALTH_INTERVAL_S):
+            if not service.alive():
+                service.error = f"exited with code {service.process.returncode}"
+                return
+            failures = 0 if service.probe() else failures + 1
+            if failures >= HEALTH_FAILURES:
+                service.error = f"health probe failed {failures} times"
+                return
+
+    def terminate(self, service, timeout=10):
+        process = service.process
+        if process is None or process.poll() is not None:
+            return
+        try:
+            if os.name == 'nt':
+                # /T: the whole tree (`go run` starts the server as a child)
+                subprocess.run(['taskkill', '/T', '/F', '/PID', str(process.pid)], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGTERM)
+            process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            if os.name == 'nt':
+                process.kill()
+            else:
+                os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+        except ProcessLookupError:
+            pass
+
+    def report(self):
+        """Prints the startup summary when the whole stack becomes ready (and when it stops being ready)."""
+        with self.lock:
+            ready = self.ready()
+            if ready == self.was_ready:
+                return
+            self.was_ready = ready
+        if not ready:
+            print("--- Stack NOT ready: " + ", ".join(f"{s.name} {s.state}" for s in self.services.values()
+                                                     if s.state != 'ready'))
+            return
+        print(f"\n--- Stack ready ({time.perf_counter() - self.started_at:.1f} s since launch) ---")
+        print(f"{'service':<8} {'listening':>10} {'warm-up':>8} {'check':>7} {'total':>7} {'restarts':>9}")
+        for s in self.services.values():
+            t = s.startup
+            print(f"{s.name:<8} {t.get('listening_s', 0):>9.1f}s {t.get('warmup_s', 0):>7.1f}s "
+                  f"{t.get('check_s', 0):>6.1f}s {t.get('total_s', 0):>6.1f}s {s.restarts:>9}")
+        print()
+
+    # --- status endpoint ---
+
+    def serve_status(self, port):
+        supervisor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/ready', '/status'):
+                    self.send_error(404)
+                    return
+                ready = supervisor.ready()
+                body = {"ready": ready, "services": {name: (s.status() if self.path == '/status' else s.state)
+                                                     for name, s in supervisor.services.items()}}
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(200 if ready or self.path == '/status' else 503)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(('0.0.0.0', port), Handler)
+        threading.Thread(target=server.serve_forever, name='supervisor-status', daemon=True).start()
+        return server
+
+    def run(self, status_port=STATUS_PORT):
+        def interrupt(signum, frame):
+            raise KeyboardInterrupt
+        if hasattr(signal, 'SIGTERM'):
+            signal.signal(signal.SIGTERM, interrupt)  # e.g. systemd / docker stop: stop the children too
+        if status_port:
+            self.serve_status(status_port)
+            print(f"Readiness: http://localhost:{status_port}/ready, status: http://localhost:{status_port}/status")
+        threads = [threading.Thread(target=self.run_service, args=(service,), name=f"supervise-{service.name}")
+                   for service in self.services.values()]
+        for thread in threads:
+            thread.start()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)  # the main thread stays interruptible (Ctrl+C)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            print("\nStopping services...")
+            self.stopping.set()
+            for thread in threads:
+                thread.join()
+
+
+def services(python):
+    audio_cmd = shlex.split(os.environ.get('AUDIO_SERVER_CMD', 'go run .'), posix=os.name != 'nt')
+    return [
+        Service('audio', audio_cmd, os.path.join(BASE_DIR, 'audioFiles'), AUDIO_PORT, health=None, warmup=False,
+                check=check_pcm),
+        Service('image', [python, 'main.py', 'server'], os.path.join(BASE_DIR, 'imageFiles'), IMAGE_PORT,
+                check=check_upload('warmup.png', synthetic_png())),
+        Service('video', [python, 'server.py'], os.path.join(BASE_DIR, 'videoFiles'), VIDEO_PORT,
+                check=check_video, depends=('audio', 'image')),
+        Service('text', [python, 'server.py'], os.path.join(BASE_DIR, 'textFiles'), TEXT_PORT,
+                check=check_upload('warmup.txt', synthetic_text())),
+    ]
 
-# Configuration
-# Assuming this script is run from 'originality-engine' root
-BASE_DIR = os.getcwd()
-
-# Paths to services
-AUDIO_DIR = os.path.join(BASE_DIR, "audioFiles")
-IMAGE_DIR = os.path.join(BASE_DIR, "imageFiles")
-VIDEO_DIR = os.path.join(BASE_DIR, "videoFiles")
-
-# Virtual Environment Path
-# User seems to be using 'venv311_cpu' located in 'originality-engine'
-VENV_PYTHON = os.path.join(BASE_DIR, "venv311_cpu", "Scripts", "python.exe")
-
-if not os.path.exists(VENV_PYTHON):
-    # Fallback to system python if venv not found where expected
-    print(f"Warning: venv python not found at {VENV_PYTHON}. Using system python.")
-    VENV_PYTHON = sys.executable
-
-processes = []
-
-def start_service(name, cmd, cwd):
-    print(f"[{name}] Starting service...")
-    try:
-        # shell=False is safer, but shell=True might be needed for some env var loading
-        p = subprocess.Popen(
-            cmd, 
-            cwd=cwd, 
-            shell=True, # keeping True for Windows convenience with potential path issues
-            creationflags=subprocess.CREATE_NEW_CONSOLE # Opens in new window so logs are visible
-        )
-        processes.append((name, p))
-        print(f"[{name}] Started with PID {p.pid}")
-    except Exception as e:
-        print(f"[{name}] Failed to start: {e}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Start and supervise the originality engine services")
+    parser.add_argument('--services', default='audio,image,video,text', help='Comma-separated services to run')
+    parser.add_argument('--log-dir', default=os.path.join(BASE_DIR, 'logs'))
+    parser.add_argument('--status-port', type=int, default=STATUS_PORT, help='Readiness/status port (0: none)')
+    args = parser.parse_args()
+
+    wanted = [name.strip() for name in args.services.split(',') if name.strip()]
+    available = {service.name: service for service in services(python_executable())}
+    unknown = [name for name in wanted if name not in available]
+    if unknown:
+        parser.error(f"unknown service(s): {', '.join(unknown)} (choose from {', '.join(available)})")
+    # The video service calls the image and audio services on the supervised ports
+    os.environ.setdefault('IMAGE_SERVICE_URL', f"http://localhost:{IMAGE_PORT}")
+    os.environ.setdefault('AUDIO_SERVICE_URL', f"http://localhost:{AUDIO_PORT}")
+
     print("--- Starting Originality Engine Microservices ---")
+    print(f"Python: {python_executable()}; logs: {args.log_dir}")
+    Supervisor([available[name] for name in wanted], args.log_dir).run(args.status_port)
+
 
-    # 1. Start Audio Server (Go)
-    # Assuming 'go' is in PATH. 
-    # Command: go run . 
-    # Use 'main.go' specifically if '.' is ambiguous, but '.' is better for packages.
-    # We'll try 'go run .'
-    start_service("Audio Server", "go run .", AUDIO_DIR)
-    
-    # 2. Start Image Server (Python)
-    # Command: python main.py
-    start_service("Image Server", [VENV_PYTHON, "main.py"], IMAGE_DIR)
-
-    # 3. Start Video Server (Python)
-    # Command: python server.py
-    # Adding a small delay to ensure dependencies might be up (though not strictly necessary)
-    time.sleep(2) 
-    start_service("Video Server", [VENV_PYTHON, "server.py"], VIDEO_DIR)
-
-    # 4. Start Text Server (Python)
-    # Command: python server.py
-    TEXT_DIR = os.path.join(BASE_DIR, "textFiles")
-    start_service("Text Server", [VENV_PYTHON, "server.py"], TEXT_DIR)
-
-    print("\nAll services launched in separate windows.")
-    print("Press Ctrl+C to exit this launcher (Note: This won't close the external windows automatically).")
-
-    try:
-        while True:
-            time.sleep(1)
-    except KeyboardInterrupt:
-        print("\nExiting launcher.")
-
-if __name__ == "__main__":
+if __name__ == '__main__':
     main()
@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+
+class EncodeBatcher:
+    """
+    Micro-batching scheduler for SBERT encodes.
+    Concurrent handlers submit single texts; a worker thread collects them for up to
+    `max_wait_ms` or `max_batch_size` items, runs ONE batched encode and hands each
+    caller its own vector back.
+    """
+
+    def __init__(self, encode_fn, max_batch_size=16, max_wait_ms=5.0):
+        # encode_fn takes a list of texts and returns a sequence of vectors (same order)
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+        # Metrics (guarded by _cond)
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._max_batch_seen = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._encode_total = 0.0
+
+        self._worker = threading.Thread(target=self._run, name="sbert-encode-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, text):
+        """Queues a text for encoding. Returns a Future resolving to its embedding."""
+        future = Future()
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EncodeBatcher is closed")
+            self._queue.append((text, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def encode(self, text, timeout=None):
+        """Blocking helper: submit and wait for the result."""
+        return self.submit(text).result(timeout)
+
+    def close(self):
+        """Stops accepting work; items already queued are still encoded."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._worker.join()
+
+    def _next_batch(self):
+        with self._cond:
+            while not self._queue and not self._closed:
+                self._cond.wait()
+            if not self._queue:
+                return None
+
+            # The oldest request decides how long we may keep collecting
+            deadline = self._queue[0][2] + self.max_wait
+            while len(self._queue) < self.max_batch_size and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+            batch = []
+            while self._queue and len(batch) < self.max_batch_size:
+                batch.append(self._queue.popleft())
+
+            now = time.monotonic()
+            for _, _, enqueued in batch:
+                waited = now - enqueued
+                self._wait_total += waited
+                if waited > self._wait_max:
+                    self._wait_max = waited
+            self._batches += 1
+            self._items += len(batch)
+            self._last_batch_size = len(batch)
+            if len(batch) > self._max_batch_seen:
+                self._max_batch_seen = len(batch)
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            texts = [item[0] for item in batch]
+            started = time.monotonic()
+            try:
+                vectors = list(self.encode_fn(texts))
+                if len(vectors) != len(batch):
+                    raise RuntimeError(f"encode_fn returned {len(vectors)} vectors for {len(batch)} texts")
+                for (_, future, _), vec in zip(batch, vectors):
+                    if not future.done():  # the caller may have cancelled it
+                        future.set_result(vec)
+            except Exception as e:
+                # Every caller must be resolved, otherwise encode(timeout=None) blocks forever
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            finally:
+                with self._cond:
+                    self._encode_total += time.monotonic() - started
+
+    def stats(self):
+        """Snapshot of queue depth, batch sizes and wait times."""
+        with self._cond:
+            items = self._items or 1
+            batches = self._batches or 1
+            return {
+                "queue_depth": len(self._queue),
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / batches, 2),
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size_seen": self._max_batch_seen,
+                "avg_wait_ms": round(self._wait_total / items * 1000.0, 3),
+                "max_wait_ms": round(self._wait_max * 1000.0, 3),
+                "avg_encode_ms": round(self._encode_total / batches * 1000.0, 3),
+                "config": {
+                    "max_batch_size": self.max_batch_size,
+                    "max_wait_ms": self.max_wait * 1000.0
+                }
+            }
@@ -0,0 +1,129 @@
+import os
+import time
+
+import numpy as np
+
+# Text embedding inference backends.
+# All backends run the same all-MiniLM-L6-v2 weights and return L2-normalised float32 vectors,
+# so embeddings stored by one backend can be scored against queries from another.
+#
+#   torch       - SentenceTransformer, fp32 PyTorch (reference)
+#   torch-int8  - SentenceTransformer with dynamically int8-quantised Linear layers
+#   onnx        - ONNX Runtime, fp32 export of the transformer
+#   onnx-int8   - ONNX Runtime, dynamically int8-quantised export
+BACKENDS = ('torch', 'torch-int8', 'onnx', 'onnx-int8')
+
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'models')
+DEFAULT_MODEL_PATH = os.path.join(MODEL_DIR, MODEL_NAME)
+ONNX_FILE = os.path.join('onnx', 'model.onnx')
+ONNX_INT8_FILE = os.path.join('onnx', 'model_int8.onnx')
+MAX_SEQ_LENGTH = 256
+
+
+class TorchEncoder:
+    """fp32 (or int8-quantised) SentenceTransformer."""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, quantize=False):
+        from sentence_transformers import SentenceTransformer
+
+        # Never fall back to the hub: the engine must not reach the network at startup
+        if not os.path.isdir(model_path):
+            raise FileNotFoundError(f"Local model not found at {model_path}. "
+                                    f"Run textFiles/export_model.py once to download '{MODEL_NAME}'.")
+        self.model = SentenceTransformer(model_path, device='cpu')
+
+        if quantize:
+            import torch
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    def encode(self, texts, batch_size=32):
+        return self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True)
+
+
+class OnnxEncoder:
+    """ONNX Runtime session over the exported transformer + mean pooling + L2 normalisation."""
+
+    def __init__(self, model_path=DEFAULT_MODEL_PATH, quantize=False, num_threads=None):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        onnx_path = os.path.join(model_path, ONNX_INT8_FILE if quantize else ONNX_FILE)
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(f"{onnx_path} not found. Run textFiles/export_model.py first.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(onnx_path, options, providers=['CPUExecutionProvider'])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_path, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token='[PAD]')
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {'input_ids': input_ids, 'attention_mask': attention_mask}
+        if 'token_type_ids' in self.input_names:
+            feeds['token_type_ids'] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real tokens, then L2 normalise (same as the SBERT pipeline)
+        mask = attention_mask[..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled = summed / counts
+        norms = np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return (pooled / norms).astype(np.float32)
+
+    def encode(self, texts, batch_size=32):
+        single = isinstance(texts, str)
+        if single:
+            texts = [texts]
+        out = [self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)]
+        vectors = np.vstack(out) if out else np.zeros((0, 384), dtype=np.float32)
+        return vectors[0] if single else vectors
+
+
+def load_encoder(backend='torch', model_path=DEFAULT_MODEL_PATH):
+    """Builds the encoder for `backend`. Raises on unknown backends or missing files."""
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}'. Choose from: {', '.join(BACKENDS)}")
+    if backend.startswith('onnx'):
+        return OnnxEncoder(model_path, quantize=backend == 'onnx-int8')
+    return TorchEncoder(model_path, quantize=backend == 'torch-int8')
+
+
+def parity_report(candidate, reference, texts, tolerance=0.02):
+    """
+    Compares a backend against the fp32 reference.
+    Checks that pairwise cosine scores (what check_originality thresholds on) and
+    per-document vectors stay within `tolerance` of the reference.
+    """
+    cand = np.asarray(candidate.encode(texts), dtype=np.float32)
+    ref = np.asarray(reference.encode(texts), dtype=np.float32)
+
+    self_cos = np.sum(cand * ref, axis=1) / (np.linalg.norm(cand, axis=1) * np.linalg.norm(ref, axis=1))
+    pair_delta = np.abs(cand @ cand.T - ref @ ref.T)
+
+    report = {
+        "documents": len(texts),
+        "tolerance": tolerance,
+        "min_vector_cosine": float(self_cos.min()),
+        "max_score_delta": float(pair_delta.max()),
+        "mean_score_delta": float(pair_delta.mean()),
+    }
+    report["passed"] = report["max_score_delta"] <= tolerance and (1.0 - report["min_vector_cosine"]) <= tolerance
+    return report
+
+
+def timed_load(backend, model_path=DEFAULT_MODEL_PATH):
+    """Loads an encoder and returns (encoder, seconds)."""
+    started = time.perf_counter()
+    encoder = load_encoder(backend, model_path)
+    return encoder, time.perf_counter() - started
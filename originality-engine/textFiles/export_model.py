@@ -0,0 +1,99 @@
+"""
+One-time model export for the text engine.
+
+Saves all-MiniLM-L6-v2 to a local directory (so the engine never needs the network at
+startup), exports the transformer to ONNX, writes an int8-quantised ONNX copy and runs a
+parity check of every backend against the fp32 model.
+
+Usage (from textFiles/):
+    python export_model.py
+    python export_model.py --out ../models/all-MiniLM-L6-v2 --skip-onnx
+"""
+import argparse
+import json
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from encoders import (BACKENDS, DEFAULT_MODEL_PATH, MODEL_NAME, ONNX_FILE, ONNX_INT8_FILE,
+                      load_encoder, parity_report)
+
+PARITY_TEXTS = [
+    "The cat sat on the mat.",
+    "The feline rested on the rug.",
+    "Blockchain registries record ownership of digital assets.",
+    "A distributed ledger keeps track of who owns each digital asset.",
+    "Quarterly revenue grew by twelve percent on strong licensing demand.",
+    "The recipe calls for two cups of flour and a pinch of salt.",
+    "Perceptual hashes survive resizing and mild compression.",
+    "Copying a chapter from another book into your thesis is plagiarism.",
+]
+
+
+def save_local(out_dir):
+    from sentence_transformers import SentenceTransformer
+    model = SentenceTransformer(MODEL_NAME, device='cpu')
+    model.save(out_dir)
+    print(f"Saved {MODEL_NAME} to {out_dir}")
+    return model
+
+
+def export_onnx(model, out_dir):
+    import torch
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    sample = tokenizer(["export sample"], padding='max_length', max_length=16, return_tensors='pt')
+    input_names = ['input_ids', 'attention_mask', 'token_type_ids']
+    dynamic = {name: {0: 'batch', 1: 'sequence'} for name in input_names}
+    dynamic['last_hidden_state'] = {0: 'batch', 1: 'sequence'}
+
+    onnx_path = os.path.join(out_dir, ONNX_FILE)
+    os.makedirs(os.path.dirname(onnx_path), exist_ok=True)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            (sample['input_ids'], sample['attention_mask'], sample['token_type_ids']),
+            onnx_path,
+            input_names=input_names,
+            output_names=['last_hidden_state'],
+            dynamic_axes=dynamic,
+            opset_version=14,
+        )
+    print(f"Exported ONNX model to {onnx_path}")
+
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    int8_path = os.path.join(out_dir, ONNX_INT8_FILE)
+    quantize_dynamic(onnx_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"Wrote int8-quantised ONNX model to {int8_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the text embedding model for offline/ONNX use")
+    parser.add_argument('--out', default=DEFAULT_MODEL_PATH, help='Local model directory')
+    parser.add_argument('--skip-onnx', action='store_true', help='Only save the PyTorch model locally')
+    parser.add_argument('--tolerance', type=float, default=0.02, help='Max allowed cosine score delta vs fp32')
+    args = parser.parse_args()
+
+    model = save_local(args.out)
+    if not args.skip_onnx:
+        export_onnx(model, args.out)
+
+    # Parity: every backend must keep cosine scores within tolerance of the fp32 model
+    reference = load_encoder('torch', args.out)
+    failed = False
+    for backend in BACKENDS:
+        if backend == 'torch' or (args.skip_onnx and backend.startswith('onnx')):
+            continue
+        report = parity_report(load_encoder(backend, args.out), reference, PARITY_TEXTS, args.tolerance)
+        print(f"[{backend}] parity: {json.dumps(report)}")
+        failed = failed or not report["passed"]
+
+    if failed:
+        print("[ERROR] At least one backend is outside the parity tolerance.")
+        sys.exit(1)
+    print("[SUCCESS] All backends within tolerance.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import pickle
+
+import numpy as np
+
+from common.mmap_index import MappedIndex, advise_random, map_chunks
+
+try:
+    from . import quantization
+except ImportError:
+    import quantization
+
+# Shared view of `text_assets` used by the staged matcher (see common/mmap_index.py):
+#   - minhash:  uint64[n, num_perm] MinHash hash values (Jaccard = fraction of equal values)
+#   - lsh_keys / lsh_pos: a banded LSH table (every row's band keys, sorted, with the row
+#               position), so near-duplicate search only scores rows colliding in a band
+#   - emb:      row-normalised float32[n, dim] embeddings for the semantic stage
+#   - pq_*:     with TEXT_PQ_SUBSPACES, product-quantised codes of the base embeddings
+#               (quantization.py): the semantic scan reads the codes, and only the
+#               re-ranked candidates' rows of the mapped `emb` are read from disk
+# The base segment is memory-mapped from disk and shared by every worker; rows registered
+# since (the delta) and deletions since (tombstones) are applied per process on refresh.
+# Only rows of the active index generation are loaded; each generation has its own files.
+
+BAND_SEED = 1
+
+
+def optimal_bands(threshold, num_perm, fp_weight=0.5, fn_weight=0.5):
+    """
+    (bands, rows per band) minimising the weighted false positive / negative areas of the
+    LSH S-curve around `threshold` (same criterion as datasketch's MinHashLSH).
+    """
+    def area(lo, hi, b, r, above):
+        s = np.linspace(lo, hi, 201)
+        p = 1.0 - (1.0 - s ** r) ** b
+        y = (1.0 - p) if above else p
+        return float(np.sum((y[1:] + y[:-1]) / 2) * (hi - lo) / 200)
+
+    best, best_error = (1, num_perm), float('inf')
+    for b in range(1, num_perm + 1):
+        for r in range(1, num_perm // b + 1):
+            error = (fp_weight * area(0.0, threshold, b, r, False)
+                     + fn_weight * area(threshold, 1.0, b, r, True))
+            if error < best_error:
+                best, best_error = (b, r), error
+    return best
+
+
+class TextIndex(MappedIndex):
+    modality = 'text'
+    table = 'text_assets'
+    id_column = 'text_id'
+    columns = ('signature', 'embedding')
+    row_arrays = ('minhash', 'emb', 'has_emb')
+
+    def __init__(self, db_path, num_perm, lsh_threshold=0.5, pq_subspaces=quantization.PQ_SUBSPACES,
+                 rerank=quantization.PQ_RERANK, **kwargs):
+        self.num_perm = num_perm
+        self.lsh_threshold = lsh_threshold
+        self.pq_subspaces = pq_subspaces
+        self.rerank = rerank
+        self.bands, self.band_rows = optimal_bands(lsh_threshold, num_perm)
+        # Odd 64-bit multipliers combining a band's hash values into one key (wrapping arithmetic);
+        # distinct per band, so all bands share one sorted key table without colliding
+        self._multipliers = np.random.default_rng(BAND_SEED).integers(
+            1, 2 ** 63, size=(self.bands, self.band_rows), dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self.dim = None
+        super().__init__(db_path, **kwargs)
+
+    def _params(self):
+        return {"num_perm": self.num_perm, "bands": self.bands, "band_rows": self.band_rows, "band_seed": BAND_SEED}
+
+    def _decode(self, db_row):
+        _, _, sig_blob, emb_blob = db_row
+        try:
+            hashvalues = np.asarray(pickle.loads(sig_blob).hashvalues, dtype=np.uint64)
+        except Exception:
+            return None
+        # Signatures from another NUM_PERM (stale generation) cannot be indexed
+        if hashvalues.shape != (self.num_perm,):
+            return None
+        vec = None
+        if emb_blob is not None:
+            try:
+                vec = np.asarray(pickle.loads(emb_blob), dtype=np.float32).ravel()
+            except Exception:
+                vec = None
+            if vec is not None:
+                if self.dim is None:
+                    self.dim = vec.shape[0]
+                if vec.shape[0] != self.dim:
+                    vec = None
+                else:
+                    norm = np.linalg.norm(vec)
+                    vec = vec / norm if norm else vec
+        return {"minhash": hashvalues, "emb": vec, "has_emb": vec is not None}
+
+    def _stack(self, name, values):
+        if name == 'minhash':
+            return np.asarray(values, dtype=np.uint64).reshape(len(values), self.num_perm)
+        if name == 'emb':
+            matrix = np.zeros((len(values), self.dim or 0), dtype=np.float32)
+            for i, vec in enumerate(values):
+                if vec is not None:
+                    matrix[i] = vec
+            return matrix
+        if name == 'has_emb':
+            return np.asarray(values, dtype=bool)
+        return super()._stack(name, values)
+
+    def _concat(self, name, parts):
+        if name == 'emb':
+            # The base may predate the first embedding (dim 0): pad it to the current width
+            width = max(part.shape[1] for part in parts)
+            parts = [part if part.shape[1] == width else np.zeros((part.shape[0], width), dtype=np.float32)
+                     for part in parts]
+        return super()._concat(name, parts)
+
+    def _pq_width(self, dim):
+        return quantization.subspaces_for(dim, self.pq_subspaces) if self.pq_subspaces else 0
+
+    def _has_codes(self, segment):
+        """Whether `segment` holds PQ codes of this index's configured width."""
+        width = self._pq_width(segment['emb'].shape[1])
+        return bool(width) and 'pq_codes' in segment and segment['pq_codes'].shape[0] * 2 == width
+
+    def _derive_base(self, arrays, base, alive):
+        emb, has_emb = arrays['emb'], arrays['has_emb']
+        subspaces = self._pq_width(emb.shape[1])
+        live = int(has_emb.sum())
+        if not subspaces or live < quantization.PQ_MIN_ROWS:
+            return {}
+        # Keep the codebooks (and the codes of the surviving rows) unless they were trained
+        # on fewer than half the rows a retrain would use, i.e. while the corpus is small
+        previous = base if (base is not None and 'pq_codes' in base
+                            and base['pq_centroids'].shape[0] == subspaces
+                            and base['pq_centroids'].shape[2] * subspaces == emb.shape[1]) else None
+        if previous is not None and int(previous['pq_trained'][0]) >= min(live, quantization.PQ_TRAIN_ROWS) // 2:
+            centroids, trained = np.asarray(previous['pq_centroids']), int(previous['pq_trained'][0])
+            kept = np.asarray(previous['pq_codes'][:, alive])
+            codes = np.concatenate([kept, quantization.encode(emb[kept.shape[1]:], centroids)], axis=1)
+        else:
+            centroids = quantization.train(emb[has_emb], subspaces)
+            trained = min(live, quantization.PQ_TRAIN_ROWS)
+            codes = quantization.encode(emb, centroids)
+        return {"pq_centroids": centroids, "pq_codes": codes, "pq_trained": np.asarray([trained], dtype=np.int64)}
+
+    def _needs_merge(self):
+        if super()._needs_merge():
+            return True
+        # PQ was switched on (or resized): write codes for a base big enough to use them
+        if self.base is None or not self._pq_width(self.base['emb'].shape[1]) or self._has_codes(self.base):
+            return False
+        return int(self.base['has_emb'].sum()) >= quantization.PQ_MIN_ROWS
+
+    def _on_remap(self):
+        if self.dim is None and self.base['emb'].shape[1]:
+            self.dim = self.base['emb'].shape[1]
+        if self._has_codes(self.base):
+            # Only the re-ranked rows of the exact vectors are read
+            advise_random(self.base['emb'])
+
+    def _resident(self, name):
+        # With PQ codes only the re-ranked rows of the exact vectors are read
+        return name != 'emb' or not self._has_codes(self.base)
+
+    def band_keys(self, minhash):
+        """uint64[n, bands] LSH band keys of a [n, num_perm] hash value matrix."""
+        usable = minhash[:, :self.bands * self.band_rows].reshape(minhash.shape[0], self.bands, self.band_rows)
+        return (usable * self._multipliers).sum(axis=2, dtype=np.uint64)
+
+    def _derive(self, arrays):
+        keys = self.band_keys(arrays['minhash']).ravel()
+        order = np.argsort(keys, kind='stable')
+        return {"lsh_keys": keys[order], "lsh_pos": order // self.bands}
+
+    def _candidates(self, segment, query_keys):
+        """Positions in `segment` sharing at least one band key with the query."""
+        keys = segment['lsh_keys']
+        lo, hi = np.searchsorted(keys, query_keys, 'left'), np.searchsorted(keys, query_keys, 'right')
+        found = [segment['lsh_pos'][a:b] for a, b in zip(lo[hi > lo], hi[hi > lo])]
+        return np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+    def near_duplicates(self, minhash, k):
+        """
+        Scores only the LSH candidates of `minhash`.
+        Returns ([(text_id, jaccard), ...] best first, number of rows scored).
+        """
+        target = np.asarray(minhash.hashvalues, dtype=np.uint64)
+        query_keys = self.band_keys(target[None, :])[0]
+        with self._lock:
+            base, dead, delta = self.base, self.dead, self.delta()
+        ids, scores = [], []
+        for segment, dead_rows in ((base, dead), (delta, None)):
+            if segment is None or not len(segment['rows']):
+                continue
+            pos = self._candidates(segment, query_keys)
+            if dead_rows is not None:
+                pos = pos[~dead_rows[pos]]
+            ids.append(segment['ids'][pos])
+            scores.append((segment['minhash'][pos] == target).mean(axis=1))
+        return top_k(ids, scores, k)
+
+    def semantic(self, embedding, k):
+        """Cosine top-k over all stored embeddings. Returns ([(text_id, cosine), ...], rows scored)."""
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(query)
+        query = query / norm if norm else query
+        with self._lock:
+            base, dead, delta = self.base, self.dead, self.delta()
+        ids, scores, scored = [], [], 0
+        for segment, dead_rows in ((base, dead), (delta, None)):
+            if segment is None or not len(segment['rows']) or segment['emb'].shape[1] != query.shape[0]:
+                continue
+            if self._has_codes(segment):
+                pos, exact, count = self._semantic_pq(segment, dead_rows, query, k)
+                ids.append(segment['ids'][pos])
+                scores.append(exact)
+                scored += count
+                continue
+
+            def score(start, stop, segment=segment, dead_rows=dead_rows):
+                # One pass over the chunk of the (mapped) matrix, then keep its live top-k
+                mask = segment['has_emb'][start:stop]
+                if dead_rows is not None:
+                    mask = mask & ~dead_rows[start:stop]
+                pos = np.flatnonzero(mask)
+                chunk = (segment['emb'][start:stop] @ query)[pos]
+                if len(chunk) > k:
+                    best = np.argpartition(-chunk, k - 1)[:k]
+                    return pos[best] + start, chunk[best], len(pos)
+                return pos + start, chunk, len(pos)
+
+            for pos, chunk, count in map_chunks(score, len(segment['rows']), self.threads):
+                ids.append(segment['ids'][pos])
+                scores.append(chunk)
+                scored += count
+        return top_k(ids, scores, k, scored)
+
+    def _semantic_pq(self, segment, dead_rows, query, k):
+        """
+        Asymmetric scan of the base's PQ codes, then the best `rerank` candidates re-scored
+        on their exact (mapped) vectors. Returns (positions, exact cosines, rows scanned).
+        """
+        pair_tables = quantization.tables(query, segment['pq_centroids'])
+        keep = max(k, self.rerank)
+
+        def approximate(start, stop):
+            mask = segment['has_emb'][start:stop]
+            if dead_rows is not None:
+                mask = mask & ~dead_rows[start:stop]
+            pos = np.flatnonzero(mask)
+            chunk = quantization.scores(segment['pq_codes'][:, start:stop], pair_tables)[pos]
+            if len(chunk) > keep:
+                best = np.argpartition(-chunk, keep - 1)[:keep]
+                return pos[best] + start, chunk[best], len(pos)
+            return pos + start, chunk, len(pos)
+
+        results = map_chunks(approximate, len(segment['rows']), self.threads)
+        pos = np.concatenate([r[0] for r in results])
+        approx = np.concatenate([r[1] for r in results])
+        if len(approx) > keep:
+            pos = pos[np.argpartition(-approx, keep - 1)[:keep]]
+        pos = np.sort(pos)  # in file order for the reads
+        return pos, segment['emb'][pos] @ query, sum(r[2] for r in results)
+
+
+def top_k(ids, scores, k, scored=None):
+    """Merges per-segment (ids, scores) into ([(id, score), ...] best first, rows scored)."""
+    if not ids:
+        return [], scored or 0
+    ids, scores = np.concatenate(ids), np.concatenate(scores)
+    scored = len(scores) if scored is None else scored
+    if not len(scores):
+        return [], scored
+    top = np.argsort(-scores, kind='stable')[:k]
+    return [(str(ids[i]), float(scores[i])) for i in top], scored
@@ -4,10 +4,11 @@ import os
 
 # Ensure we can import originality.py
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-from originality import TextOriginalityRequest
 
 def main():
     parser = argparse.ArgumentParser(description="Text Originality Engine CLI")
+    parser.add_argument('--no-semantic', action='store_true',
+                        help='MinHash-only mode: skip loading the SBERT model')
     subparsers = parser.add_subparsers(dest='command', help='Commands')
 
     # Register Command
@@ -18,10 +19,18 @@ def main():
     # Check Command
     check_parser = subparsers.add_parser('check', help='Check document originality')
     check_parser.add_argument('file_path', type=str, help='Path to the text file to check')
+    check_parser.add_argument('--no-semantic', action='store_true', default=argparse.SUPPRESS,
+                              help='MinHash-only check: skip loading the SBERT model')
 
     args = parser.parse_args()
-    
-    engine = TextOriginalityRequest()
+
+    if args.command is None:
+        parser.print_help()
+        return
+
+    # Imported here so `--help` and argument errors never pay for engine imports
+    from originality import TextOriginalityRequest
+    engine = TextOriginalityRequest(semantic=not args.no_semantic)
 
     if args.command == 'register':
         if not os.path.exists(args.file_path):
@@ -39,18 +48,20 @@ def main():
             print(f"Error: File '{args.file_path}' not found.")
             return
 
-        classification, match_id, similarity = engine.check_originality(args.file_path)
-        
+        result = engine.check(args.file_path)
+        classification, match_id, similarity = result["classification"], result["match_id"], result["score"]
+
         print("-" * 30)
         print(f"CLASSIFICATION: {classification}")
         if match_id:
             print(f"CLOSEST MATCH : {match_id} (Similarity: {similarity:.2f})")
         else:
             print(f"SIMILARITY    : {similarity:.2f}")
+        for passage in result.get("passages", []):
+            (q_start, q_end), (s_start, s_end) = passage["query"], passage["source"]
+            print(f"PASSAGE       : chars {q_start}-{q_end} <- {match_id} chars {s_start}-{s_end} "
+                  f"({passage['words']} words)")
         print("-" * 30)
 
-    else:
-        parser.print_help()
-
 if __name__ == "__main__":
     main()
@@ -2,46 +2,178 @@ import os
 import sqlite3
 import re
 import pickle
-import argparse
-from datasketch import MinHash
-import docx
+import sys
+import threading
 
+import numpy as np
+
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)
+
+# Heavy dependencies (datasketch, python-docx, pypdf, torch / onnxruntime) are imported
+# lazily on first real use so CLI startup and MinHash-only checks stay fast.
 try:
-    from pypdf import PdfReader
+    from .batching import EncodeBatcher
+    from .encoders import DEFAULT_MODEL_PATH, load_encoder
+    from .index import TextIndex
+    from .winnowing import WINNOW_K, WINNOW_WINDOW, covered_words, fingerprints, passages
 except ImportError:
+    from batching import EncodeBatcher
+    from encoders import DEFAULT_MODEL_PATH, load_encoder
+    from index import TextIndex
+    from winnowing import WINNOW_K, WINNOW_WINDOW, covered_words, fingerprints, passages
+
+from common import generations, tombstones
+from common.admission import limited
+from common.digests import Duplicate, find_digest, sha256_file, sha256_text
+from common.metrics import REGISTRY, cache_result, stage, timed
+from common.warmup import prefetch_file, run_steps
+from common.writebehind import WRITE_BEHIND, WriteBehind
+
+os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE' # Workaround for some Windows OpenMP conflicts
+
+DB_PATH = os.environ.get('ORIGINALITY_DB_PATH') or os.path.join(ENGINE_ROOT, 'audioFiles', 'fingerprints.db')
+NUM_PERM = 128
+SHINGLE_SIZE = 3
+
+# Embedding inference backend: torch | torch-int8 | onnx | onnx-int8 (see encoders.py)
+ENCODER_BACKEND = os.environ.get('TEXT_ENCODER_BACKEND', 'torch')
+MODEL_PATH = os.environ.get('TEXT_MODEL_PATH', DEFAULT_MODEL_PATH)
+
+# Staged matcher: exact digest -> MinHash LSH candidates -> passage fingerprints -> SBERT
+# (each stage only if the previous ones matched nothing)
+LSH_THRESHOLD = float(os.environ.get('TEXT_LSH_THRESHOLD', '0.5'))  # below the 0.6 near-duplicate cut for recall
+TOP_K = 5
+EXACT_THRESHOLD = 0.95
+SEMANTIC_THRESHOLD = 0.85
+NEAR_DUPLICATE_THRESHOLD = 0.6
+POTENTIAL_MATCH_THRESHOLD = 0.75
+# Passage reuse: query words inside passages shared with one asset (see winnowing.py)
+PASSAGE_MIN_WORDS = int(os.environ.get('TEXT_PASSAGE_MIN_WORDS', '50'))
+MAX_POSTINGS = 1000  # fingerprints stored for more assets than this are boilerplate and ignored
+
+# Work done vs avoided by the staged matcher;
+# kind = encodes | encodes_skipped | rows_scored | rows_skipped | fingerprint_lookups
+CHECK_WORK = REGISTRY.counter(
+    'originality_text_check_work_total', 'Text check encodes and row evaluations done or skipped', ['kind'])
+CHECK_RESOLVED = REGISTRY.counter(
+    'originality_text_check_resolved_total', 'Text checks by the matcher stage that decided them', ['stage'])
+
+def _pdf_reader():
     try:
-        from PyPDF2 import PdfReader
+        from pypdf import PdfReader
     except ImportError:
-        PdfReader = None
+        try:
+            from PyPDF2 import PdfReader
+        except ImportError:
+            PdfReader = None
+    return PdfReader
 
-# SBERT Imports
-try:
-    os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE' # Workaround for some Windows OpenMP conflicts
-    from sentence_transformers import SentenceTransformer
-    from sklearn.metrics.pairwise import cosine_similarity
-    SBERT_AVAILABLE = True
-except Exception as e:
-    SBERT_AVAILABLE = False
-    print(f"Warning: Semantic Engine (SBERT/Torch) failed to load: {e}")
-    # Fallback or disable semantic features
-
-DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'audioFiles', 'fingerprints.db')
-NUM_PERM = 128
+def cosine(a, b):
+    """Cosine similarity of two 1-D vectors."""
+    denom = np.linalg.norm(a) * np.linalg.norm(b)
+    return float(np.dot(a, b) / denom) if denom else 0.0
 
 class TextOriginalityRequest:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, batching=False, max_batch_size=16, max_wait_ms=5.0,
+                 backend=ENCODER_BACKEND, model_path=MODEL_PATH, semantic=True, write_behind=WRITE_BEHIND):
         self.db_path = db_path
         self._init_db()
+        self.index = TextIndex(self.db_path, NUM_PERM, LSH_THRESHOLD)
+
+        # Optional write-behind (common/writebehind.py): registrations are acknowledged once
+        # logged and group-committed later; until then checks see them through the pending
+        # index rows, digests and these passage fingerprints, whose asset row is the record's
+        # (log, seq) key rather than a text_assets row id
+        self._pending_fingerprints = {}  # fingerprint -> [((log, seq), position, start, end)]
+        self._pending_ids = {}           # (log, seq) -> text_id
+        self.writer = WriteBehind(db_path, 'text', self._apply_records, self._on_submit,
+                                  self._on_commit, self._on_dead) if write_behind else None
         
-        self.model = None
-        if SBERT_AVAILABLE:
-            # Load SBERT model (this might take a moment on first run)
+        # The SBERT model is loaded on first use (see `model`); semantic=False gives a
+        # MinHash-only engine that never imports torch / onnxruntime.
+        self.semantic = semantic
+        self.backend = backend
+        self.model_path = model_path
+        self._model = None
+        self._model_failed = False
+        self._model_lock = threading.Lock()
+
+        # Optional micro-batching: concurrent callers share one batched encode
+        self.batching = batching
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.batcher = None
+
+    @property
+    def model(self):
+        """The embedding encoder, loaded on first access. None if semantic checks are off/unavailable."""
+        if self._model is None and self.semantic and not self._model_failed:
+            self.load_model()
+        return self._model
+
+    def load_model(self):
+        """Loads the encoder (and batcher) now. Returns True if semantic checks are available."""
+        with self._model_lock:
+            if self._model is not None or not self.semantic or self._model_failed:
+                return self._model is not None
+            # Load SBERT model from the local model directory (no network at startup)
             # Using a lightweight model for speed
             try:
-                self.model = SentenceTransformer('all-MiniLM-L6-v2') 
+                self._model = load_encoder(self.backend, self.model_path)
             except Exception as e:
-                print(f"Failed to load SBERT model: {e}")
-                self.model = None
+                print(f"Warning: Semantic Engine ({self.backend}) failed to load: {e}")
+                self._model_failed = True
+                return False
+            if self.batching:
+                self.batcher = EncodeBatcher(self._encode_batch, max_batch_size=self.max_batch_size,
+                                             max_wait_ms=self.max_wait_ms)
+            return True
+
+    def warm_up(self):
+        """
+        Warm-up steps for a freshly started server (common/warmup.py): the DB into the page
+        cache, the index refreshed and its mapped pages touched, the signatures of a sample
+        text (their first call imports datasketch) and a first encode.
+        """
+        sample = "Warm-up sample text for the signature and semantic stages of the engine. " * 4
+
+        def index():
+            conn = sqlite3.connect(self.db_path)
+            try:
+                self.index.refresh(conn, generations.active_generation(conn, 'text'))
+            finally:
+                conn.close()
+            return {"rows": len(self.index), "bytes": self.index.prefault()}
+
+        def signature():
+            self.compute_minhash(sample)
+            return {"fingerprints": len(self.compute_fingerprints(sample))}
+
+        def encode():
+            # The first encode (through the batcher, if any) is several times slower than the rest
+            semantic = self.load_model()
+            if semantic:
+                self.compute_embedding(sample)
+            return {"semantic": semantic}
+
+        return run_steps('text', [('db', lambda: {"bytes": prefetch_file(self.db_path)}), ('index', index),
+                                  ('signature', signature), ('encode', encode)])
+
+    def corpus_size(self):
+        """Number of registered text assets in the active generation (scraped as a gauge)."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM text_assets WHERE generation = ? AND deleted = 0',
+                                (generations.active_generation(conn, 'text'),)).fetchone()[0]
+        finally:
+            conn.close()
+
+    def index_params(self):
+        """Everything a stored signature depends on; recorded per generation by reindex.py."""
+        return {"num_perm": NUM_PERM, "shingle_size": SHINGLE_SIZE, "winnow_k": WINNOW_K, "winnow_window": WINNOW_WINDOW,
+                "semantic": self.semantic, "backend": self.backend, "model_path": os.path.basename(self.model_path)}
 
     def _init_db(self):
         conn = sqlite3.connect(self.db_path)
@@ -55,9 +187,40 @@ class TextOriginalityRequest:
             )
         ''')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_text_id ON text_assets(text_id)')
+        # Exact-duplicate fast path: SHA-256 of the raw upload and of the normalized text,
+        # so re-uploads are a single indexed lookup (columns added in place on older DBs)
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(text_assets)')}
+        for column in ('content_sha256', 'norm_digest'):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE text_assets ADD COLUMN {column} TEXT')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_text_content_sha256 ON text_assets(content_sha256)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_text_norm_digest ON text_assets(norm_digest)')
+        # Passage fingerprints (inverted index: fingerprint -> text_assets rows). Clustered on
+        # the fingerprint, so a lookup reads one contiguous posting list. They follow their
+        # text_assets row: deleted / generation come from it and the trigger removes them
+        # with it (compaction, reindex.py drop).
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS text_fingerprints (
+                fingerprint INTEGER NOT NULL,
+                asset_row   INTEGER NOT NULL,
+                position    INTEGER NOT NULL,
+                start_char  INTEGER NOT NULL,
+                end_char    INTEGER NOT NULL,
+                PRIMARY KEY (fingerprint, asset_row, position)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_text_fingerprints_asset ON text_fingerprints(asset_row)')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS text_fingerprints_cascade AFTER DELETE ON text_assets
+            BEGIN DELETE FROM text_fingerprints WHERE asset_row = OLD.id; END
+        ''')
+        generations.ensure_schema(conn, 'text_assets')
+        tombstones.ensure_schema(conn, 'text_assets')
         conn.commit()
         conn.close()
 
+    @limited('extract')
+    @timed('text', 'extract_text')
     def extract_text(self, file_path):
         ext = os.path.splitext(file_path)[1].lower()
         text = ""
@@ -66,10 +229,12 @@ class TextOriginalityRequest:
                 with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
                     text = f.read()
             elif ext == '.pdf':
+                PdfReader = _pdf_reader()
                 if not PdfReader: return None, "pypdf library not installed/found."
                 reader = PdfReader(file_path)
                 for page in reader.pages: text += page.extract_text() + "\n"
             elif ext == '.docx':
+                import docx
                 doc = docx.Document(file_path)
                 for para in doc.paragraphs: text += para.text + "\n"
             else:
@@ -83,7 +248,15 @@ class TextOriginalityRequest:
         text = re.sub(r'[^\w\s]', '', text)
         return text
 
-    def _get_shingles(self, text, n=3):
+    def normalized_digest(self, text):
+        """SHA-256 of the normalized text (case, punctuation and whitespace insensitive)."""
+        return sha256_text(" ".join(self._normalize(text).split()))
+
+    def _find_digest(self, conn, column, digest, limit=1):
+        """text_ids registered with this digest in the active generation, or pending registration."""
+        return find_digest(conn, 'text', 'text_assets', 'text_id', column, digest, self.writer, limit=limit)
+
+    def _get_shingles(self, text, n=SHINGLE_SIZE):
         words = text.split()
         if len(words) < n: return {text}
         shingles = set()
@@ -91,114 +264,351 @@ class TextOriginalityRequest:
             shingles.add(" ".join(words[i:i+n]))
         return shingles
 
+    @timed('text', 'compute_minhash')
     def compute_minhash(self, text):
+        from datasketch import MinHash
         m = MinHash(num_perm=NUM_PERM)
         norm_text = self._normalize(text)
         shingles = self._get_shingles(norm_text)
         for s in shingles: m.update(s.encode('utf8'))
         return m
 
+    @timed('text', 'compute_fingerprints')
+    def compute_fingerprints(self, text):
+        """Winnowed passage fingerprints: ((fingerprint, position, start, end), (word starts, word ends))."""
+        return fingerprints(text)
+
+    @limited('encode')
+    @timed('text', 'compute_embedding')
     def compute_embedding(self, text):
         """Computes the SBERT embedding for the text."""
         if not self.model: return None
         # Encode the full text (or chunks if very large, but MiniLM handles 256/512 tokens)
         # For long docs, we typically trunk or mean-pool. 
         # Here we just encode the raw text -> automatic truncation by library usually.
+        if self.batcher:
+            return self.batcher.encode(text)
         return self.model.encode(text)
 
+    def _encode_batch(self, texts):
+        """Encodes a list of texts in a single forward pass (used by the batcher)."""
+        return self.model.encode(texts, batch_size=len(texts))
+
+    def compute_record(self, file_path):
+        """All stored columns for one file, without touching the DB (used by reindex.py workers)."""
+        text, error = self.extract_text(file_path)
+        if error: return None, error
+        if not text.strip(): return None, "Extracted text is empty."
+        embedding = self.compute_embedding(text) if self.model else None
+        return {
+            "content_sha256": sha256_file(file_path),
+            "norm_digest": self.normalized_digest(text),
+            "signature": pickle.dumps(self.compute_minhash(text)),
+            "embedding": pickle.dumps(embedding) if embedding is not None else None,
+            "fingerprints": self.fingerprint_rows(text),
+        }, None
+
+    def fingerprint_rows(self, text):
+        """[(fingerprint, position, start, end)] as stored in text_fingerprints."""
+        (values, positions, starts, ends), _ = self.compute_fingerprints(text)
+        return list(zip(values.tolist(), positions.tolist(), starts.tolist(), ends.tolist()))
+
+    @staticmethod
+    def insert_record(conn, text_id, record, generation):
+        cursor = conn.execute('INSERT INTO text_assets (text_id, signature, embedding, content_sha256, norm_digest, '
+                              'generation) VALUES (?, ?, ?, ?, ?, ?)',
+                              (text_id, record["signature"], record["embedding"], record["content_sha256"],
+                               record["norm_digest"], generation))
+        asset_row = cursor.lastrowid
+        conn.executemany('INSERT OR IGNORE INTO text_fingerprints (fingerprint, asset_row, position, start_char, '
+                         'end_char) VALUES (?, ?, ?, ?, ?)',
+                         [(value, asset_row, position, start, end)
+                          for value, position, start, end in record.get("fingerprints", ())])
+        return asset_row
+
+    def _apply_records(self, conn, records):
+        """Group commit of write-behind records. Returns their text_assets row ids."""
+        generation = generations.active_generation(conn, 'text')
+        with stage('text', 'db_insert'):
+            return [self.insert_record(conn, record["text_id"], record, generation) for record in records]
+
+    def _on_submit(self, key, record):
+        # Lists are replaced, never mutated, so concurrent checks can read them unlocked
+        self.index.add_pending(key, [(None, record["text_id"], record["signature"], record["embedding"])])
+        for value, position, start, end in record["fingerprints"]:
+            self._pending_fingerprints[value] = self._pending_fingerprints.get(value, []) + [(key, position, start, end)]
+        self._pending_ids[key] = record["text_id"]
+
+    def _on_commit(self, key, record, row):
+        self.index.commit_pending(key, row)
+        self._drop_pending_passages(key, record)
+
+    def _on_dead(self, key, record):
+        self.index.drop_pending(key)
+        self._drop_pending_passages(key, record)
+
+    def _drop_pending_passages(self, key, record):
+        for value in {fingerprint[0] for fingerprint in record["fingerprints"]}:
+            postings = [p for p in self._pending_fingerprints.get(value, ()) if p[0] != key]
+            if postings:
+                self._pending_fingerprints[value] = postings
+            else:
+                self._pending_fingerprints.pop(value, None)
+        self._pending_ids.pop(key, None)
+
+    def find_exact(self, file_path):
+        """text_id of a registered asset with the same bytes or normalized text, else None (cluster routers)."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            existing = self._find_digest(conn, 'content_sha256', sha256_file(file_path))
+            if not existing:
+                text, error = self.extract_text(file_path)
+                if error or not text.strip():
+                    return None
+                existing = self._find_digest(conn, 'norm_digest', self.normalized_digest(text))
+        finally:
+            conn.close()
+        return existing[0] if existing else None
+
     def register_text(self, file_path, text_id):
+        # Exact re-uploads are rejected before extraction / MinHash / encoding
+        try:
+            content_digest = sha256_file(file_path)
+        except OSError as e:
+            return False, f"Error reading file: {e}"
+        conn = sqlite3.connect(self.db_path)
+        try:
+            existing = self._find_digest(conn, 'content_sha256', content_digest)
+        finally:
+            conn.close()
+        if existing:
+            return False, Duplicate(f"Exact duplicate of registered text asset {existing[0]}", existing[0])
+
         text, error = self.extract_text(file_path)
         if error: return False, error
         if not text.strip(): return False, "Extracted text is empty."
 
+        norm_digest = self.normalized_digest(text)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            existing = self._find_digest(conn, 'norm_digest', norm_digest)
+        finally:
+            conn.close()
+        if existing:
+            return False, Duplicate(f"Exact duplicate (same text) of registered text asset {existing[0]}",
+                                    existing[0])
+
         # 1. MinHash
         minhash = self.compute_minhash(text)
         signature_blob = pickle.dumps(minhash)
 
-        # 2. Embedding
+        # 2. Passage fingerprints
+        fingerprint_rows = self.fingerprint_rows(text)
+
+        # 3. Embedding
         embedding_blob = None
         if self.model:
             emb = self.compute_embedding(text)
             embedding_blob = pickle.dumps(emb)
 
+        record = {"text_id": text_id, "signature": signature_blob, "embedding": embedding_blob,
+                  "content_sha256": content_digest, "norm_digest": norm_digest, "fingerprints": fingerprint_rows}
+        message = f"Registered text asset {text_id} (SBERT: {'Yes' if embedding_blob else 'No'})"
+        if self.writer:
+            try:
+                self.writer.submit(record)  # durable in the log; committed to the DB shortly
+            except Exception as e:
+                return False, f"Write-behind log error: {e}"
+            return True, message
+
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         try:
-            cursor.execute('INSERT INTO text_assets (text_id, signature, embedding) VALUES (?, ?, ?)', 
-                           (text_id, signature_blob, embedding_blob))
-            conn.commit()
-            return True, f"Registered text asset {text_id} (SBERT: {'Yes' if embedding_blob else 'No'})"
+            with stage('text', 'db_insert'):
+                self.insert_record(conn, text_id, record, generations.active_generation(conn, 'text'))
+                conn.commit()
+            return True, message
         except Exception as e:
             return False, f"Database error: {e}"
         finally:
             conn.close()
 
-    def check_originality(self, file_path):
-        text, error = self.extract_text(file_path)
-        if error: return "ERROR", None, 0.0
-        if not text.strip(): return "ERROR: Empty Text", None, 0.0
+    def delete_text(self, text_id):
+        """Tombstones every stored row of `text_id`; checks stop matching it immediately."""
+        if self.writer:
+            self.writer.flush()  # so its pending rows are in the table to tombstone
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                deleted = tombstones.tombstone(conn, 'text', 'text_assets', 'text_id', [text_id])
+        except Exception as e:
+            return False, f"Database error: {e}"
+        finally:
+            conn.close()
+        if not deleted:
+            return False, f"Text asset {text_id} not found"
+        rows, max_row = deleted[text_id]
+        self.index.remove(text_id, max_row)
+        return True, f"Deleted text asset {text_id} ({rows} rows)"
+
+    def _matches(self, scored, key):
+        return [{"id": text_id, key: round(score, 4)} for text_id, score in scored]
 
-        # Phase 1: MinHash Check (Fast)
+    def check(self, file_path, top_k=TOP_K):
+        """
+        Staged, cost-ordered check. Each stage runs only if the cheaper ones found nothing:
+          1. exact   - indexed lookup of the raw-bytes digest (before extraction), then of
+                       the normalized-text digest
+          2. minhash - LSH candidates scored by Jaccard (near duplicates)
+          3. passage - one indexed lookup per winnowed fingerprint (copied passages)
+          4. semantic- SBERT encode + cosine top-k (paraphrases)
+        Returns a dict with classification, match_id, score, the deciding stage and top-k
+        matches; passage matches also carry the copied `passages` of the best asset.
+        """
+        try:
+            content_digest = sha256_file(file_path)
+        except OSError:
+            return {"classification": "ERROR", "match_id": None, "score": 0.0, "stage": None, "matches": []}
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            exact = self._find_digest(conn, 'content_sha256', content_digest, top_k)
+            cache_result('text_content_digest', bool(exact))
+            if not exact:
+                text, error = self.extract_text(file_path)
+                if error:
+                    return {"classification": "ERROR", "match_id": None, "score": 0.0, "stage": None, "matches": []}
+                if not text.strip():
+                    return {"classification": "ERROR: Empty Text", "match_id": None, "score": 0.0, "stage": None,
+                            "matches": []}
+                exact = self._find_digest(conn, 'norm_digest', self.normalized_digest(text), top_k)
+                cache_result('text_exact_digest', bool(exact))
+                if not exact:
+                    with stage('text', 'db_fetch'):
+                        if self.writer:
+                            self.writer.refresh_foreign()  # other processes' pending records
+                        self.index.refresh(conn, generations.active_generation(conn, 'text'))
+        finally:
+            conn.close()
+        rows = len(self.index)
+        # Read the flags, not self.model: the early exits below must not load the encoder
+        semantic_on = self.semantic and not self._model_failed
+
+        if exact:
+            self._count(stage_name='exact', rows_scored=0, rows=rows, encoded=False, semantic_on=semantic_on)
+            return {"classification": "DUPLICATE (Exact)", "match_id": exact[0], "score": 1.0, "stage": "exact",
+                    "matches": [{"id": tid, "minhash": 1.0} for tid in exact]}
+
+        # Stage 2: near duplicates among the LSH candidates only
         target_minhash = self.compute_minhash(text)
-        
-        # Phase 2: Embedding Check (Semantic)
-        target_embedding = None
-        if self.model:
-            target_embedding = self.compute_embedding(text)
+        with stage('text', 'scoring'):
+            near, scored = self.index.near_duplicates(target_minhash, top_k)
+        if near and near[0][1] > NEAR_DUPLICATE_THRESHOLD:
+            best_id, best = near[0]
+            classification = "DUPLICATE (Exact)" if best > EXACT_THRESHOLD else "NEAR DUPLICATE (Edited)"
+            self._count(stage_name='minhash', rows_scored=scored, rows=rows, encoded=False, semantic_on=semantic_on)
+            return {"classification": classification, "match_id": best_id, "score": best, "stage": "minhash",
+                    "matches": self._matches(near, "minhash")}
+        best_mh = near[0][1] if near else 0.0
+
+        # Stage 3: passage reuse, i.e. partial copies whose MinHash the rest of the document dilutes
+        reused, words, lookups = self.passage_matches(text, top_k)
+        if reused and reused[0]["words"] >= PASSAGE_MIN_WORDS:
+            self._count(stage_name='passage', rows_scored=scored, rows=rows, encoded=False, semantic_on=semantic_on,
+                        lookups=lookups)
+            return {"classification": "PARTIAL DUPLICATE (Copied Passages)", "match_id": reused[0]["id"],
+                    "score": round(reused[0]["words"] / words, 4), "stage": "passage",
+                    "matches": [{"id": m["id"], "passage": round(m["words"] / words, 4), "words": m["words"]}
+                                for m in reused],
+                    "passages": reused[0]["passages"]}
 
+        # Stage 4: semantic search, only when nothing cheaper matched (first use loads the encoder)
+        if not semantic_on or self.model is None:
+            self._count(stage_name='minhash', rows_scored=scored, rows=rows, encoded=False, semantic_on=False,
+                        lookups=lookups)
+            return {"classification": "ORIGINAL", "match_id": None, "score": best_mh, "stage": "minhash",
+                    "matches": self._matches(near, "minhash")}
+
+        target_embedding = self.compute_embedding(text)
+        with stage('text', 'scoring'):
+            similar, sem_scored = self.index.semantic(target_embedding, top_k)
+        self._count(stage_name='semantic', rows_scored=scored + sem_scored, rows=rows, encoded=True, semantic_on=True,
+                    lookups=lookups)
+        best_sem = similar[0][1] if similar else 0.0
+        result = {"match_id": similar[0][0] if similar else None, "score": best_sem,
+                  "stage": "semantic", "matches": self._matches(similar, "semantic")}
+        if best_sem > SEMANTIC_THRESHOLD:
+            return dict(result, classification="SEMANTIC DUPLICATE (AI/Paraphrased)")
+        # Fallback: moderate semantic similarity (0.75-0.85) is flagged for review
+        if best_sem > POTENTIAL_MATCH_THRESHOLD:
+            return dict(result, classification="POTENTIAL SEMANTIC MATCH")
+        return dict(result, classification="ORIGINAL", match_id=None, score=max(best_mh, best_sem))
+
+    def passage_matches(self, text, top_k=TOP_K):
+        """
+        Assets sharing copied passages with `text`: one indexed lookup per distinct
+        fingerprint, then each asset's shared fingerprints chained into passages.
+        Returns ([{"id", "words", "passages"}] most copied words first, query words, lookups);
+        a passage is {"query": [start, end], "source": [start, end], "words": n} with
+        character offsets into the query and the registered text.
+        """
+        (values, positions, _, _), (word_starts, word_ends) = self.compute_fingerprints(text)
+        query = {}
+        for value, position in zip(values.tolist(), positions.tolist()):
+            query.setdefault(value, []).append(position)
+        shared = {}
+        # Write-behind records not committed yet, read before the table (see common.digests.find_digest)
+        pending_ids = dict(self._pending_ids)
+        for value, query_positions in query.items():
+            for asset_row, position, start, end in self._pending_fingerprints.get(value, ()):
+                shared.setdefault(asset_row, []).extend((q, position, start, end) for q in query_positions)
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT text_id, signature, embedding FROM text_assets')
-        rows = cursor.fetchall()
-        conn.close()
+        try:
+            with stage('text', 'passage_lookup'):
+                for value, query_positions in query.items():
+                    rows = conn.execute('SELECT asset_row, position, start_char, end_char FROM text_fingerprints '
+                                        'WHERE fingerprint = ? LIMIT ?', (value, MAX_POSTINGS + 1)).fetchall()
+                    if len(rows) > MAX_POSTINGS:
+                        continue
+                    for asset_row, position, start, end in rows:
+                        shared.setdefault(asset_row, []).extend((q, position, start, end) for q in query_positions)
+                live = self._live_rows(conn, [row for row in shared if not isinstance(row, tuple)])
+        finally:
+            conn.close()
+        live.update((row, text_id) for row, text_id in pending_ids.items() if row in shared)
 
-        max_mh_sim = 0.0
-        max_sem_sim = 0.0
-        best_match_id = None
-        match_type = "ORIGINAL"
+        best = {}
+        for asset_row, text_id in live.items():
+            spans = passages(shared[asset_row])
+            words = covered_words([(first, end) for first, end, _, _ in spans])
+            if words and words > best.get(text_id, {"words": 0})["words"]:
+                best[text_id] = {"id": text_id, "words": words, "passages": [
+                    {"query": [int(word_starts[first]), int(word_ends[end - 1])], "source": [start, end_char],
+                     "words": end - first} for first, end, start, end_char in spans]}
+        reused = sorted(best.values(), key=lambda m: (-m["words"], m["id"]))[:top_k]
+        return reused, len(word_starts), len(query)
 
-        for tid, sig_blob, emb_blob in rows:
-            # Check MinHash
-            try:
-                stored_minhash = pickle.loads(sig_blob)
-                mh_sim = target_minhash.jaccard(stored_minhash)
-                if mh_sim > max_mh_sim:
-                    max_mh_sim = mh_sim
-                    if mh_sim > 0.95: # Exact match found, stop
-                         best_match_id = tid
-                         # match_type = "DUPLICATE (Exact)" 
-                         # We finalize types below
-            except Exception: pass
-
-            # Check Semantic (if available and needed)
-            if target_embedding is not None and emb_blob is not None:
-                try:
-                    stored_emb = pickle.loads(emb_blob)
-                    # Reshape for sklearn
-                    sem_sim = cosine_similarity([target_embedding], [stored_emb])[0][0]
-                    if sem_sim > max_sem_sim:
-                        max_sem_sim = sem_sim
-                        # semantic match might override minhash match if stronger
-                        if max_mh_sim < 0.9: # Only if not already exact
-                            best_match_id = tid
-                except Exception: pass
-
-        # Logic to combine scores
-        # Priority: Exact (MinHash > 0.95) > Semantic (>0.85) > Near Duplicate (MinHash > 0.6)
-        
-        final_score = max_mh_sim
-        
-        if max_mh_sim > 0.95:
-            return "DUPLICATE (Exact)", best_match_id, max_mh_sim
-        
-        if max_sem_sim > 0.85:
-             return "SEMANTIC DUPLICATE (AI/Paraphrased)", best_match_id, max_sem_sim
-        
-        if max_mh_sim > 0.6:
-            return "NEAR DUPLICATE (Edited)", best_match_id, max_mh_sim
-            
-        # Fallback: if semantic is moderate (0.7-0.85), maybe flag?
-        if max_sem_sim > 0.75:
-            return "POTENTIAL SEMANTIC MATCH", best_match_id, max_sem_sim
-
-        return "ORIGINAL", None, max(max_mh_sim, max_sem_sim)
+    def _live_rows(self, conn, asset_rows):
+        """{text_assets row: text_id} of the rows still live in the active generation."""
+        generation = generations.active_generation(conn, 'text')
+        live = {}
+        for i in range(0, len(asset_rows), 500):
+            chunk = asset_rows[i:i + 500]
+            live.update(conn.execute(f'SELECT id, text_id FROM text_assets WHERE id IN ({",".join("?" * len(chunk))}) '
+                                     'AND generation = ? AND deleted = 0', (*chunk, generation)).fetchall())
+        return live
+
+    def _count(self, stage_name, rows_scored, rows, encoded, semantic_on, lookups=0):
+        """Records which stage decided the check and the work it avoided vs a full two-pass scan."""
+        CHECK_RESOLVED.labels(stage=stage_name).inc()
+        CHECK_WORK.labels(kind='fingerprint_lookups').inc(lookups)
+        # The unstaged matcher scored every row with MinHash and, when semantic, with SBERT too
+        full_scan = rows * (2 if semantic_on else 1)
+        CHECK_WORK.labels(kind='rows_scored').inc(rows_scored)
+        CHECK_WORK.labels(kind='rows_skipped').inc(max(full_scan - rows_scored, 0))
+        if semantic_on:
+            CHECK_WORK.labels(kind='encodes' if encoded else 'encodes_skipped').inc()
+
+    def check_originality(self, file_path):
+        """Returns (classification, closest_match_id, score); see `check` for top-k matches."""
+        result = self.check(file_path)
+        return result["classification"], result["match_id"], result["score"]
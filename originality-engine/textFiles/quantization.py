@@ -0,0 +1,92 @@
+import os
+
+import numpy as np
+
+# Product quantisation (Jégou, Douze & Schmid, "Product quantization for nearest neighbor
+# search") of the SBERT embeddings in the base index segment. Each embedding is split into
+# PQ_SUBSPACES equal sub-vectors and each sub-vector is replaced by the id of its nearest
+# of 256 centroids (one byte), trained by k-means on a sample of the stored embeddings.
+# A query is scored against the codes asymmetrically: its exact sub-vectors are dotted
+# with every centroid once (a lookup table), and a row's approximate cosine is the sum of
+# its codes' table entries. The best candidates are then re-ranked on the exact vectors.
+#
+# Codes are stored in subspace pairs, one uint16 per pair and row ([subspaces / 2, rows]),
+# so scoring does one gather per pair from a 65536-entry table (the sum of both subspaces'
+# tables): half the gathers of one per subspace, from a table that still fits in L2.
+
+PQ_SUBSPACES = int(os.environ.get('TEXT_PQ_SUBSPACES', '0'))  # 0: exact float32 scan only
+PQ_RERANK = int(os.environ.get('TEXT_PQ_RERANK', '200'))
+PQ_TRAIN_ROWS = int(os.environ.get('TEXT_PQ_TRAIN_ROWS', '10000'))
+PQ_MIN_ROWS = int(os.environ.get('TEXT_PQ_MIN_ROWS', '4096'))  # smaller bases are scanned exactly
+CENTROIDS = 256
+KMEANS_ITERATIONS = 12
+PQ_SEED = 1
+
+
+def subspaces_for(dim, requested=PQ_SUBSPACES):
+    """The largest even subspace count <= `requested` that divides `dim` (0 if none)."""
+    for m in range(requested - requested % 2, 0, -2):
+        if dim and dim % m == 0:
+            return m
+    return 0
+
+
+def kmeans(x, k, iterations, rng):
+    """Lloyd's k-means on float32[n, d]; empty clusters keep their previous centroid."""
+    centroids = x[rng.choice(len(x), k, replace=False)].copy()
+    sq = (x * x).sum(axis=1)
+    for _ in range(iterations):
+        assign = nearest(x, centroids, sq)
+        counts = np.bincount(assign, minlength=k)
+        filled = counts > 0
+        for d in range(x.shape[1]):
+            sums = np.bincount(assign, weights=x[:, d], minlength=k)
+            centroids[filled, d] = sums[filled] / counts[filled]
+    return centroids
+
+
+def nearest(x, centroids, sq=None):
+    """Index of the nearest centroid (squared L2) of every row of `x`."""
+    sq = (x * x).sum(axis=1) if sq is None else sq
+    return (sq[:, None] - 2 * (x @ centroids.T) + (centroids * centroids).sum(axis=1)[None]).argmin(axis=1)
+
+
+def train(vectors, subspaces, sample=PQ_TRAIN_ROWS, seed=PQ_SEED):
+    """float32[subspaces, 256, dim / subspaces] codebooks from (a sample of) `vectors`."""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[np.sort(rng.choice(len(vectors), sample, replace=False))]
+    vectors = np.asarray(vectors, dtype=np.float32)
+    width = vectors.shape[1] // subspaces
+    return np.stack([kmeans(np.ascontiguousarray(vectors[:, j * width:(j + 1) * width]), CENTROIDS,
+                            KMEANS_ITERATIONS, rng) for j in range(subspaces)])
+
+
+def encode(vectors, centroids, block=65536):
+    """uint16[subspaces / 2, n] paired codes of float32[n, dim] `vectors`."""
+    subspaces, _, width = centroids.shape
+    codes = np.empty((subspaces // 2, len(vectors)), dtype=np.uint16)
+    for start in range(0, len(vectors), block):
+        chunk = np.asarray(vectors[start:start + block], dtype=np.float32)
+        for pair in range(subspaces // 2):
+            high, low = (nearest(chunk[:, j * width:(j + 1) * width], centroids[j]).astype(np.uint16)
+                         for j in (2 * pair, 2 * pair + 1))
+            codes[pair, start:start + len(chunk)] = (high << 8) | low
+    return codes
+
+
+def tables(query, centroids):
+    """float32[subspaces / 2, 65536] pair lookup tables: query . centroid summed over both subspaces."""
+    subspaces, _, width = centroids.shape
+    single = np.einsum('jkd,jd->jk', centroids, query.reshape(subspaces, width))
+    return (single[0::2, :, None] + single[1::2, None, :]).reshape(subspaces // 2, CENTROIDS * CENTROIDS)
+
+
+def scores(codes, pair_tables):
+    """Approximate cosines of the rows of paired `codes` (uint16[pairs, n])."""
+    total = np.zeros(codes.shape[1], dtype=np.float32)
+    scratch = np.empty(codes.shape[1], dtype=np.float32)
+    for pair in range(codes.shape[0]):
+        np.take(pair_tables[pair], codes[pair], out=scratch)
+        total += scratch
+    return total
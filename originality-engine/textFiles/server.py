@@ -1,13 +1,26 @@
 import os
 import sys
+import uuid
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from originality import TextOriginalityRequest
+from originality import PASSAGE_MIN_WORDS, TextOriginalityRequest
+from common.admission import Overloaded, install_admission, overloaded_response
+from common.digests import Duplicate
+from common.metrics import REGISTRY, instrument_app
+from common.profiling import admin_refusal, install_profiling
+from common.tombstones import start_compactor
+from common.warmup import install_warmup
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
+PORT = int(os.environ.get('TEXT_PORT', '5002'))  # one node per port in cluster mode (common/cluster.py)
 ALLOWED_EXTENSIONS = {'txt', 'pdf', 'docx'}
 
+# SBERT micro-batching (concurrent /check and /register requests share one encode call)
+BATCHING_ENABLED = os.environ.get('TEXT_BATCHING', '1') != '0'
+BATCH_MAX_SIZE = int(os.environ.get('TEXT_BATCH_MAX_SIZE', '16'))
+BATCH_MAX_WAIT_MS = float(os.environ.get('TEXT_BATCH_MAX_WAIT_MS', '5'))
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for all routes
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
@@ -18,8 +31,31 @@ os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 # Initialize Engine
 # Note: This might take a moment to load SBERT model
 print("Initializing Text Originality Engine...")
-engine = TextOriginalityRequest()
-print("Engine initialized.")
+engine = TextOriginalityRequest(batching=BATCHING_ENABLED,
+                                max_batch_size=BATCH_MAX_SIZE,
+                                max_wait_ms=BATCH_MAX_WAIT_MS,
+                                semantic=os.environ.get('TEXT_SEMANTIC', '1') != '0')
+# The engine loads its model lazily; a long-running server pays that cost up front instead
+engine.load_model()
+print(f"Engine initialized (semantic: {'Yes' if engine.model else 'No'}).")
+
+# Metrics: request latency / in-flight via instrument_app, stage histograms from the engine,
+# plus scrape-time gauges for corpus size and the encode batcher
+instrument_app(app, 'text')
+install_profiling(app, 'text')
+install_admission(app, 'text')
+install_warmup(app, 'text', engine.warm_up)
+start_compactor(engine.db_path, ('text_assets',))
+REGISTRY.gauge_fn('originality_text_corpus_size', 'Registered text assets', engine.corpus_size)
+
+def _batcher_stat(key):
+    return lambda: engine.batcher.stats()[key] if engine.batcher else None
+
+REGISTRY.gauge_fn('originality_encoder_queue_depth', 'Texts waiting for a batched encode', _batcher_stat('queue_depth'))
+REGISTRY.gauge_fn('originality_encoder_batches_total', 'Batched encode calls', _batcher_stat('batches'), kind='counter')
+REGISTRY.gauge_fn('originality_encoder_items_total', 'Texts encoded through the batcher', _batcher_stat('items'), kind='counter')
+REGISTRY.gauge_fn('originality_encoder_avg_batch_size', 'Mean texts per batched encode', _batcher_stat('avg_batch_size'))
+REGISTRY.gauge_fn('originality_encoder_avg_wait_ms', 'Mean time a text waits for its batch', _batcher_stat('avg_wait_ms'))
 
 def allowed_file(filename):
     return '.' in filename and \
@@ -27,7 +63,14 @@ def allowed_file(filename):
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    return jsonify({"status": "healthy", "service": "text-originality-engine"})
+    return jsonify({"status": "healthy", "service": "text-originality-engine",
+                    "semantic": engine.model is not None, "corpus_size": engine.corpus_size()})
+
+@app.route('/stats', methods=['GET'])
+def stats():
+    # Encoder batching metrics: queue depth, batch sizes, wait times
+    encoder = engine.batcher.stats() if engine.batcher else None
+    return jsonify({"service": "text-originality-engine", "encoder_batcher": encoder})
 
 @app.route('/register', methods=['POST'])
 def register_text():
@@ -45,7 +88,7 @@ def register_text():
         return jsonify({"error": "No selected file"}), 400
 
     if file and allowed_file(file.filename):
-        filename = f"temp_register_{asset_id}_{file.filename}"
+        filename = f"temp_register_{asset_id}_{uuid.uuid4().hex}_{file.filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         try:
             file.save(filepath)
@@ -58,9 +101,15 @@ def register_text():
             
             if success:
                 return jsonify({"success": True, "message": msg, "id": asset_id}), 200
+            elif isinstance(msg, Duplicate):
+                return jsonify({"success": False, "error": msg, "match_id": msg.match_id}), 409
             else:
                 return jsonify({"success": False, "error": msg}), 500
-                
+
+        except Overloaded as e:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return overloaded_response(e)
         except Exception as e:
             if os.path.exists(filepath):
                 os.remove(filepath)
@@ -68,6 +117,38 @@ def register_text():
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+@app.route('/exact', methods=['POST'])
+def exact_text():
+    # Exact-duplicate lookup only; a cluster router asks every partition before registering
+    if 'file' not in request.files:
+        return jsonify({"error": "No file part"}), 400
+
+    file = request.files['file']
+    if not allowed_file(file.filename):
+        return jsonify({"error": "File type not allowed"}), 400
+
+    filepath = os.path.join(app.config['UPLOAD_FOLDER'], f"temp_exact_{uuid.uuid4().hex}_{file.filename}")
+    try:
+        file.save(filepath)
+        return jsonify({"match_id": engine.find_exact(filepath)}), 200
+    finally:
+        if os.path.exists(filepath):
+            os.remove(filepath)
+
+@app.route('/delete', methods=['POST'])
+def delete_text():
+    refusal = admin_refusal(request)
+    if refusal:
+        return refusal
+    asset_id = request.form.get('id')
+    if not asset_id:
+        return jsonify({"error": "Missing 'id' parameter"}), 400
+
+    success, msg = engine.delete_text(asset_id)
+    if success:
+        return jsonify({"success": True, "message": msg, "id": asset_id}), 200
+    return jsonify({"success": False, "error": msg}), 404
+
 @app.route('/check', methods=['POST'])
 def check_text():
     # Check if file is present
@@ -79,13 +160,14 @@ def check_text():
         return jsonify({"error": "No selected file"}), 400
 
     if file and allowed_file(file.filename):
-        filename = f"temp_check_{file.filename}"
+        filename = f"temp_check_{uuid.uuid4().hex}_{file.filename}"
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         try:
             file.save(filepath)
             
             # Check originality
-            classification, match_id, similarity = engine.check_originality(filepath)
+            result = engine.check(filepath)
+            classification, match_id, similarity = result["classification"], result["match_id"], result["score"]
             
             # Cleanup
             os.remove(filepath)
@@ -93,20 +175,28 @@ def check_text():
             # Binary Classification Logic
             status = "Original" if classification == "ORIGINAL" else "Duplicate"
 
-            result = {
+            response = {
                 "status": status,
                 "detailed_classification": classification,
                 "closest_match_id": match_id,
                 "similarity_score": round(float(similarity), 4),
+                "matched_by": result["stage"],
+                "matches": result["matches"],
+                "passages": result.get("passages", []),
                 "criteria": {
                     "duplicate_exact_threshold": 0.95,
                     "semantic_duplicate_threshold": 0.85,
                     "near_duplicate_threshold": 0.60,
-                    "potential_match_threshold": 0.75
+                    "potential_match_threshold": 0.75,
+                    "passage_min_words": PASSAGE_MIN_WORDS
                 }
             }
-            return jsonify(result), 200
+            return jsonify(response), 200
 
+        except Overloaded as e:
+            if os.path.exists(filepath):
+                os.remove(filepath)
+            return overloaded_response(e)
         except Exception as e:
             if os.path.exists(filepath):
                 os.remove(filepath)
@@ -117,5 +207,5 @@ def check_text():
 
 if __name__ == '__main__':
     # Run on port 5002 to avoid conflicts
-    print("Starting server on port 5002...")
-    app.run(host='0.0.0.0', port=5002, debug=True, use_reloader=False)
+    print(f"Starting server on port {PORT}...")
+    app.run(host='0.0.0.0', port=PORT, debug=True, use_reloader=False)
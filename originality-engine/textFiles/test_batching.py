@@ -0,0 +1,91 @@
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from batching import EncodeBatcher
+
+
+def upper_fn(calls):
+    def encode(texts):
+        calls.append(list(texts))
+        return [t.upper() for t in texts]
+    return encode
+
+
+def test_coalesces_concurrent_submits():
+    calls = []
+    batcher = EncodeBatcher(upper_fn(calls), max_batch_size=8, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(f"t{i}") for i in range(5)]
+        assert [f.result(timeout=5) for f in futures] == [f"T{i}" for i in range(5)]
+        assert calls == [[f"t{i}" for i in range(5)]]
+        assert batcher.stats()["batches"] == 1
+    finally:
+        batcher.close()
+
+
+def test_splits_at_max_batch_size():
+    calls = []
+    batcher = EncodeBatcher(upper_fn(calls), max_batch_size=2, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(f"t{i}") for i in range(5)]
+        assert [f.result(timeout=5) for f in futures] == [f"T{i}" for i in range(5)]
+        assert [len(c) for c in calls] == [2, 2, 1]
+    finally:
+        batcher.close()
+
+
+def test_encode_error_reaches_every_caller():
+    def boom(texts):
+        raise ValueError("model exploded")
+
+    batcher = EncodeBatcher(boom, max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(f"t{i}") for i in range(3)]
+        for f in futures:
+            with pytest.raises(ValueError, match="model exploded"):
+                f.result(timeout=5)
+        # The worker survives a failed batch
+        batcher.encode_fn = upper_fn([])
+        assert batcher.encode("ok", timeout=5) == "OK"
+    finally:
+        batcher.close()
+
+
+@pytest.mark.parametrize("returned", [["A"], ["A", "B", "C", "D"]])
+def test_wrong_vector_count_fails_every_caller(returned):
+    batcher = EncodeBatcher(lambda texts: returned, max_batch_size=4, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(t) for t in ("a", "b", "c")]
+        for f in futures:
+            with pytest.raises(RuntimeError, match="3 texts"):
+                f.result(timeout=5)
+    finally:
+        batcher.close()
+
+
+def test_encode_timeout():
+    release = threading.Event()
+
+    def slow(texts):
+        release.wait(5)
+        return list(texts)
+
+    batcher = EncodeBatcher(slow, max_batch_size=1, max_wait_ms=0)
+    try:
+        with pytest.raises(TimeoutError):
+            batcher.encode("late", timeout=0.05)
+    finally:
+        release.set()
+        batcher.close()
+
+
+def test_close_drains_queue_and_rejects_new_work():
+    calls = []
+    batcher = EncodeBatcher(upper_fn(calls), max_batch_size=8, max_wait_ms=1000)
+    future = batcher.submit("queued")
+    batcher.close()
+    assert future.result(timeout=5) == "QUEUED"
+    with pytest.raises(RuntimeError, match="closed"):
+        batcher.submit("late")
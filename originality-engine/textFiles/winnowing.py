@@ -0,0 +1,144 @@
+import os
+
+import numpy as np
+
+# Winnowing (Schleimer, Wilkerson & Aiken, "Winnowing: local algorithms for document
+# fingerprinting"): hash every run of WINNOW_K consecutive words, then keep the smallest
+# hash of every WINNOW_WINDOW consecutive k-grams. Any passage two documents share of at
+# least WINNOW_K + WINNOW_WINDOW - 1 words yields at least one common fingerprint, and a
+# document keeps only about 2 / (WINNOW_WINDOW + 1) fingerprints per word.
+#
+# Words are runs of \w characters compared case-insensitively, so punctuation, case and
+# whitespace changes do not break a passage. Each fingerprint keeps its word position and the
+# character span of its k-gram in the text, which is what matched spans are reported in.
+
+WINNOW_K = int(os.environ.get('TEXT_WINNOW_K', '5'))
+WINNOW_WINDOW = int(os.environ.get('TEXT_WINNOW_WINDOW', '8'))
+HASH_SEED = 1
+
+# Word hashes are polynomial hashes of the case-folded code points, computed for the whole
+# text at once from prefix sums (mod 2^64); BASE is odd, so it is invertible
+BASE = 0x100000001b3
+BASE_INVERSE = pow(BASE, -1, 1 << 64)
+# Odd 64-bit multipliers combining the word hashes of a k-gram (wrapping arithmetic)
+_MULTIPLIERS = np.random.default_rng(HASH_SEED).integers(
+    1, 2 ** 63, size=64, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+
+
+def _fold(ch):
+    """Case-folded code point of `ch` (lower case where folding gives several characters)."""
+    for folded in (ch.casefold(), ch.lower()):
+        if len(folded) == 1:
+            return ord(folded)
+    return ord(ch)
+
+
+def _powers(base, n):
+    powers = np.full(n, base, dtype=np.uint64)
+    powers[0] = 1
+    return np.cumprod(powers, dtype=np.uint64)
+
+
+def tokenize(text):
+    """
+    (uint64 hash, start offset, end offset) arrays of the words of `text`: the runs of
+    characters matched by \\w, compared case-insensitively.
+    """
+    codes = np.frombuffer(text.encode('utf-32-le', 'surrogatepass'), dtype=np.uint32)
+    if not len(codes):
+        return np.zeros(0, dtype=np.uint64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    # Per code point lookup tables, filled for the characters the text uses
+    word_table = np.zeros(int(codes.max()) + 1, dtype=bool)
+    fold_table = np.zeros(len(word_table), dtype=np.uint64)
+    for code in np.flatnonzero(np.bincount(codes)).tolist():
+        ch = chr(code)
+        word_table[code] = ch.isalnum() or ch == '_'
+        fold_table[code] = _fold(ch) + 1
+    edges = np.diff(word_table[codes].astype(np.int8), prepend=0, append=0)
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    with np.errstate(over='ignore'):
+        prefix = np.zeros(len(codes) + 1, dtype=np.uint64)
+        np.cumsum(fold_table[codes] * _powers(BASE, len(codes)), dtype=np.uint64, out=prefix[1:])
+        hashes = (prefix[ends] - prefix[starts]) * _powers(BASE_INVERSE, len(codes))[starts]
+        return _mix(hashes), starts, ends
+
+
+def _mix(x):
+    """splitmix64 finaliser, so hashes are uniformly distributed for the minimum."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+
+def kgram_hashes(word_hashes, k=WINNOW_K):
+    """uint64 hash of every run of `k` consecutive words (len(word_hashes) - k + 1 of them)."""
+    n = len(word_hashes) - k + 1
+    if n <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    combined = np.zeros(n, dtype=np.uint64)
+    with np.errstate(over='ignore'):
+        for j in range(k):
+            combined += word_hashes[j:j + n] * _MULTIPLIERS[j]
+        return _mix(combined)
+
+
+def winnow(hashes, window=WINNOW_WINDOW):
+    """Positions selected by winnowing: the rightmost minimum of every `window` consecutive hashes."""
+    if not len(hashes):
+        return np.zeros(0, dtype=np.int64)
+    if len(hashes) <= window:
+        return np.asarray([len(hashes) - 1 - int(np.argmin(hashes[::-1]))], dtype=np.int64)
+    windows = np.lib.stride_tricks.sliding_window_view(hashes, window)
+    selected = window - 1 - np.argmin(windows[:, ::-1], axis=1) + np.arange(len(windows))
+    # Consecutive windows sharing their minimum record it once
+    return np.unique(selected)
+
+
+def fingerprints(text, k=WINNOW_K, window=WINNOW_WINDOW):
+    """
+    Winnowed fingerprints of `text` as (fingerprint, word position, start, end) int64
+    arrays, where start / end is the character span of the fingerprinted k-gram, plus
+    the (start, end) character offsets of every word. Fingerprints are signed so they
+    fit an SQLite INTEGER.
+    """
+    word_hashes, starts, ends = tokenize(text)
+    hashes = kgram_hashes(word_hashes, k)
+    positions = winnow(hashes, window)
+    kgram_ends = ends[positions + k - 1] if len(positions) else positions
+    return (hashes[positions].view(np.int64), positions, starts[positions], kgram_ends), (starts, ends)
+
+
+def passages(matches, k=WINNOW_K, window=WINNOW_WINDOW, min_fingerprints=2):
+    """
+    Chains the fingerprints one stored document shares with the query into passages
+    copied in order. `matches` is [(query position, stored position, stored start,
+    stored end)]; inside a copied passage consecutive fingerprints are at most `window`
+    k-grams apart in both documents (plus `k` for an edited word in between).
+    Returns [(query first word, query end word, stored start, stored end)] for the
+    passages with at least `min_fingerprints` fingerprints, in query order.
+    """
+    gap = window + k
+    spans, open_spans = [], []
+    for q, s, start, end in sorted(matches):
+        open_spans = [span for span in open_spans if q - span[1] <= gap]
+        for span in open_spans:
+            if 0 < s - span[3] <= gap:
+                span[1], span[3], span[5] = q, s, max(span[5], end)
+                span[6] += 1
+                break
+        else:
+            span = [q, q, s, s, start, end, 1]
+            spans.append(span)
+            open_spans.append(span)
+    return [(q0, q1 + k, start, end) for q0, q1, _, _, start, end, count in spans if count >= min_fingerprints]
+
+
+def covered_words(spans):
+    """Number of query words inside the union of [first, end) word ranges."""
+    covered, reach = 0, 0
+    for first, end in sorted(spans):
+        first = max(first, reach)
+        if end > first:
+            covered += end - first
+            reach = end
+    return covered
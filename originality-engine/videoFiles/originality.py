@@ -1,197 +1,491 @@
+import itertools
+import json
 import os
 import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
 import requests
-from moviepy import VideoFileClip
+from requests.adapters import HTTPAdapter
+
+ENGINE_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ENGINE_ROOT not in sys.path:
+    sys.path.append(ENGINE_ROOT)
+from common.admission import ADMISSION, Overloaded, limited
+from common.metrics import REGISTRY, stage, timed
+from common.profiling import admin_headers
+from common.warmup import run_steps
 
 # Microservices Configuration
-AUDIO_SERVER_URL = "http://localhost:8080/check"
-IMAGE_SERVER_URL = "http://localhost:8081/check"
+AUDIO_SERVICE_URL = os.environ.get('AUDIO_SERVICE_URL', "http://localhost:8080")
+IMAGE_SERVICE_URL = os.environ.get('IMAGE_SERVICE_URL', "http://localhost:8081")
+
+# How the soundtrack reaches the audio service:
+#   pcm - ffmpeg decodes it straight to mono 16-bit PCM at AUDIO_SAMPLE_RATE, streamed as
+#         the request body to /check/pcm and /register/pcm (no WAV file on disk)
+#   wav - full-fidelity WAV written by MoviePy and uploaded as a file (the original path)
+# The Go service low-passes and decimates 44.1 kHz input by 4 before fingerprinting, so
+# 11025 Hz mono is all it looks at anyway.
+AUDIO_TRANSPORT = os.environ.get('VIDEO_AUDIO_TRANSPORT', 'pcm')
+AUDIO_SAMPLE_RATE = 11025
+PCM_CHUNK_BYTES = 64 * 1024
+
+# Progressive checks decode and look up one key frame at a time and stop as soon as this
+# many frames match the same registered video (see check_progressive)
+PROGRESSIVE_MATCHES = int(os.environ.get('VIDEO_PROGRESSIVE_MATCHES', '3'))
+FRAME_MATCH_DISTANCE = 10  # image hash distance of a near-duplicate frame
+
+PROGRESSIVE_CHECKS = REGISTRY.counter('originality_video_progressive_checks_total',
+                                      'Progressive video checks by outcome', ['outcome'])
+
+def make_session(pool_size=16):
+    """requests.Session with a keep-alive connection pool, reused across calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def audio_song_id(asset_id):
+    """Audio server requires an integer ID: deterministic unsigned 32-bit id from the asset id string."""
+    return zlib.crc32(str(asset_id).encode('utf-8')) & 0xffffffff
+
+def ffmpeg_binary():
+    """The ffmpeg MoviePy uses (FFMPEG_BINARY or the imageio-ffmpeg build)."""
+    try:
+        from moviepy.config import FFMPEG_BINARY
+        return FFMPEG_BINARY
+    except ImportError:
+        return 'ffmpeg'
+
+def pcm_stream(video_path, rate=AUDIO_SAMPLE_RATE, chunk_bytes=PCM_CHUNK_BYTES):
+    """
+    Yields the soundtrack of `video_path` as mono 16-bit little-endian PCM at `rate`,
+    chunk by chunk as ffmpeg decodes it. ffmpeg runs under a decode admission slot, taken
+    when the first chunk is read (Overloaded if refused). Closing the generator stops ffmpeg.
+    """
+    cmd = [ffmpeg_binary(), '-nostdin', '-v', 'error', '-i', video_path,
+           '-vn', '-ac', '1', '-ar', str(rate), '-f', 's16le', '-']
+    with ADMISSION.slot('decode'):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        try:
+            while True:
+                chunk = proc.stdout.read(chunk_bytes)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            proc.kill()
+            proc.stdout.close()
+            proc.wait()
+
+def frame_times(duration):
+    """Key frame sample times: every 5 seconds, or about 10 frames for longer videos."""
+    step = max(5, int(duration / 10))
+    return list(range(0, int(duration), step))
+
+def frame_asset(match_id):
+    """Video asset id of a registered frame row `{asset_id}_{i}`."""
+    asset_id, _, index = str(match_id).rpartition('_')
+    return asset_id if asset_id and index.isdigit() else str(match_id)
+
+def frame_similarity(data):
+    """Similarity (0 distance = 1.0) of a frame check response, None unless it is a near duplicate."""
+    dist = data.get("distance") if data else None
+    if dist is None or dist > FRAME_MATCH_DISTANCE:
+        return None
+    return max(0, 1.0 - (dist / 20.0))
+
+def sse_stream(events, on_close=None):
+    """
+    text/event-stream body for the (event, data) pairs of check_progressive. The first
+    event is taken before returning, so a refused decode slot raises Overloaded here
+    (429/503) rather than mid-stream. Closing the body (client gone) closes `events`,
+    which stops the decode; `on_close` runs when the stream ends.
+    """
+    first = next(events)
+
+    def body():
+        try:
+            for event, data in itertools.chain([first], events):
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            events.close()
+            if on_close:
+                on_close()
+    return body()
+
+def _frame_result(classification, match_id, dist):
+    """Same shape as the image server's /check response."""
+    return {
+        "status": classification,
+        "match_id": match_id if match_id else None,
+        "distance": int(dist) if 0 <= dist < float('inf') else None
+    }
 
 class VideoOriginalityRequest:
-    def __init__(self):
+    def __init__(self, image_engine=None, session=None):
         self.temp_dir = "temp_video_proc"
         os.makedirs(self.temp_dir, exist_ok=True)
+        # If an ImageOriginalityRequest is given, frames are hashed in-process
+        # (no JPEG round trip, no HTTP hop); otherwise the image service is called.
+        self.image_engine = image_engine
+        # Pooled keep-alive connections to the audio (and image) services
+        self.session = session or make_session()
+
+    def warm_up(self):
+        """
+        Warm-up steps for a freshly started server (common/warmup.py): the decoder imported
+        and ffmpeg run once, then the in-process image engine's own warm-up, if any.
+        """
+        def decoder():
+            import moviepy  # the first import (imageio, ffmpeg lookup) is the cost
+            binary = ffmpeg_binary()
+            subprocess.run([binary, '-version'], capture_output=True, check=True)
+            return {"ffmpeg": binary}
+
+        steps = [('decoder', decoder)]
+        if self.image_engine is not None:
+            steps.append(('image', lambda: {"steps": self.image_engine.warm_up()}))
+        return run_steps('video', steps)
 
-    def process_video(self, video_path):
-        """Extracts frames and audio from video."""
+    @limited('decode')
+    @timed('video', 'video_decode')
+    def process_video(self, video_path, work_dir=None):
+        """
+        Extracts frames and audio from video.
+        Frames are PIL images when hashing in-process, JPEG paths otherwise.
+        """
+        from moviepy import VideoFileClip  # heavy (imageio/ffmpeg); only needed once we decode
+        work_dir = work_dir or self.temp_dir
         clip = VideoFileClip(video_path)
-        
-        # 1. Extract Audio
-        audio_path = os.path.join(self.temp_dir, "extracted_audio.wav")
+
+        # 1. Extract Audio (in pcm mode the video itself is the source, decoded while it is sent)
+        audio_path = os.path.join(work_dir, "extracted_audio.wav")
         try:
-            if clip.audio:
-                clip.audio.write_audiofile(audio_path, logger=None)
-            else:
+            if not clip.audio:
                 audio_path = None
+            elif AUDIO_TRANSPORT == 'pcm':
+                audio_path = video_path
+            else:
+                clip.audio.write_audiofile(audio_path, logger=None)
         except Exception as e:
             print(f"Error extracting audio: {e}")
             audio_path = None
 
         # 2. Extract Key Frames (e.g., every 5 seconds)
-        duration = clip.duration
-        frame_paths = []
+        frames = []
         try:
             # Limit frames to avoid spamming the image server (e.g. max 10 frames)
-            step = max(5, int(duration / 10)) 
-            for t in range(0, int(duration), step):
-                frame_path = os.path.join(self.temp_dir, f"frame_{t}.jpg")
-                clip.save_frame(frame_path, t)
-                frame_paths.append(frame_path)
+            for t in frame_times(clip.duration):
+                frames.append(self._extract_frame(clip, t, work_dir))
         except Exception as e:
             print(f"Error extracting frames: {e}")
-            
+
         clip.close()
-        return audio_path, frame_paths
+        return audio_path, frames
+
+    def _extract_frame(self, clip, t, work_dir):
+        """The frame at `t` seconds: a PIL image when hashing in-process, a JPEG path otherwise."""
+        if self.image_engine:
+            from PIL import Image
+            return Image.fromarray(clip.get_frame(t))
+        frame_path = os.path.join(work_dir, f"frame_{t}.jpg")
+        clip.save_frame(frame_path, t)
+        return frame_path
+
+    def _post_audio(self, endpoint, audio_path, song_id=None):
+        """POSTs the soundtrack to the audio service's `endpoint` (/check or /register)."""
+        if AUDIO_TRANSPORT == 'pcm':
+            # A generator body goes out with chunked transfer encoding as ffmpeg produces it
+            params = {'rate': AUDIO_SAMPLE_RATE}
+            if song_id is not None:
+                params['id'] = str(song_id)
+            return self.session.post(f"{AUDIO_SERVICE_URL}{endpoint}/pcm", params=params,
+                                     data=pcm_stream(audio_path),
+                                     headers={'Content-Type': 'application/octet-stream'})
+        with open(audio_path, 'rb') as f:
+            # Audio server expects 'file' and, to register, an integer 'id'
+            data = {'id': str(song_id)} if song_id is not None else None
+            return self.session.post(f"{AUDIO_SERVICE_URL}{endpoint}", files={'file': f}, data=data)
+
+    @timed('video', 'frame_check')
+    def _check_frame(self, frame):
+        if self.image_engine:
+            return _frame_result(*self.image_engine.check_originality(frame))
+        with open(frame, 'rb') as f:
+            resp = self.session.post(f"{IMAGE_SERVICE_URL}/check", files={'file': f})
+        return resp.json() if resp.status_code == 200 else None
+
+    def _register_frame(self, frame, frame_id, asset_id):
+        if self.image_engine:
+            success, _ = self.image_engine.register_image(frame, frame_id, video_id=asset_id)
+            return success
+        with open(frame, 'rb') as f:
+            resp = self.session.post(f"{IMAGE_SERVICE_URL}/register", files={'file': f},
+                                     data={'id': frame_id, 'video': asset_id})
+        return resp.status_code == 200
 
-    def check_originality(self, video_path):
-        audio_path = None
-        frame_paths = []
+    def _check_audio(self, audio_path):
+        """(status, top score) from the audio service; NO_AUDIO without a soundtrack."""
+        audio_result = "NO_AUDIO"
+        audio_score = 0.0
+        if audio_path and os.path.exists(audio_path):
+            try:
+                with stage('video', 'audio_check'):
+                    resp = self._post_audio('/check', audio_path)
+
+                if resp.status_code == 200:
+                    data = resp.json()
+                    # Audio server returns { "status": "ORIGINAL/DUPLICATE", "top_score": float, "matches": [] }
+                    # Check audioFiles/main.go CheckResponse struct
+                    audio_result = data.get("status", "UNKNOWN")
+                    audio_score = data.get("top_score", 0.0)
+                else:
+                    print(f"Audio server error: {resp.status_code}")
+            except Overloaded:
+                raise  # the soundtrack decode was not admitted
+            except Exception as e:
+                print(f"Audio check failed (Server unreachable?): {e}")
+        return audio_result, audio_score
+
+    def _verdict(self, audio_result, audio_score, visual_results, max_visual_score):
+        # Synthesis Logic
+        status = "Original"
+        if len(visual_results) > 0: # Found visual match
+             status = "Duplicate (Visual)"
+        if audio_result == "DUPLICATE":
+             if status == "Duplicate (Visual)":
+                 status = "Duplicate (Audio+Visual)"
+             else:
+                 status = "Duplicate (Audio)"
+
+        return {
+            "status": status,
+            "visual_score": float(max_visual_score),
+            "audio_result": audio_result,
+            "audio_score": float(audio_score),
+            "visual_matches_count": len(visual_results),
+            "description": f"Video analyzed. Audio: {audio_result}. Visual Matches: {len(visual_results)}."
+        }
+
+    def check_originality(self, video_path, progressive=False):
+        if progressive:
+            for _, result in self.check_progressive(video_path):
+                pass
+            return result
+        # Per-call scratch directory so concurrent checks never share temp files
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
         try:
-            audio_path, frame_paths = self.process_video(video_path)
-            
+            audio_path, frames = self.process_video(video_path, work_dir)
+
             # Check Audio
-            audio_result = "NO_AUDIO"
-            audio_score = 0.0
-            audio_matches = []
-            
-            if audio_path and os.path.exists(audio_path):
-                try:
-                    with open(audio_path, 'rb') as f:
-                        resp = requests.post(AUDIO_SERVER_URL, files={'file': f})
-                    
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        # Audio server returns { "status": "ORIGINAL/DUPLICATE", "top_score": float, "matches": [] }
-                        # Check audioFiles/main.go CheckResponse struct
-                        audio_result = data.get("status", "UNKNOWN")
-                        audio_score = data.get("top_score", 0.0)
-                        audio_matches = data.get("matches", [])
-                    else:
-                        print(f"Audio server error: {resp.status_code}")
-                except Exception as e:
-                    print(f"Audio check failed (Server unreachable?): {e}")
+            audio_result, audio_score = self._check_audio(audio_path)
 
             # Check Visuals
             visual_results = []
             max_visual_score = 0.0
-            
-            for fp in frame_paths:
+
+            for frame in frames:
                 try:
-                    with open(fp, 'rb') as f:
-                        resp = requests.post(IMAGE_SERVER_URL, files={'file': f})
-                    
-                    if resp.status_code == 200:
-                        data = resp.json()
-                        # Image server returns { "status": "...", "distance": int, "match_id": ... }
-                        # Distance 0 = Exact match. Higher distance = less similar.
-                        # Wait, Image Engine uses 'distance' (lower is better, 0 is exact). 
-                        # We need to normalize distance to a similarity score if possible, or just interpret distance.
-                        # Typically ImageHash distance < 5 is duplicate.
-                        dist = data.get("distance", -1)
-                        if dist != -1 and dist <= 10: # Threshold for near duplicate
-                            visual_results.append(data)
-                            # Approximate similarity for scoring purposes (0 distance = 1.0 sim)
-                            sim = max(0, 1.0 - (dist / 20.0)) 
-                            if sim > max_visual_score: max_visual_score = sim
+                    data = self._check_frame(frame)
+                    # Image engine returns { "status": "...", "distance": int, "match_id": ... }
+                    # Distance 0 = Exact match. Higher distance = less similar.
+                    sim = frame_similarity(data)
+                    if sim is not None:
+                        visual_results.append(data)
+                        if sim > max_visual_score: max_visual_score = sim
                 except Exception:
                     pass
 
-            # Cleanup
-            if audio_path and os.path.exists(audio_path): os.remove(audio_path)
-            for fp in frame_paths:
-                if os.path.exists(fp): os.remove(fp)
-
-            # Synthesis Logic
-            status = "Original"
-            if len(visual_results) > 0: # Found visual match
-                 status = "Duplicate (Visual)"
-            if audio_result == "DUPLICATE":
-                 if status == "Duplicate (Visual)":
-                     status = "Duplicate (Audio+Visual)"
-                 else:
-                     status = "Duplicate (Audio)"
-
-            final_score = max(max_visual_score, audio_score / 100.0) # Audio score is likely 0-100 based on 'PARTIAL_SCORE_THRESH = 35'
-
-            return {
-                "status": status,
-                "visual_score": float(max_visual_score),
-                "audio_result": audio_result,
-                "audio_score": float(audio_score),
-                "visual_matches_count": len(visual_results),
-                "description": f"Video analyzed. Audio: {audio_result}. Visual Matches: {len(visual_results)}."
-            }
+            return self._verdict(audio_result, audio_score, visual_results, max_visual_score)
 
+        except Overloaded:
+            raise  # not admitted: the server answers 429/503 with Retry-After
         except Exception as e:
             return {"error": str(e)}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def check_progressive(self, video_path, min_matches=PROGRESSIVE_MATCHES):
+        """
+        Progressive check: decodes and looks up one key frame at a time, yielding
+        ('start', plan) once the video is open, ('frame', evidence) per frame and finally
+        ('verdict', result). As soon as `min_matches` frames match the same registered
+        video the decode stops and the soundtrack is skipped (audio_result SKIPPED);
+        otherwise the audio is checked as in check_originality. The verdict carries the
+        per-frame evidence gathered under "progressive".
+        """
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
+        started = time.perf_counter()
+        visual_results, evidence, votes = [], [], {}
+        max_visual_score = 0.0
+        matched_asset = audio_path = None
+        streaming = False
+        try:
+            # A decode slot per unit of decode work (opening the video, each frame, the
+            # soundtrack), never held across a yield: a slow client must not pin one
+            from moviepy import VideoFileClip
+            with ADMISSION.slot('decode'):
+                clip = VideoFileClip(video_path, audio=False)
+            try:
+                has_audio = bool(clip.reader.infos.get('audio_found'))
+                times = frame_times(clip.duration)
+                streaming = True
+                yield 'start', {"duration": clip.duration, "frames_planned": len(times),
+                                "min_matches": min_matches}
+                for t in times:
+                    with ADMISSION.slot('decode'), stage('video', 'frame_decode'):
+                        frame = self._extract_frame(clip, t, work_dir)
+                    try:
+                        data = self._check_frame(frame)
+                    except Exception:
+                        data = None
+                    sim = frame_similarity(data)
+                    item = {"t": t, "match_id": data.get("match_id") if data else None,
+                            "distance": data.get("distance") if data else None, "matched": sim is not None}
+                    if sim is not None:
+                        visual_results.append(data)
+                        max_visual_score = max(max_visual_score, sim)
+                        asset = frame_asset(data["match_id"])
+                        votes[asset] = item["asset_matches"] = votes.get(asset, 0) + 1
+                        if votes[asset] >= min_matches:
+                            matched_asset = asset
+                    evidence.append(item)
+                    yield 'frame', item
+                    if matched_asset is not None:
+                        break
+            finally:
+                clip.close()
+
+            if matched_asset is None and has_audio:
+                if AUDIO_TRANSPORT == 'pcm':
+                    audio_path = video_path  # pcm_stream takes its own slot
+                else:
+                    from moviepy import AudioFileClip
+                    audio_path = os.path.join(work_dir, "extracted_audio.wav")
+                    with ADMISSION.slot('decode'):
+                        audio = AudioFileClip(video_path)
+                        audio.write_audiofile(audio_path, logger=None)
+                        audio.close()
+
+            if matched_asset is not None:
+                audio_result, audio_score = "SKIPPED", 0.0
+            else:
+                audio_result, audio_score = self._check_audio(audio_path)
+            PROGRESSIVE_CHECKS.labels(outcome='early_stop' if matched_asset else 'full').inc()
+            result = self._verdict(audio_result, audio_score, visual_results, max_visual_score)
+            result["progressive"] = {
+                "early_stop": matched_asset is not None,
+                "matched_asset": matched_asset,
+                "frames_checked": len(evidence),
+                "frames_planned": len(times),
+                "seconds": round(time.perf_counter() - started, 3),
+                "evidence": evidence,
+            }
+            yield 'verdict', result
+        except Overloaded as e:
+            if not streaming:
+                raise  # not admitted: the server answers 429/503 with Retry-After
+            # Refused after the stream started (a later frame or the soundtrack): 200 is already sent
+            yield 'verdict', {"error": str(e), "retry_after": e.retry_after}
+        except Exception as e:
+            yield 'verdict', {"error": str(e)}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
 
     def register_video(self, video_path, asset_id):
         """
         Registers a video by extracting its audio and frames,
-        and registering them with the respective microservices.
+        and registering them with the respective engines.
         """
-        AUDIO_REGISTER_URL = "http://localhost:8080/register"
-        IMAGE_REGISTER_URL = "http://localhost:8081/register"
-
-        audio_path = None
-        frame_paths = []
-        
         results = {
             "audio_registered": False,
             "visual_frames_registered": 0,
             "errors": []
         }
 
+        work_dir = tempfile.mkdtemp(dir=self.temp_dir)
         try:
-            audio_path, frame_paths = self.process_video(video_path)
-            
+            audio_path, frames = self.process_video(video_path, work_dir)
+
             # 1. Register Audio
             if audio_path and os.path.exists(audio_path):
                 try:
-                    # Audio server requires an integer ID.
-                    # We generate a deterministic integer from the asset_id string.
-                    import zlib
-                    audio_id = zlib.crc32(asset_id.encode('utf-8')) & 0xffffffff # Ensure unsigned 32-bit
-                    
-                    with open(audio_path, 'rb') as f:
-                        # Audio server expects 'file' and 'id'
-                        resp = requests.post(AUDIO_REGISTER_URL, files={'file': f}, data={'id': str(audio_id)})
-                    
+                    resp = self._post_audio('/register', audio_path, audio_song_id(asset_id))
+
                     if resp.status_code == 200:
                         results["audio_registered"] = True
                     else:
                         results["errors"].append(f"Audio registration failed: {resp.text}")
+                except Overloaded:
+                    raise
                 except Exception as e:
                     results["errors"].append(f"Audio registration exception: {str(e)}")
 
             # 2. Register Frames
-            # Using the same asset_id for frames might be tricky if image engine expects unique IDs per image.
-            # Usually we might want to register them as "asset_id_frame_index".
-            # Let's check image server logic. It takes an ID. 
-            # If we register multiple frames with SAME ID, it might overwrite or just add multiple hashes for same ID?
-            # Looking at imageFiles/main.py, it uses ID to register. Engine implementation generic.
-            # We'll append frame index to ID to be safe and distinct: ID_0, ID_1, ...
-            
-            for i, fp in enumerate(frame_paths):
-                try:
-                    frame_id = f"{asset_id}_{i}"
-                    with open(fp, 'rb') as f:
-                        resp = requests.post(IMAGE_REGISTER_URL, files={'file': f}, data={'id': frame_id})
-                    
-                    if resp.status_code == 200:
-                        results["visual_frames_registered"] += 1
-                except Exception as e:
-                    pass # non-critical if one frame fails?
-
-            # Cleanup
-            if audio_path and os.path.exists(audio_path): os.remove(audio_path)
-            for fp in frame_paths:
-                if os.path.exists(fp): os.remove(fp)
+            # Each frame is registered as its own image asset: ID_0, ID_1, ...
+            # A frame the image engine declines (e.g. an exact duplicate frame) is skipped;
+            # an unexpected error aborts the registration and rolls the frames back below.
+            for i, frame in enumerate(frames):
+                if self._register_frame(frame, f"{asset_id}_{i}", asset_id):
+                    results["visual_frames_registered"] += 1
 
             if results["audio_registered"] or results["visual_frames_registered"] > 0:
                 return True, results
             else:
                 return False, results
 
+        except Overloaded:
+            raise  # nothing was registered yet: the decode slots are taken before any frame
+        except Exception as e:
+            # Partial registration: don't leave {asset_id}_{i} frame rows or the soundtrack behind
+            if results["visual_frames_registered"]:
+                try:
+                    self._delete_frames(asset_id)
+                except Exception as cleanup_error:
+                    print(f"Frame rollback for {asset_id} failed: {cleanup_error}")
+            if results["audio_registered"]:
+                try:
+                    deleted, msg = self._delete_audio(asset_id)
+                    if not deleted:
+                        print(f"Audio rollback for {asset_id} failed: {msg}")
+                except Exception as cleanup_error:
+                    print(f"Audio rollback for {asset_id} failed: {cleanup_error}")
+            return False, {"error": str(e), "frames_rolled_back": results["visual_frames_registered"],
+                           "audio_rolled_back": results["audio_registered"]}
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _delete_frames(self, asset_id):
+        """Removes the frames registered for `asset_id` (in-process or via the image service)."""
+        if self.image_engine:
+            return self.image_engine.delete_image(asset_id, include_frames=True)
+        resp = self.session.post(f"{IMAGE_SERVICE_URL}/delete", data={'id': asset_id, 'frames': '1'},
+                                 headers=admin_headers())
+        return resp.status_code == 200, resp.json().get("message", resp.text) if resp.ok else resp.text
+
+    def _delete_audio(self, asset_id):
+        """Removes the soundtrack's fingerprints from the audio service."""
+        resp = self.session.post(f"{AUDIO_SERVICE_URL}/delete", data={'id': str(audio_song_id(asset_id))},
+                                 headers=admin_headers())
+        return resp.status_code == 200, resp.text.strip()
+
+    def delete_video(self, asset_id):
+        """Deletes a registered video: its frame rows and its audio fingerprints."""
+        results = {"frames_deleted": False, "audio_deleted": False, "errors": []}
+        try:
+            results["frames_deleted"], msg = self._delete_frames(asset_id)
+            if not results["frames_deleted"]:
+                results["errors"].append(f"Frames: {msg}")
+        except Exception as e:
+            results["errors"].append(f"Frame deletion exception: {e}")
+        try:
+            results["audio_deleted"], msg = self._delete_audio(asset_id)
+            if not results["audio_deleted"]:
+                results["errors"].append(f"Audio: {msg}")
         except Exception as e:
-            return False, {"error": str(e)}
+            results["errors"].append(f"Audio deletion exception (Server unreachable?): {e}")
+        return results["frames_deleted"] or results["audio_deleted"], results
@@ -1,16 +1,24 @@
 import os
 import sys
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-from originality import VideoOriginalityRequest
+from originality import VideoOriginalityRequest, sse_stream
+from common.admission import Overloaded, install_admission, overloaded_response
+from common.metrics import instrument_app
+from common.profiling import admin_refusal, install_profiling
+from common.warmup import install_warmup
 
 # Configuration
 UPLOAD_FOLDER = 'uploads'
+PORT = int(os.environ.get('VIDEO_PORT', '5003'))
 ALLOWED_EXTENSIONS = {'mp4', 'mkv', 'avi', 'mov'}
 
 app = Flask(__name__)
 CORS(app)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+instrument_app(app, 'video')
+install_profiling(app, 'video')
+install_admission(app, 'video')
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
@@ -23,6 +31,13 @@ except Exception as e:
     print(f"Failed to initialize Video Engine: {e}")
     engine = None
 
+def warm_up():
+    if not engine:
+        raise RuntimeError("Engine not initialized")
+    return engine.warm_up()
+
+install_warmup(app, 'video', warm_up)
+
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -49,14 +64,23 @@ def check_video():
         filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
         try:
             file.save(filepath)
-            
-            result = engine.check_originality(filepath)
+
+            # stream=1: progressive check as server-sent events; the upload goes when it ends
+            if request.form.get('stream') == '1':
+                events = sse_stream(engine.check_progressive(filepath), lambda: os.remove(filepath))
+                return Response(stream_with_context(events), mimetype='text/event-stream',
+                                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+            result = engine.check_originality(filepath, progressive=request.form.get('progressive') == '1')
             
             # Cleanup
             if os.path.exists(filepath): os.remove(filepath)
             
             return jsonify(result), 200
 
+        except Overloaded as e:
+            if os.path.exists(filepath): os.remove(filepath)
+            return overloaded_response(e)
         except Exception as e:
             if os.path.exists(filepath): os.remove(filepath)
             return jsonify({"error": str(e)}), 500
@@ -96,13 +120,32 @@ def register_video_endpoint():
             else:
                 return jsonify({"status": "failed", "details": details}), 500
 
+        except Overloaded as e:
+            if os.path.exists(filepath): os.remove(filepath)
+            return overloaded_response(e)
         except Exception as e:
             if os.path.exists(filepath): os.remove(filepath)
             return jsonify({"error": str(e)}), 500
     else:
         return jsonify({"error": "File type not allowed"}), 400
 
+@app.route('/delete', methods=['POST'])
+def delete_video_endpoint():
+    refusal = admin_refusal(request)
+    if refusal:
+        return refusal
+    if not engine:
+        return jsonify({"error": "Engine not initialized"}), 500
+
+    asset_id = request.form.get('id')
+    if not asset_id:
+        return jsonify({"error": "Missing 'id' parameter"}), 400
+
+    success, details = engine.delete_video(asset_id)
+    if success:
+        return jsonify({"status": "success", "details": details}), 200
+    return jsonify({"status": "failed", "details": details}), 404
+
 if __name__ == '__main__':
-    # Run on port 5003 for video
-    print("Starting video server on port 5003...")
-    app.run(host='0.0.0.0', port=5003, debug=True, use_reloader=False)
+    print(f"Starting video server on port {PORT}...")
+    app.run(host='0.0.0.0', port=PORT, debug=True, use_reloader=False)